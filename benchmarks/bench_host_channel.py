@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Compare ways of running host commands: native, flatpak-spawn, persistent worker.
+
+Runs the same workload (a list-units call followed by a systemctl show per
+unit, as a refresh does) three ways:
+
+  native       subprocess per command, no sandbox
+  per-command  flatpak-spawn --host per command, as the Flatpak build did
+  channel      one host_worker.py process, commands sent as framed batches
+
+Run it inside the Flatpak sandbox (flatpak run --command=python3 ...) for
+the real comparison. Outside the sandbox the flatpak paths are skipped
+unless --spawn-prefix is given; --spawn-prefix "" measures the worker
+protocol overhead on its own.
+"""
+import argparse
+import json
+import os
+import shlex
+import struct
+import subprocess
+import time
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "host_worker.py")
+HEADER = struct.Struct(">I")
+
+
+def in_flatpak():
+    return os.path.exists("/.flatpak-info")
+
+
+def workload(units):
+    units_cmd = ["systemctl", "list-units", "--type=service", "--all", "--no-pager", "--plain"]
+    return [units_cmd] + [["systemctl", "show", "--property=Description", "--", unit] for unit in units]
+
+
+def run_spawned(cmds, prefix):
+    for cmd in cmds:
+        subprocess.run(prefix + cmd, capture_output=True)
+
+
+class Channel:
+    def __init__(self, prefix):
+        with open(WORKER_PATH) as f:
+            source = f.read()
+        self.process = subprocess.Popen(prefix + ["python3", "-c", source],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.next_id = 0
+        assert self.read()["ready"]
+
+    def read(self):
+        header = self.process.stdout.read(HEADER.size)
+        return json.loads(self.process.stdout.read(HEADER.unpack(header)[0]))
+
+    def request(self, cmds, parallel):
+        self.next_id += 1
+        payload = json.dumps({
+            "id": self.next_id,
+            "commands": [{"argv": cmd, "input": None} for cmd in cmds],
+            "parallel": parallel,
+        }).encode()
+        self.process.stdin.write(HEADER.pack(len(payload)) + payload)
+        self.process.stdin.flush()
+        return self.read()
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def report(label, times):
+    print(f"{label:>22}: best {min(times) * 1000:8.1f} ms  worst {max(times) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, default=50, help="number of units to show per round")
+    parser.add_argument("--rounds", type=int, default=3, help="number of timed rounds per strategy")
+    parser.add_argument("--spawn-prefix", default=None,
+                        help="command prefix for the host (default: flatpak-spawn --host inside Flatpak)")
+    args = parser.parse_args()
+
+    if args.spawn_prefix is not None:
+        prefix = shlex.split(args.spawn_prefix)
+    elif in_flatpak():
+        prefix = ["flatpak-spawn", "--host"]
+    else:
+        prefix = None
+
+    listing = subprocess.run((prefix or []) + ["systemctl", "list-unit-files", "--type=service",
+                                               "--no-pager", "--plain", "--no-legend"],
+                             capture_output=True, text=True).stdout
+    units = [line.split()[0] for line in listing.splitlines() if line.strip()][:args.units]
+    cmds = workload(units)
+    print(f"{len(cmds)} commands per round")
+
+    if not in_flatpak():
+        report("native", [timed(run_spawned, cmds, []) for _ in range(args.rounds)])
+    if prefix is None:
+        print("Not inside Flatpak; pass --spawn-prefix to time the host paths")
+        return
+
+    report("per-command spawn", [timed(run_spawned, cmds, prefix) for _ in range(args.rounds)])
+
+    start = time.perf_counter()
+    channel = Channel(prefix)
+    print(f"{'channel startup':>22}: {(time.perf_counter() - start) * 1000:8.1f} ms")
+    try:
+        report("channel, one per call", [
+            timed(lambda: [channel.request([cmd], False) for cmd in cmds]) for _ in range(args.rounds)
+        ])
+        report("channel, batched", [timed(channel.request, cmds, True) for _ in range(args.rounds)])
+    finally:
+        channel.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Time the service list at scale against the fake systemd in fakebin/.
+
+For each unit count it reports, in a fresh process so peak RSS is per size:
+
+  refresh       a full load_services round (list-units, list-unit-files and
+                the batched show calls) through the fake systemctl on PATH,
+                including each stand-in process's own startup
+  parse         the same load against an in-memory FakeHost, i.e. without
+                process spawns: the parsing and batching cost alone, for
+                the --output=json listings and for the --plain ones
+  snapshot      building the ServiceSnapshot and its search index
+  keystroke     one search plus one filter pass per character typed
+  state filter  one filter pass per status tab
+  items, rows   ServiceItems created and ServiceRows bound per second
+                (only when gi and a display are available)
+  peak RSS      of the whole process
+
+Results are printed and written as JSON (--output), so runs can be
+compared in review:
+
+    python3 benchmarks/bench_service_list.py --sizes 100,1000,20000 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FAKEBIN = os.path.join(HERE, "fakebin")
+SRC = os.path.join(HERE, "..", "src")
+QUERY = "network-worker@0"
+
+
+def best_of(rounds, func):
+    """Return (best seconds, last result) over a few rounds"""
+    best, result = None, None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class StubWindow:
+    """Stands in for the main window: every callback a ServiceRow wires up does nothing"""
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def measure_gtk(services):
+    """ServiceItems and bound ServiceRows per second, or None without gi or a display"""
+    try:
+        import main
+    except (ImportError, ValueError):
+        return None  # gi, or GTK 4 and libadwaita, are not installed
+    if not main.Gtk.init_check():
+        return None
+    main.Adw.init()
+
+    start = time.perf_counter()
+    items = [main.ServiceItem(service) for service in services]
+    items_per_s = len(items) / (time.perf_counter() - start)
+
+    # A window's worth of recycled rows, rebound the way scrolling does
+    window = StubWindow()
+    rows = [main.ServiceRow(window) for _ in range(40)]
+    start = time.perf_counter()
+    for index, item in enumerate(items):
+        row = rows[index % len(rows)]
+        row.unbind()
+        row.bind(item)
+    rows_per_s = len(items) / (time.perf_counter() - start)
+    return {"items_per_s": round(items_per_s), "rows_per_s": round(rows_per_s)}
+
+
+def run_size(units, rounds):
+    """Measure one unit count; runs in its own process"""
+    os.environ["PATH"] = FAKEBIN + os.pathsep + os.environ.get("PATH", "")
+    os.environ["SYSTEMD_PILOT_FAKE_UNITS"] = str(units)
+    sys.path.insert(0, SRC)
+    from engine import FakeHost, LocalHost, SystemctlBackend, ServiceSnapshot
+
+    backend = SystemctlBackend(LocalHost(), is_root=True)
+    refresh, services = best_of(rounds, backend.list_services)
+    parse, _ = best_of(rounds, SystemctlBackend(FakeHost(units=units), is_root=True).list_services)
+    plain_backend = SystemctlBackend(FakeHost(units=units), is_root=True)
+    plain_backend.json_output = False
+    parse_plain, _ = best_of(rounds, plain_backend.list_services)
+
+    def build_snapshot():
+        snapshot = ServiceSnapshot()
+        for service in services:
+            snapshot.update(service)
+        snapshot.search_index()
+        return snapshot
+
+    snapshot_time, snapshot = best_of(rounds, build_snapshot)
+    names = list(snapshot.services)
+
+    # What each keystroke costs: the index search, then the filter pass
+    # the list model runs over every item
+    keystrokes = []
+    for length in range(1, len(QUERY) + 1):
+        def keystroke():
+            results = snapshot.search_index().search(QUERY[:length])
+            return sum(1 for name in names if results is None or name in results)
+        elapsed, _ = best_of(rounds, keystroke)
+        keystrokes.append(elapsed)
+
+    state_filters = {}
+    for state in ServiceSnapshot.STATES:
+        elapsed, _ = best_of(rounds, lambda: sum(1 for name in names if snapshot.matches(name, state)))
+        state_filters[state] = round(elapsed * 1000, 3)
+
+    result = {
+        "units": units,
+        "services": len(services),
+        "refresh_ms": round(refresh * 1000, 2),
+        "parse_ms": round(parse * 1000, 2),
+        "parse_plain_ms": round(parse_plain * 1000, 2),
+        "services_per_s": round(len(services) / parse),
+        "snapshot_ms": round(snapshot_time * 1000, 2),
+        "keystroke_ms": {"mean": round(sum(keystrokes) / len(keystrokes) * 1000, 3),
+                         "max": round(max(keystrokes) * 1000, 3)},
+        "state_filter_ms": state_filters,
+        "gtk": measure_gtk(services),
+    }
+    # ru_maxrss is in KiB on Linux
+    result["peak_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def report(result):
+    gtk = result["gtk"]
+    rows = f"{gtk['rows_per_s']:>9}" if gtk else f"{'-':>9}"
+    print(f"{result['units']:>7} {result['refresh_ms']:>11.1f} {result['parse_ms']:>9.1f} "
+          f"{result['snapshot_ms']:>11.1f} {result['keystroke_ms']['max']:>12.3f} {rows} "
+          f"{result['peak_rss_kib'] / 1024:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,5000,20000", help="comma-separated unit counts")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds per measurement (best is kept)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        json.dump(run_size(args.child, args.rounds), sys.stdout)
+        return 0
+
+    print(f"{'units':>7} {'refresh ms':>11} {'parse ms':>9} {'snapshot ms':>11} "
+          f"{'keystroke ms':>12} {'rows/s':>9} {'RSS MiB':>8}")
+    results = []
+    for units in (int(size) for size in args.sizes.split(",")):
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(units), "--rounds", str(args.rounds)],
+            capture_output=True, text=True
+        )
+        if child.returncode != 0:
+            print(f"{units} units failed:\n{child.stderr}", file=sys.stderr)
+            return 1
+        result = json.loads(child.stdout)
+        report(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "service_list",
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "rounds": args.rounds,
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Compare per-unit and batched description lookups against systemctl.
+
+Both strategies go through SystemctlBackend.iter_unit_properties, the
+lookup load_services uses: once per unit, and once over every unit file
+in SHOW_BATCH_SIZE chunks. Prints the wall time of each. Pass --flatpak
+to run the calls through FlatpakHost the way the sandboxed build does,
+and --fake-units to measure against the fake systemctl in fakebin/.
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from engine import FlatpakHost, LocalHost, SystemctlBackend  # noqa: E402
+
+
+def per_unit(backend, names):
+    descriptions = {}
+    for name in names:
+        for _, results in backend.iter_unit_properties([name], ["Description"]):
+            descriptions.update((alias, props.get("Description", "")) for alias, props in results.items())
+    return descriptions
+
+
+def batched(backend, names):
+    descriptions = {}
+    for _, results in backend.iter_unit_properties(names, ["Description"]):
+        descriptions.update((alias, props.get("Description", "")) for alias, props in results.items())
+    return descriptions
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flatpak", action="store_true", help="run commands through FlatpakHost")
+    parser.add_argument("--fake-units", type=int, metavar="N",
+                        help="use the fake systemctl in fakebin/ with N units")
+    parser.add_argument("--rounds", type=int, default=3, help="number of timed rounds per strategy")
+    args = parser.parse_args()
+
+    if args.fake_units:
+        os.environ["PATH"] = os.path.join(HERE, "fakebin") + os.pathsep + os.environ.get("PATH", "")
+        os.environ["SYSTEMD_PILOT_FAKE_UNITS"] = str(args.fake_units)
+
+    host = FlatpakHost() if args.flatpak else LocalHost()
+    backend = SystemctlBackend(host, is_root=True)
+    try:
+        names = list(backend.list_unit_files())
+        print(f"{len(names)} service unit files")
+
+        for label, func in (("per-unit show", per_unit), ("batched show", batched)):
+            times = [timed(func, backend, names)[0] for _ in range(args.rounds)]
+            print(f"{label:>14}: best {min(times) * 1000:8.1f} ms  worst {max(times) * 1000:8.1f} ms")
+    finally:
+        host.close()
+
+
+if __name__ == "__main__":
+    main()
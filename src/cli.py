@@ -0,0 +1,131 @@
+"""Command-line mode for systemd Pilot.
+
+Uses the same batched engine as the window, without importing gi, so it
+works without a display and starts quickly enough for monitoring scripts:
+
+    systemd-pilot --list --json
+    systemd-pilot --failed
+    systemd-pilot --user --search ssh
+    systemd-pilot --restart nginx postgresql
+    systemd-pilot --host web1 --list --running
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+
+from engine import (
+    APP_VERSION, BULK_CONCURRENCY, load_settings, in_flatpak, host_from_settings,
+    SystemdError, LocalHost, FlatpakHost, SystemctlBackend, ServiceSnapshot,
+)
+
+ACTIONS = ("start", "stop", "restart", "enable", "disable")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="systemd-pilot",
+        description="List and control systemd services without opening the window."
+    )
+    parser.add_argument("--version", action="version", version=f"systemd Pilot {APP_VERSION}")
+    parser.add_argument("--user", action="store_true", help="use the user manager instead of the system one")
+    parser.add_argument("--host", help="a machine from the \"hosts\" list in settings.json")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    listing = parser.add_argument_group("listing")
+    listing.add_argument("--list", action="store_true", help="list services (the default)")
+    listing.add_argument("--search", metavar="TEXT", help="only services matching TEXT, best matches first")
+    states = listing.add_mutually_exclusive_group()
+    for state in ServiceSnapshot.STATES:
+        states.add_argument(f"--{state}", dest="state", action="store_const", const=state,
+                            help=f"only {state} services")
+
+    actions = parser.add_argument_group("actions")
+    action = actions.add_mutually_exclusive_group()
+    for name in ACTIONS:
+        action.add_argument(f"--{name}", nargs="+", metavar="UNIT", help=f"{name} the given services")
+    actions.add_argument("--concurrency", type=int, default=None,
+                         help=f"units started/stopped at once (default {BULK_CONCURRENCY})")
+    return parser.parse_args(argv)
+
+
+def create_backend(settings, host_name):
+    via = FlatpakHost() if in_flatpak() else LocalHost()
+    if host_name is None:
+        return via, SystemctlBackend(via, is_root=os.geteuid() == 0)
+    for entry in settings.get("hosts", []):
+        if host_name in (entry.get("name"), entry.get("ssh")):
+            _, transport, backend = host_from_settings(entry, via)
+            return transport, backend
+    raise SystemdError(f"No host named {host_name!r} in settings.json")
+
+
+def list_services(backend, args):
+    services = backend.list_services(user=args.user)
+    snapshot = ServiceSnapshot()
+    for service in services:
+        snapshot.update(service)
+
+    names = sorted(snapshot.services)
+    ranks = snapshot.search_index().search(args.search or "")
+    if ranks is not None:
+        # Best rank first, by name within a rank
+        names = sorted((name for name in names if name in ranks), key=lambda name: ranks[name])
+    if args.state:
+        names = [name for name in names if snapshot.matches(name, args.state)]
+    selected = [snapshot.services[name] for name in names]
+
+    if args.json:
+        json.dump(selected, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+
+    width = max([len(service['full_name']) for service in selected] + [4])
+    for service in selected:
+        state = f"{service['active']} ({service['sub']})"
+        print(f"{service['full_name']:<{width}}  {service['load']:<9}  {state:<20}  {service['description']}")
+    return 0
+
+
+def run_action(backend, command, args, settings):
+    units = [unit if "." in unit else f"{unit}.service" for unit in getattr(args, command)]
+    concurrency = args.concurrency or settings.get("bulk_concurrency", BULK_CONCURRENCY)
+    results = backend.bulk_command(command, units, user=args.user, concurrency=concurrency)
+
+    if args.json:
+        json.dump({unit: {"ok": error is None, "error": error} for unit, error in results.items()},
+                  sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for unit, error in results.items():
+            print(f"{unit}: {'ok' if error is None else error}")
+    return 0 if all(error is None for error in results.values()) else 1
+
+
+def main(argv):
+    args = parse_args(argv)
+    settings = load_settings()
+    transport = None
+    try:
+        transport, backend = create_backend(settings, args.host)
+        for command in ACTIONS:
+            if getattr(args, command):
+                status = run_action(backend, command, args, settings)
+                break
+        else:
+            status = list_services(backend, args)
+        # Flush here so a closed pipe is caught below, not at exit
+        sys.stdout.flush()
+        return status
+    except SystemdError as e:
+        print(f"systemd-pilot: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader went away (systemd-pilot --list | head): stop quietly,
+        # and point stdout at /dev/null so the final flush can't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 128 + signal.SIGPIPE
+    finally:
+        if transport is not None:
+            transport.close()
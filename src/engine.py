@@ -0,0 +1,2290 @@
+"""Display-free core of systemd Pilot: host transports, backends and indexes.
+
+Shared by the GTK app and the command-line mode. Nothing here may import
+gi, so the command line starts without a display and in milliseconds.
+"""
+import codecs
+import subprocess
+import threading
+import os
+import re
+import json
+import shlex
+import signal
+import struct
+import time
+import functools
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime
+
+APP_VERSION = "2.0.0"
+
+# Maximum number of units passed to a single "systemctl show" call
+SHOW_BATCH_SIZE = 200
+
+# Unit search paths, highest precedence first
+SYSTEM_UNIT_DIRS = [
+    "/etc/systemd/system",
+    "/run/systemd/system",
+    "/usr/local/lib/systemd/system",
+    "/usr/lib/systemd/system",
+    "/lib/systemd/system",
+]
+USER_UNIT_DIRS = [
+    "~/.config/systemd/user",
+    "/etc/systemd/user",
+    "/usr/local/lib/systemd/user",
+    "/usr/lib/systemd/user",
+]
+
+# Generator output, recreated by every daemon-reload; its mtime marks reloads
+SYSTEM_GENERATOR_DIRS = [
+    "/run/systemd/generator",
+    "/run/systemd/generator.early",
+    "/run/systemd/generator.late",
+]
+USER_GENERATOR_DIRS = [
+    "$XDG_RUNTIME_DIR/systemd/generator",
+    "$XDG_RUNTIME_DIR/systemd/generator.early",
+    "$XDG_RUNTIME_DIR/systemd/generator.late",
+]
+
+# Bumped whenever the snapshot cache file layout changes
+SNAPSHOT_CACHE_VERSION = 1
+
+# Samples kept per unit for sparklines
+SAMPLE_HISTORY = 60
+
+# Journal history: entries per page and pages kept in the shared cache
+JOURNAL_PAGE_SIZE = 500
+JOURNAL_CACHE_PAGES = 64
+
+# Seconds the privileged helper stays alive without requests
+HELPER_IDLE_TIMEOUT = 300
+
+# How long an idle SSH master connection is kept
+SSH_CONTROL_PERSIST = 600
+
+# Units acted on at once by bulk start/stop/restart
+BULK_CONCURRENCY = 8
+
+# Bytes read from a streamed command's pipe at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Spans kept for the Chrome trace export; histograms keep everything
+TRACE_BUFFER_EVENTS = 20000
+
+
+def load_settings():
+    """Read user settings from $XDG_CONFIG_HOME/systemd-pilot/settings.json"""
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    path = os.path.join(config_home, "systemd-pilot", "settings.json")
+    try:
+        with open(path) as f:
+            settings = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable settings file {path}: {e}")
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+class SystemdError(Exception):
+    """Raised by a backend when systemd rejects or fails a request"""
+
+
+class SpanHistogram:
+    """Count, total and power-of-two duration buckets for one span name"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}  # bit length of the duration in microseconds -> count
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        bucket = int(duration * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of spans, in seconds"""
+        wanted = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= wanted:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            # Upper bound of each bucket in microseconds -> spans in it
+            "buckets_us": {str(1 << bucket): count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class Span:
+    """One timed region; extra arguments can be attached before it ends"""
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+
+class NoSpan:
+    """Stands in for a Span while tracing is off"""
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class Tracer:
+    """Timing spans around host calls, parsing and rendering
+
+    Off unless SYSTEMD_PILOT_TRACE is set or the debug page turns it on;
+    while off, span() returns a shared no-op object. Every span feeds a
+    histogram per name, and the most recent ones are kept for export in
+    Chrome's trace format (chrome://tracing, Perfetto). If
+    SYSTEMD_PILOT_TRACE names a .json file the trace is written there on
+    exit.
+    """
+
+    def __init__(self, enabled=False, max_events=TRACE_BUFFER_EVENTS):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.histograms = {}
+        self.events = deque(maxlen=max_events)
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, start, duration, args):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = SpanHistogram()
+            histogram.add(duration)
+            self.events.append((name, start, duration, threading.get_ident(), args))
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.events.clear()
+
+    def summary(self):
+        """Histograms by span name, as plain data"""
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def chrome_trace(self):
+        """The buffered spans as a Chrome trace event document"""
+        with self.lock:
+            events = list(self.events)
+        pid = os.getpid()
+        return {
+            "traceEvents": [{
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": pid,
+                "tid": thread,
+                "args": args,
+            } for name, start, duration, thread, args in events],
+            "displayTimeUnit": "ms",
+        }
+
+    def export(self, path, chrome=False):
+        """Write the histograms, or with chrome=True the trace, to a JSON file"""
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace() if chrome else {"spans": self.summary()}, f)
+
+    def export_on_exit(self, path):
+        def export():
+            try:
+                self.export(path, chrome=True)
+            except OSError as e:
+                print(f"Failed to write trace to {path}: {e}")
+        import atexit
+        atexit.register(export)
+
+
+def traced(name):
+    """Decorator: record a span named `name` around every call"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_host_call = threading.local()
+
+
+def traced_host_call(method):
+    """Decorator for a host's run/run_batch: one span per call, with argv and output size
+
+    Overrides that fall back to a parent implementation aren't counted twice.
+    """
+    name = f"host.{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(host, cmd, *args, **kwargs):
+        if not tracer.enabled or getattr(_host_call, "active", False):
+            return method(host, cmd, *args, **kwargs)
+        _host_call.active = True
+        try:
+            batch = method.__name__ == "run_batch"
+            argv = [shlex.join(c) for c in cmd] if batch else shlex.join(cmd)
+            with tracer.span(name, host=host.address, argv=argv) as span:
+                result = method(host, cmd, *args, **kwargs)
+                results = result if batch else [result]
+                span.set(bytes_read=sum(len(r.stdout or "") + len(r.stderr or "") for r in results))
+                return result
+        finally:
+            _host_call.active = False
+    return wrapper
+
+
+def _tracer_from_environment():
+    setting = os.environ.get("SYSTEMD_PILOT_TRACE", "")
+    shared = Tracer(enabled=bool(setting))
+    if setting.endswith(".json"):
+        shared.export_on_exit(setting)
+    return shared
+
+
+tracer = _tracer_from_environment()
+
+
+class LocalHost:
+    """Run commands on this machine and capture their output
+
+    Hosts are the transports the backends run commands through; every
+    implementation provides argv/run/run_batch/close.
+    """
+
+    name = "local"
+    address = "localhost"
+    # Prefix for commands that need root, and whether the unit directories
+    # can be read straight from this process's file system
+    elevate = ["pkexec"]
+    local_files = True
+    # Whether stream() hands output over while the command runs, rather
+    # than all at once when it ends
+    streaming = True
+    # Whether this host's systemctl lists units as JSON; None until tried.
+    # Set per instance, so every backend on the host shares the answer.
+    json_listings = None
+
+    def terminal_command(self, command):
+        """The shell command that runs `command` on this host from a local terminal"""
+        return command
+
+    def argv(self, cmd):
+        """The argv that runs cmd on the host, for callers that spawn it themselves"""
+        return cmd
+
+    @traced_host_call
+    def run(self, cmd, input=None, text=True):
+        """Run one command; returns a subprocess.CompletedProcess"""
+        return subprocess.run(self.argv(cmd), input=input, capture_output=True, text=text)
+
+    @traced_host_call
+    def run_batch(self, cmds, parallel=False):
+        """Run several commands, returning their results in order"""
+        return [self.run(cmd) for cmd in cmds]
+
+    def stream(self, cmd, chunk_size=STREAM_CHUNK_SIZE):
+        """Run one command, yielding its stdout as text chunks as they arrive
+
+        Raises subprocess.CalledProcessError, with stderr, once the output
+        is exhausted if the command failed. Closing the generator early
+        kills the command.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        with tracer.span("host.stream", host=self.address, argv=shlex.join(cmd)) as span:
+            process = subprocess.Popen(self.argv(cmd), stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            bytes_read = 0
+            try:
+                while True:
+                    data = process.stdout.read(chunk_size)
+                    if not data:
+                        break
+                    bytes_read += len(data)
+                    yield decoder.decode(data)
+                # systemctl's stderr is a line or two, so it is read after stdout
+                stderr = process.stderr.read().decode("utf-8", "replace")
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                process.stderr.close()
+                process.wait()
+                span.set(bytes_read=bytes_read)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+
+    def stream_completed(self, cmd, chunk_size=STREAM_CHUNK_SIZE):
+        """stream() for transports that only return whole results: run, then hand out slices"""
+        result = self.run(cmd)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, cmd, stderr=result.stderr)
+        for start in range(0, len(result.stdout), chunk_size):
+            yield result.stdout[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FlatpakHost(LocalHost):
+    """Run host commands from inside Flatpak through one persistent worker
+
+    host_worker.py is started once with flatpak-spawn --host and then takes
+    length-prefixed JSON frames, so a command costs a pipe round trip
+    instead of a portal spawn. If the worker can't be started, commands
+    fall back to one flatpak-spawn each.
+    """
+
+    name = "flatpak"
+    # The sandbox sees its own /etc and /usr, not the host's
+    local_files = False
+    streaming = False
+    SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "host_worker.py")
+    HEADER = struct.Struct(">I")
+
+    def __init__(self):
+        self.process = None
+        self.available = True  # False once the worker failed to start
+        self.next_id = 0
+        self.pending = {}  # request id -> [threading.Event, reply]
+        self.lock = threading.Lock()
+
+    def argv(self, cmd):
+        return ["flatpak-spawn", "--host"] + cmd
+
+    def _start(self):
+        process = None
+        try:
+            with open(self.SOURCE_PATH) as f:
+                source = f.read()
+            process = subprocess.Popen(
+                self.argv(["python3", "-c", source]),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            ready = self._read_frame(process.stdout)
+        except (OSError, ValueError) as e:
+            ready = None
+            print(f"Host worker unavailable, spawning per command: {e}")
+        if not isinstance(ready, dict) or not ready.get("ready"):
+            self.available = False
+            if process is not None:
+                # Don't leave a half-started worker (or flatpak-spawn) behind
+                process.kill()
+                process.stdin.close()
+                process.stdout.close()
+                process.wait()
+            return None
+        self.process = process
+        threading.Thread(target=self._read_replies, args=(process,), daemon=True).start()
+        return process
+
+    def _read_frame(self, stream):
+        header = stream.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+            return None
+        return json.loads(stream.read(self.HEADER.unpack(header)[0]).decode("utf-8"))
+
+    def _read_replies(self, process):
+        """Hand each reply to the thread waiting for it"""
+        while True:
+            try:
+                reply = self._read_frame(process.stdout)
+            except (OSError, ValueError):
+                reply = None
+            with self.lock:
+                if reply is None:
+                    # Worker died: fail everything still waiting on it
+                    if self.process is process:
+                        self.process = None
+                    waiting, self.pending = self.pending, {}
+                    for slot in waiting.values():
+                        slot[0].set()
+                    return
+                slot = self.pending.pop(reply.get("id"), None)
+            if slot is not None:
+                slot[1] = reply
+                slot[0].set()
+
+    def _request(self, commands, parallel):
+        """Send commands to the worker and wait for its reply; None if nothing was sent"""
+        with self.lock:
+            process = self.process or self._start()
+            if process is None:
+                return None
+            self.next_id += 1
+            request_id = self.next_id
+            slot = self.pending[request_id] = [threading.Event(), None]
+            payload = json.dumps({"id": request_id, "commands": commands, "parallel": parallel}).encode("utf-8")
+            try:
+                process.stdin.write(self.HEADER.pack(len(payload)) + payload)
+                process.stdin.flush()
+            except OSError:
+                del self.pending[request_id]
+                self.process = None
+                return None
+        slot[0].wait()
+        if slot[1] is None:
+            # The commands may already have run, so they aren't run again
+            raise SystemdError("Lost the host worker before it replied; the command may or may not have run")
+        return slot[1]
+
+    @staticmethod
+    def _completed(cmd, result, text):
+        if "error" in result:
+            raise OSError(result["error"])
+        stdout = result["stdout"].encode("utf-8", "surrogateescape")
+        stderr = result["stderr"].encode("utf-8", "surrogateescape")
+        if text:
+            stdout = stdout.decode("utf-8", "replace")
+            stderr = stderr.decode("utf-8", "replace")
+        return subprocess.CompletedProcess(cmd, result["returncode"], stdout, stderr)
+
+    @traced_host_call
+    def run(self, cmd, input=None, text=True):
+        if not self.available:
+            return super().run(cmd, input=input, text=text)
+        if isinstance(input, bytes):
+            input = input.decode("utf-8", "surrogateescape")
+        reply = self._request([{"argv": cmd, "input": input}], False)
+        if reply is None:
+            # The request never reached a worker; this one command spawns directly
+            return super().run(cmd, input=input, text=text)
+        return self._completed(cmd, reply["results"][0], text)
+
+    @traced_host_call
+    def run_batch(self, cmds, parallel=False):
+        if not self.available:
+            return super().run_batch(cmds, parallel)
+        reply = self._request([{"argv": cmd, "input": None} for cmd in cmds], parallel)
+        if reply is None:
+            return super().run_batch(cmds, parallel)
+        return [self._completed(cmd, result, True) for cmd, result in zip(cmds, reply["results"])]
+
+    def stream(self, cmd, chunk_size=STREAM_CHUNK_SIZE):
+        # The worker replies with whole results; batching beats streaming here
+        if not self.available:
+            return super().stream(cmd, chunk_size)
+        return self.stream_completed(cmd, chunk_size)
+
+    def close(self):
+        with self.lock:
+            process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            process.wait()
+
+
+class SSHHost(LocalHost):
+    """Run commands on a remote machine over one multiplexed SSH connection
+
+    The first command starts a ControlMaster; every later command opens a
+    channel on it instead of connecting and authenticating again. Keys or
+    an agent must be set up, as there is no way to answer a prompt.
+    """
+
+    name = "ssh"
+    elevate = ["sudo", "-n"]
+    local_files = False
+
+    def __init__(self, destination, options=(), via=None):
+        self.destination = destination
+        self.address = destination
+        self.options = list(options)
+        # Inside Flatpak ssh itself runs on the host
+        self.via = via or LocalHost()
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join("/tmp", f"systemd-pilot-{os.getuid()}")
+        self.control_dir = os.path.join(runtime_dir, "systemd-pilot", "ssh")
+        self.lock = threading.Lock()
+        self.connected = False
+
+    def ssh_command(self, *extra):
+        return [
+            "ssh",
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={self.control_dir}/%C",
+            "-o", f"ControlPersist={SSH_CONTROL_PERSIST}",
+            "-o", "BatchMode=yes",
+            *self.options, *extra, self.destination
+        ]
+
+    def argv(self, cmd):
+        return self.via.argv(self.ssh_command() + ["--", shlex.join(cmd)])
+
+    def connect(self):
+        """Start the master connection once, so concurrent commands share it"""
+        with self.lock:
+            if self.connected:
+                return
+            os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+            with tracer.span("ssh.connect", host=self.address) as span:
+                check = subprocess.run(self.via.argv(self.ssh_command("-O", "check")), capture_output=True)
+                # A master left running by an earlier session is reused
+                span.set(reused=check.returncode == 0)
+                if check.returncode != 0:
+                    result = subprocess.run(
+                        self.via.argv(self.ssh_command("-o", "ControlMaster=yes", "-N", "-f")),
+                        capture_output=True, text=True
+                    )
+                    if result.returncode != 0:
+                        raise OSError(result.stderr.strip() or f"Cannot connect to {self.destination}")
+            self.connected = True
+
+    @traced_host_call
+    def run(self, cmd, input=None, text=True):
+        self.connect()
+        return super().run(cmd, input=input, text=text)
+
+    def stream(self, cmd, chunk_size=STREAM_CHUNK_SIZE):
+        self.connect()
+        return super().stream(cmd, chunk_size)
+
+    @traced_host_call
+    def run_batch(self, cmds, parallel=False):
+        self.connect()
+        if not parallel or len(cmds) < 2:
+            return super().run_batch(cmds, parallel)
+        # Each command is one more channel on the shared connection
+        # Imported on use: concurrent.futures pulls in logging, which the
+        # command-line mode would otherwise pay for at every start
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(len(cmds), BULK_CONCURRENCY)) as executor:
+            return list(executor.map(self.run, cmds))
+
+    def terminal_command(self, command):
+        return shlex.join(self.ssh_command("-t") + ["--", command])
+
+    def close(self):
+        with self.lock:
+            if self.connected:
+                subprocess.run(self.via.argv(self.ssh_command("-O", "exit")), capture_output=True)
+                self.connected = False
+
+
+class FakeHost(LocalHost):
+    """An in-memory machine that answers systemctl and journalctl itself
+
+    Lets multi-host views be exercised offline: configure a host with
+    "transport": "fake" and it reports `units` services after `latency`
+    seconds per command. The units look like a real machine's: mostly
+    running, some failed or inactive, template instances, loaded units
+    without a unit file, unit files that aren't loaded, and the odd very
+    long description. benchmarks/fakebin wraps it as systemctl and
+    journalctl binaries.
+    """
+
+    name = "fake"
+    elevate = []
+    local_files = False
+
+    WORDS = ("network", "session", "backup", "metrics", "cache", "proxy", "mail", "print", "audit", "sync")
+    LONG_DESCRIPTION = ("Long-running {word} daemon that keeps the shared state of every node in the "
+                        "cluster consistent, with retries, rate limiting and a description long "
+                        "enough to wrap in the list and in the details pane ({index})")
+
+    def __init__(self, label="fake", units=200, latency=0.0, journal_entries=2000):
+        self.address = f"fake:{label}"
+        self.latency = latency
+        self.journal_entries = journal_entries
+        self.lock = threading.Lock()
+        self.units = {}  # Every unit the manager can report, loaded or not
+        self.unit_files = {}  # Unit file name -> enablement state
+        self.unloaded = set()  # Units with a unit file that list-units doesn't show
+        self.files = {}  # Unit files written through the host, by path
+        # A few targets tie the services together, as on a real machine
+        for target, description in (("basic.target", "Basic System"), ("network.target", "Network"),
+                                    ("multi-user.target", "Multi-User System")):
+            self.units[target] = {'LoadState': "loaded", 'ActiveState': "active", 'SubState': "active",
+                                  'Description': description, 'After': "basic.target" if target != "basic.target" else ""}
+        wanted = []
+        previous = None
+        for index in range(units):
+            word = self.WORDS[index % len(self.WORDS)]
+            if index % 7 == 0:
+                active, sub = "failed", "failed"
+            elif index % 3 == 0:
+                active, sub = "inactive", "dead"
+            else:
+                active, sub = "active", "running"
+            if index % 11 == 5:
+                description = self.LONG_DESCRIPTION.format(word=word, index=index)
+            else:
+                description = f"Fake {word} service {index} on {label}"
+
+            if index % 97 == 96:
+                # Referenced by another unit but never installed
+                name, load, active, sub, unit_file = f"{label}-{word}-{index:05d}.service", "not-found", "inactive", "dead", None
+            elif index % 10 == 9:
+                # Instances show up in list-units; list-unit-files has the template
+                word = self.WORDS[index // 10 % len(self.WORDS)]
+                name, load = f"{label}-{word}-worker@{index:05d}.service", "loaded"
+                unit_file = f"{label}-{word}-worker@.service"
+            else:
+                name, load, unit_file = f"{label}-{word}-{index:05d}.service", "loaded", None
+                self.unit_files[name] = "enabled" if index % 2 else "disabled"
+                if active == "inactive" and index % 5 == 4:
+                    self.unloaded.add(name)
+
+            if unit_file is not None:
+                self.unit_files.setdefault(unit_file, "indirect")
+            self.units[name] = {
+                'LoadState': load,
+                'ActiveState': active,
+                'SubState': sub,
+                'Description': description,
+                'UnitFileState': self.unit_files.get(name, "static" if load == "loaded" else ""),
+                'FragmentPath': f"/etc/systemd/system/{unit_file or name}" if load == "loaded" else "",
+                # Every fourth service requires the one before it
+                'Requires': previous if index % 4 == 1 and previous else "",
+                'After': "basic.target network.target" + (f" {previous}" if index % 4 == 1 and previous else ""),
+                'Before': "",
+                'PartOf': "network.target" if word == "network" and index % 13 == 0 else "",
+                'DropInPaths': f"/etc/systemd/system/{name}.d/override.conf" if load == "loaded" and index % 6 == 2 else "",
+            }
+            if self.units[name]['UnitFileState'] == "enabled":
+                self.units[name]['Before'] = "multi-user.target"
+                wanted.append(name)
+            previous = name
+        self.units["multi-user.target"]['Wants'] = " ".join(wanted)
+
+    def cat(self, path):
+        """Return (status, stdout, stderr) for reading a unit file or drop-in"""
+        with self.lock:
+            if path in self.files:
+                return 0, self.files[path], ""
+        name = os.path.basename(path)
+        if name == "override.conf":
+            return 0, "[Service]\nEnvironment=FAKE_OVERRIDE=1\n", ""
+        unit = self.units.get(name) or next(
+            (unit for unit in self.units.values() if unit.get('FragmentPath') == path), None
+        )
+        if unit is None:
+            return 1, "", f"cat: {path}: No such file or directory\n"
+        lines = ["[Unit]", f"Description={unit['Description']}"]
+        lines += [f"{key}={unit[key]}" for key in ("Requires", "After", "Before", "PartOf") if unit.get(key)]
+        lines += ["", "[Service]", "ExecStart=/usr/bin/sleep infinity"]
+        if unit.get('UnitFileState') in ("enabled", "disabled"):
+            lines += ["", "[Install]", "WantedBy=multi-user.target"]
+        return 0, "\n".join(lines) + "\n", ""
+
+    @staticmethod
+    def columns(rows):
+        """Align rows into space-padded columns, as systemctl prints them"""
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]) - 1)]
+        return [" ".join([value.ljust(width) for value, width in zip(row, widths)] + [row[-1]]).rstrip()
+                for row in rows]
+
+    def systemctl(self, args):
+        """Return (status, stdout, stderr) for a systemctl command line"""
+        legend = "--no-legend" not in args
+        services_only = "--type=service" in args
+        json_output = "--output=json" in args
+        args = [arg for arg in args if arg not in ("--user", "--no-pager", "--plain", "--all", "--output=json",
+                                                   "--no-legend", "--type=service", "--")]
+        verb, names = args[0], args[1:]
+        if verb == "list-units":
+            rows = [(name, u['LoadState'], u['ActiveState'], u['SubState'], u['Description'])
+                    for name, u in self.units.items()
+                    if name not in self.unloaded and (name.endswith(".service") or not services_only)]
+            if json_output:
+                keys = ("unit", "load", "active", "sub", "description")
+                return 0, json.dumps([dict(zip(keys, row)) for row in rows]) + "\n", ""
+            lines = self.columns(([("UNIT", "LOAD", "ACTIVE", "SUB", "DESCRIPTION")] if legend else []) + rows)
+            if legend:
+                lines += ["", "LOAD   = Reflects whether the unit definition was properly loaded.",
+                          "ACTIVE = The high-level unit activation state, i.e. generalization of SUB.",
+                          "SUB    = The low-level unit activation state, values depend on unit type.",
+                          f"{len(rows)} loaded units listed."]
+            return 0, "\n".join(lines) + "\n", ""
+        if verb == "list-unit-files":
+            rows = [(name, state, "enabled") for name, state in self.unit_files.items()]
+            if json_output:
+                keys = ("unit_file", "state", "preset")
+                return 0, json.dumps([dict(zip(keys, row)) for row in rows]) + "\n", ""
+            lines = self.columns(([("UNIT FILE", "STATE", "PRESET")] if legend else []) + rows)
+            if legend:
+                lines += ["", f"{len(rows)} unit files listed."]
+            return 0, "\n".join(lines) + "\n", ""
+        if verb == "show":
+            properties = [arg.split("=", 1)[1].split(",") for arg in names if arg.startswith("--property=")]
+            properties = properties[0] if properties else ["Id", "Description"]
+            blocks = []
+            for name in (arg for arg in names if not arg.startswith("-")):
+                unit = dict(self.units.get(name) or {'LoadState': "not-found", 'ActiveState': "inactive",
+                                                    'SubState': "dead"}, Id=name, Names=name)
+                blocks.append("\n".join(f"{prop}={unit.get(prop, '')}" for prop in properties))
+            return 0, "\n\n".join(blocks) + "\n", ""
+        if verb == "daemon-reload":
+            return 0, "", ""
+        if verb in ("start", "stop", "restart", "enable", "disable"):
+            missing = [name for name in names if name not in self.units]
+            if missing:
+                return 5, "", f"Failed to {verb} {missing[0]}: Unit {missing[0]} not found.\n"
+            with self.lock:
+                for name in names:
+                    unit = self.units[name]
+                    if verb in ("start", "restart"):
+                        unit.update(ActiveState="active", SubState="running")
+                        self.unloaded.discard(name)
+                    elif verb == "stop":
+                        unit.update(ActiveState="inactive", SubState="dead")
+                    else:
+                        unit['UnitFileState'] = verb + "d"
+            return 0, "", ""
+        return 1, "", f"Unknown command verb {verb}.\n"
+
+    def journalctl(self, args):
+        """Return (status, stdout, stderr) for the journalctl calls the app makes"""
+        options = {}
+        flags = set()
+        position = 0
+        while position < len(args):
+            arg = args[position]
+            if arg in ("-u", "-n", "-o"):
+                options[arg] = args[position + 1]
+                position += 1
+            elif arg.startswith("--") and "=" in arg:
+                key, value = arg.split("=", 1)
+                options[key] = value
+            else:
+                flags.add(arg)
+            position += 1
+
+        unit_name = options.get("-u")
+        if unit_name not in self.units:
+            return 0, "-- No entries --\n", ""
+        # Entry i is i seconds after a fixed start, oldest first
+        newest = self.journal_entries
+        if "--after-cursor" in options:
+            newest = min(newest, int(options["--after-cursor"].rsplit("=", 1)[1]))
+        count = min(int(options.get("-n", newest)), newest)
+        indexes = range(newest - count, newest)
+        if "-r" in flags or "--reverse" in flags:
+            indexes = reversed(indexes)
+
+        identifier = unit_name.split("@")[0].removesuffix(".service")
+        pid = str(1000 + list(self.units).index(unit_name))
+        lines = []
+        for index in indexes:
+            entry = {
+                "__CURSOR": f"s=fake;i={index}",
+                "__REALTIME_TIMESTAMP": str((1700000000 + index) * 1000000),
+                "PRIORITY": "3" if index % 50 == 0 else "6",
+                "SYSLOG_IDENTIFIER": identifier,
+                "_PID": pid,
+                "MESSAGE": f"Handled request {index} in {index % 97} ms",
+            }
+            lines.append(json.dumps(entry) if options.get("-o") == "json" else format_journal_record(entry))
+        return 0, "\n".join(lines) + ("\n" if lines else ""), ""
+
+    @traced_host_call
+    def run(self, cmd, input=None, text=True):
+        if self.latency:
+            time.sleep(self.latency)
+        if cmd[0] == "systemctl":
+            status, stdout, stderr = self.systemctl(cmd[1:])
+        elif cmd[0] == "xargs":
+            # Bulk actions: one systemctl per unit read from stdin
+            lines = []
+            for name in filter(None, (input or "").split("\0")):
+                unit_status, _, unit_error = self.systemctl([cmd[-1], name])
+                lines.append(f"{unit_status}\t{name}\t{unit_error.strip()}")
+            status, stdout, stderr = 0, "\n".join(lines) + "\n", ""
+        elif cmd[0] == "journalctl":
+            status, stdout, stderr = self.journalctl(cmd[1:])
+        elif cmd[0] == "cat":
+            status, stdout, stderr = self.cat(cmd[-1])
+        elif cmd[0] == "sh" and cmd[-1].startswith(("/", "~/")) and input is not None:
+            # The unit file writer: sh -c '... cat > "$1"' sh PATH
+            with self.lock:
+                self.files[cmd[-1]] = input
+            status, stdout, stderr = 0, "", ""
+        else:
+            status, stdout, stderr = 127, "", f"{cmd[0]}: command not found\n"
+        if not text:
+            stdout, stderr = stdout.encode(), stderr.encode()
+        return subprocess.CompletedProcess(cmd, status, stdout, stderr)
+
+    def argv(self, cmd):
+        # Streaming callers get a command that ends immediately
+        return ["true"]
+
+    def stream(self, cmd, chunk_size=STREAM_CHUNK_SIZE):
+        return self.stream_completed(cmd, chunk_size)
+
+    def terminal_command(self, command):
+        return f"echo {shlex.quote('Fake host: ' + command)}; read -p 'Press Enter to close...'"
+
+
+class PrivilegedHelper:
+    """A root process started once through pkexec and reused for every privileged action
+
+    The helper (privileged_helper.py) reads one JSON request per line and
+    only accepts a fixed set of operations. It exits on its own after
+    idle_timeout seconds; the next request simply starts it again.
+    request() blocks, through the authorization prompt on first use, so
+    the window only calls it from worker threads.
+    """
+
+    SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "privileged_helper.py")
+
+    def __init__(self, run_host_command, use_pkexec=True, idle_timeout=HELPER_IDLE_TIMEOUT):
+        self.run_host_command = run_host_command
+        self.use_pkexec = use_pkexec
+        self.idle_timeout = idle_timeout
+        self.process = None
+        self.last_used = 0
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    @traced("helper.start")
+    def _start(self):
+        with open(self.SOURCE_PATH) as f:
+            source = f.read()
+        # Sent as -c so the helper also runs on the host from inside Flatpak
+        cmd = ["python3", "-c", source, str(self.idle_timeout)]
+        if self.use_pkexec:
+            cmd.insert(0, "pkexec")
+        try:
+            process = subprocess.Popen(
+                self.run_host_command(cmd),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1
+            )
+        except OSError as e:
+            raise SystemdError(f"Failed to start privileged helper: {e}") from e
+
+        # The first line is only written once pkexec authorized us
+        if process.stdout.readline().strip() != '{"ready": true}':
+            process.wait()
+            raise SystemdError("Authorization failed or was cancelled")
+        self.process = process
+
+    def _alive(self):
+        # Restart a little before the helper would time out on its own, so a
+        # request never races its exit
+        if self.process is None or self.process.poll() is not None:
+            return False
+        return time.monotonic() - self.last_used < self.idle_timeout - 5
+
+    def request(self, op, **arguments):
+        """Send one request and wait for its result; raises SystemdError on failure"""
+        with self.lock:
+            if not self._alive():
+                self.close()
+                self._start()
+            self.next_id += 1
+            message = dict(arguments, op=op, id=self.next_id)
+            try:
+                self.process.stdin.write(json.dumps(message) + "\n")
+                self.process.stdin.flush()
+                line = self.process.stdout.readline()
+            except OSError as e:
+                self.close()
+                raise SystemdError(f"Privileged helper failed: {e}") from e
+            if not line:
+                self.close()
+                raise SystemdError("Privileged helper exited unexpectedly")
+            self.last_used = time.monotonic()
+
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise SystemdError(reply.get("error") or "Privileged helper request failed")
+        return reply.get("result")
+
+    def close(self):
+        """Let the helper exit by closing its input"""
+        process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            process.wait()
+
+
+class NotJsonOutput(ValueError):
+    """The command printed something other than a JSON array"""
+
+
+JSON_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_array(chunks):
+    """Yield the elements of a JSON array whose text arrives in chunks
+
+    Only the unparsed tail is buffered, so memory follows the chunk size
+    rather than the length of the array. Elements must be objects or
+    arrays (a number cut in two by a chunk boundary would parse early).
+    Raises NotJsonOutput if the text doesn't start with "[".
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    for chunk in chunks:
+        buffer = buffer[position:] + chunk
+        position = 0
+        if not started:
+            stripped = buffer.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] != "[":
+                raise NotJsonOutput(f"Expected a JSON array, got {stripped[:40]!r}")
+            position = buffer.index("[") + 1
+            started = True
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break  # The element continues in the next chunk
+            yield value
+    if not started:
+        raise NotJsonOutput("Expected a JSON array, got no output")
+    raise ValueError("JSON array ended early")
+
+
+class SystemctlBackend:
+    """Talk to systemd by running systemctl and parsing its plain output"""
+
+    name = "systemctl"
+
+    def __init__(self, host, is_root=False, helper=None):
+        self.host = host
+        self.is_root = is_root
+        # Runs system-scope actions as root when we aren't
+        self.helper = helper
+
+    @property
+    def json_output(self):
+        """Whether the host's systemctl lists units as JSON; None until tried"""
+        return self.host.json_listings
+
+    @json_output.setter
+    def json_output(self, value):
+        self.host.json_listings = value
+
+    def _privileged(self, user):
+        """The helper to use for a system-scope action, or None to run systemctl directly"""
+        return None if user or self.is_root else self.helper
+
+    def _elevated(self, cmd, user):
+        """Prefix a system-scope command with the host's way of becoming root"""
+        return cmd if user or self.is_root else self.host.elevate + cmd
+
+    @staticmethod
+    def _output(result, check=True):
+        if check and result.returncode != 0:
+            raise SystemdError(result.stderr.strip() or f"{result.args[0]} exited with status {result.returncode}")
+        return result.stdout
+
+    def _run(self, cmd, check=True):
+        try:
+            return self._output(self.host.run(cmd), check)
+        except OSError as e:
+            raise SystemdError(str(e)) from e
+
+    def _run_batch(self, cmds, check=True):
+        """Run independent commands in one host round trip"""
+        try:
+            return [self._output(result, check) for result in self.host.run_batch(cmds, parallel=True)]
+        except OSError as e:
+            raise SystemdError(str(e)) from e
+
+    def _stream(self, cmd):
+        """Yield a command's output in chunks as it arrives"""
+        try:
+            yield from self.host.stream(cmd)
+        except subprocess.CalledProcessError as e:
+            raise SystemdError((e.stderr or "").strip() or f"{cmd[0]} exited with status {e.returncode}") from e
+        except OSError as e:
+            raise SystemdError(str(e)) from e
+
+    def _listing_outputs(self, cmds):
+        """Chunk sources for several listings: streamed one after another where
+        the host can, otherwise fetched in one round trip"""
+        if self.host.streaming:
+            return [self._stream(cmd) for cmd in cmds]
+        return [[output] for output in self._run_batch(cmds)]
+
+    @staticmethod
+    @traced("parse.show")
+    def parse_show_output(output):
+        """Split systemctl show output into one property dict per unit"""
+        blocks = []
+        current = {}
+        for line in output.splitlines():
+            if not line.strip():
+                if current:
+                    blocks.append(current)
+                    current = {}
+                continue
+            key, sep, value = line.partition("=")
+            if sep:
+                current[key] = value
+        if current:
+            blocks.append(current)
+        return blocks
+
+    @staticmethod
+    @traced("parse.list_units")
+    def parse_list_units(output, skip_not_found=False):
+        """Parse list-units --plain output into service dicts keyed by unit name"""
+        services = {}
+        for line in output.splitlines():
+            if not line.strip() or line.startswith("UNIT"):
+                continue
+
+            parts = line.split(maxsplit=4)
+            if len(parts) >= 4:
+                unit_name = parts[0]
+                if skip_not_found and parts[1] == "not-found":
+                    continue
+                if unit_name.endswith('.service'):
+                    services[unit_name] = {
+                        'name': unit_name[:-8],  # Remove '.service' suffix
+                        'full_name': unit_name,  # Keep full name for systemctl commands
+                        'load': parts[1],
+                        'active': parts[2],
+                        'sub': parts[3],
+                        'description': parts[4] if len(parts) > 4 else ''
+                    }
+        return services
+
+    def iter_unit_properties(self, unit_names, properties, user=False):
+        """Yield (chunk, properties) pairs from batched systemctl show calls"""
+        # Templates can't be loaded by name and would abort the whole batch
+        names = [name for name in unit_names if not name.endswith("@.service")]
+        fields = ["Id", "Names"] + [p for p in properties if p not in ("Id", "Names")]
+
+        for start in range(0, len(names), SHOW_BATCH_SIZE):
+            chunk = names[start:start + SHOW_BATCH_SIZE]
+            wanted = set(chunk)
+            cmd = ["systemctl"]
+            if user:
+                cmd.append("--user")
+            cmd.extend(["show", "--no-pager", f"--property={','.join(fields)}", "--"])
+            cmd.extend(chunk)
+
+            # No check: show reports what it could load even when
+            # a single unit in the batch fails
+            output = self._run(cmd, check=False)
+
+            # Blocks are matched by name rather than position so aliases
+            # (reported under their canonical Id) still resolve
+            results = {}
+            for block in self.parse_show_output(output):
+                aliases = set(block.get("Names", "").split())
+                aliases.add(block.get("Id", ""))
+                for alias in aliases & wanted:
+                    results[alias] = block
+            yield chunk, results
+
+    def list_all_units(self, user=False):
+        """Names of every loaded unit, of any type"""
+        cmd = ["systemctl"] + (["--user"] if user else []) + [
+            "list-units", "--all", "--no-pager", "--plain", "--no-legend"]
+        return [line.split(maxsplit=1)[0] for line in self._run(cmd).splitlines() if line.strip()]
+
+    def iter_dependencies(self, unit_names=None, user=False):
+        """Yield {unit: {kind: [units]} or None if not loaded} per batched show call
+
+        Covers every loaded unit unless unit_names is given.
+        """
+        if unit_names is None:
+            unit_names = self.list_all_units(user)
+        kinds = DependencyGraph.KINDS
+        for chunk, properties in self.iter_unit_properties(unit_names, ("LoadState",) + kinds, user):
+            batch = {}
+            for name in chunk:
+                props = properties.get(name)
+                if props is None or props.get("LoadState") == "not-found":
+                    batch[name] = None
+                else:
+                    batch[name] = {kind: props.get(kind, "").split() for kind in kinds}
+            yield batch
+
+    def read_unit_files(self, unit_name, user=False, fragment_path=""):
+        """Return [(path, content)] for a unit's fragment and then each drop-in, in order
+
+        A fragment_path already known (from the unit origin index) saves
+        asking systemd for it; the drop-ins are always looked up.
+        """
+        if fragment_path and self.host.local_files:
+            # The index lists aliases by their link; systemd reports the target
+            fragment_path = os.path.realpath(fragment_path)
+        wanted = ["DropInPaths"] if fragment_path else ["FragmentPath", "DropInPaths"]
+        properties = self.fetch_unit_properties([unit_name], wanted, user).get(unit_name, {})
+        fragment_path = fragment_path or properties.get("FragmentPath", "")
+        paths = [path for path in [fragment_path] + properties.get("DropInPaths", "").split() if path]
+        if not paths:
+            raise SystemdError(f"{unit_name} has no unit file")
+
+        if self.host.local_files:
+            try:
+                contents = []
+                for path in paths:
+                    with open(path) as f:
+                        contents.append(f.read())
+            except OSError as e:
+                raise SystemdError(f"Cannot read {e.filename}: {e.strerror}") from e
+        else:
+            contents = self._run_batch([["cat", "--", path] for path in paths])
+        return list(zip(paths, contents))
+
+    def fetch_unit_properties(self, unit_names, properties, user=False):
+        """Fetch properties for many units using batched systemctl show calls"""
+        results = {}
+        for _, chunk_results in self.iter_unit_properties(unit_names, properties, user):
+            results.update(chunk_results)
+        return results
+
+    @staticmethod
+    @traced("parse.list_units_json")
+    def parse_list_units_json(chunks, skip_not_found=False):
+        """Parse list-units --output=json, read incrementally, into service dicts keyed by unit name"""
+        services = {}
+        for record in iter_json_array(chunks):
+            unit_name = record.get("unit", "")
+            if not unit_name.endswith('.service'):
+                continue
+            if skip_not_found and record.get("load") == "not-found":
+                continue
+            services[unit_name] = {
+                'name': unit_name[:-8],
+                'full_name': unit_name,
+                'load': record.get("load", ""),
+                'active': record.get("active", ""),
+                'sub': record.get("sub", ""),
+                'description': record.get("description") or ''
+            }
+        return services
+
+    @staticmethod
+    @traced("parse.unit_files_json")
+    def parse_unit_files_json(chunks):
+        unit_files = {}
+        for record in iter_json_array(chunks):
+            unit_name = record.get("unit_file", "")
+            if unit_name.endswith('.service'):
+                unit_files[unit_name] = record.get("state", "")
+        return unit_files
+
+    @staticmethod
+    def list_units_command(user=False, json_output=False):
+        cmd = ["systemctl", "list-units", "--type=service", "--all", "--no-pager"]
+        cmd.append("--output=json" if json_output else "--plain")
+        if user:
+            cmd.insert(1, "--user")
+        return cmd
+
+    @staticmethod
+    def list_unit_files_command(user=False, json_output=False):
+        cmd = ["systemctl", "list-unit-files", "--type=service", "--no-pager"]
+        cmd.append("--output=json" if json_output else "--plain")
+        if user:
+            cmd.insert(1, "--user")
+        return cmd
+
+    def _listings(self, user):
+        """Return (unit files, loaded services) for a manager, as JSON where supported
+
+        The user manager's listing skips unit files (None) and units that
+        aren't found. systemd versions without JSON listings ignore
+        --output=json and print the plain table, which is detected on
+        the first successful call and remembered for the host. Failing
+        commands are errors, not a reason to stop asking for JSON.
+        """
+        if self.json_output is not False:
+            try:
+                listings = self._listings_json(user)
+            except NotJsonOutput as e:
+                if self.json_output:
+                    raise SystemdError(f"Malformed systemctl output: {e}") from e
+                self.json_output = False
+            except ValueError as e:
+                raise SystemdError(f"Malformed systemctl output: {e}") from e
+            else:
+                self.json_output = True
+                return listings
+
+        units_cmd = self.list_units_command(user)
+        if user:
+            return None, self.parse_list_units(self._run(units_cmd), skip_not_found=True)
+        files_output, units_output = self._run_batch([self.list_unit_files_command(), units_cmd])
+        return self.parse_unit_files(files_output), self.parse_list_units(units_output)
+
+    def _listings_json(self, user):
+        units_cmd = self.list_units_command(user, json_output=True)
+        if user:
+            units_output, = self._listing_outputs([units_cmd])
+            return None, self.parse_list_units_json(units_output, skip_not_found=True)
+        files_output, units_output = self._listing_outputs(
+            [self.list_unit_files_command(json_output=True), units_cmd])
+        return self.parse_unit_files_json(files_output), self.parse_list_units_json(units_output)
+
+    def list_unit_files(self, user=False):
+        """Return a dict of installed service unit files and their enablement state"""
+        if self.json_output:
+            output, = self._listing_outputs([self.list_unit_files_command(user, json_output=True)])
+            try:
+                return self.parse_unit_files_json(output)
+            except ValueError as e:
+                raise SystemdError(f"Malformed systemctl output: {e}") from e
+        return self.parse_unit_files(self._run(self.list_unit_files_command(user)))
+
+    @staticmethod
+    @traced("parse.unit_files")
+    def parse_unit_files(output):
+        unit_files = {}
+        for line in output.splitlines():
+            if not line.strip() or line.startswith("UNIT FILE"):
+                continue
+            parts = line.split(maxsplit=2)
+            if len(parts) >= 2 and parts[0].endswith('.service'):
+                unit_files[parts[0]] = parts[1]
+        return unit_files
+
+    @staticmethod
+    def _service_from_properties(unit_name, props):
+        return {
+            'name': unit_name[:-8],
+            'full_name': unit_name,
+            'load': props.get('LoadState') or 'loaded',
+            'active': props.get('ActiveState') or 'inactive',
+            'sub': props.get('SubState') or 'dead',
+            'description': props.get('Description', '')
+        }
+
+    def unit_file_paths(self, user=False):
+        """Return {unit name: fragment path} for installed service unit files"""
+        if not self.host.local_files:
+            # Another machine's directories: ask its manager, in batches
+            unit_files = self.list_unit_files(user)
+            properties = self.fetch_unit_properties(list(unit_files), ["FragmentPath"], user)
+            return {name: properties.get(name, {}).get("FragmentPath", "") for name in unit_files}
+
+        # One directory listing per search path instead of a lookup per unit;
+        # earlier directories take precedence, as they do for systemd
+        found = {}
+        for directory in reversed(USER_UNIT_DIRS if user else SYSTEM_UNIT_DIRS):
+            directory = os.path.expanduser(directory)
+            try:
+                entries = os.listdir(directory)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.endswith('.service'):
+                    found[entry] = os.path.join(directory, entry)
+        return {name: found.get(name, "") for name in self.list_unit_files(user)}
+
+    def iter_services(self, user=False):
+        """Yield lists of service dicts as each round trip completes"""
+        # Loaded units come back complete, so show them first
+        unit_files, loaded = self._listings(user)
+        yield list(loaded.values())
+        if user:
+            return
+
+        # Unit files that aren't loaded still need a description and
+        # state; fetch them with a few batched show calls
+        missing = [name for name in unit_files if name not in loaded]
+        templates = [name for name in missing if name.endswith("@.service")]
+        for chunk, properties in self.iter_unit_properties(
+                missing, ["Description", "LoadState", "ActiveState", "SubState"]):
+            yield [self._service_from_properties(name, properties.get(name, {})) for name in chunk]
+        if templates:
+            yield [self._service_from_properties(name, {}) for name in templates]
+
+    def list_services(self, user=False):
+        """Return service dicts for the system or user manager"""
+        return [service for batch in self.iter_services(user) for service in batch]
+
+    def get_services(self, unit_names, user=False):
+        """Return current service dicts for just the given units"""
+        properties = self.fetch_unit_properties(
+            unit_names, ["Description", "LoadState", "ActiveState", "SubState"], user
+        )
+        return [self._service_from_properties(name, properties.get(name, {})) for name in unit_names]
+
+    def unit_command(self, command, unit_name, user=False):
+        """Run start/stop/restart/enable/disable on a unit"""
+        helper = self._privileged(user)
+        if helper is not None:
+            helper.request("unit_command", command=command, units=[unit_name])
+            return
+        if user:
+            cmd = ["systemctl", "--user", command, unit_name]
+        else:
+            cmd = ["systemctl", command, unit_name]
+        self._run(self._elevated(cmd, user))
+
+    def bulk_command(self, command, unit_names, user=False, concurrency=BULK_CONCURRENCY):
+        """Run a command on many units; returns {unit: error message or None}"""
+        helper = self._privileged(user)
+        if helper is not None:
+            try:
+                if command in ("enable", "disable"):
+                    helper.request("unit_command", command=command, units=list(unit_names))
+                    return {name: None for name in unit_names}
+                return helper.request("bulk_command", command=command, units=list(unit_names),
+                                      concurrency=concurrency)
+            except SystemdError as e:
+                return {name: str(e) for name in unit_names}
+
+        if command in ("enable", "disable"):
+            # One call handles every unit file and reloads once
+            cmd = ["systemctl"] + (["--user"] if user else []) + [command, "--"] + list(unit_names)
+            try:
+                self._run(self._elevated(cmd, user))
+            except SystemdError as e:
+                return {name: str(e) for name in unit_names}
+            return {name: None for name in unit_names}
+
+        # A single (privileged) xargs runs the units in parallel and prints
+        # "status<TAB>unit<TAB>output" per unit, so there is one password prompt
+        systemctl = "systemctl --user" if user else "systemctl"
+        script = f'out=$({systemctl} "$0" -- "$1" 2>&1); printf "%s\\t%s\\t%s\\n" "$?" "$1" "$(echo $out)"'
+        cmd = ["xargs", "-0", "-n", "1", "-P", str(max(1, concurrency)), "sh", "-c", script, command]
+        cmd = self._elevated(cmd, user)
+
+        try:
+            output = self.host.run(cmd, input="\0".join(unit_names)).stdout
+        except (OSError, SystemdError) as e:
+            return {name: str(e) for name in unit_names}
+
+        results = {name: "No result reported (authorization cancelled?)" for name in unit_names}
+        for line in output.splitlines():
+            status, _, rest = line.partition("\t")
+            unit_name, _, message = rest.partition("\t")
+            if unit_name in results:
+                results[unit_name] = None if status == "0" else (message or f"exit status {status}")
+        return results
+
+    def daemon_reload(self, user=False):
+        """Reload the manager configuration"""
+        helper = self._privileged(user)
+        if helper is not None:
+            helper.request("daemon_reload")
+            return
+        if user:
+            cmd = ["systemctl", "--user", "daemon-reload"]
+        else:
+            cmd = ["systemctl", "daemon-reload"]
+        self._run(self._elevated(cmd, user))
+
+    @staticmethod
+    def editable_path(path, user=False):
+        """Where an edited copy of a unit file or drop-in is saved
+
+        Files already in the administrator's directory are saved in place;
+        vendor files are copied there, where they take precedence.
+        """
+        base = USER_UNIT_DIRS[0] if user else SYSTEM_UNIT_DIRS[0]
+        directory, name = os.path.split(path)
+        if directory.endswith(".d"):
+            directory, drop_in_dir = os.path.split(directory)
+            name = f"{drop_in_dir}/{name}"
+        if directory == base or (user and directory.endswith("/.config/systemd/user")):
+            return path
+        return f"{base}/{name}"
+
+    def write_unit_file(self, path, content, user=False):
+        """Save a unit file or drop-in; system files go through the privileged helper where there is one"""
+        # The helper runs on this computer's host, Flatpak or not; remote
+        # backends have none and elevate per command instead
+        helper = self._privileged(user)
+        if helper is not None:
+            helper.request("install_unit", path=path, content=content)
+            return
+        if self.host.local_files:
+            path = os.path.expanduser(path)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(content)
+            except OSError as e:
+                raise SystemdError(f"Cannot write {path}: {e.strerror}") from e
+            return
+        # "~/" is resolved by the remote shell
+        script = 'case $1 in "~/"*) set -- "$HOME/${1#??}";; esac; mkdir -p "$(dirname "$1")" && cat > "$1"'
+        cmd = self._elevated(["sh", "-c", script, "sh", path], user)
+        try:
+            self._output(self.host.run(cmd, input=content))
+        except OSError as e:
+            raise SystemdError(str(e)) from e
+
+
+class UnitVerifier:
+    """Runs systemd-analyze verify on unsaved copies of a unit's files
+
+    The copies go to a temporary directory on the unit's own host, which
+    systemd-analyze puts first on the unit search path, so a copied
+    drop-in masks the installed one of the same name. Starting a new run
+    kills the one still in progress; its result is then None.
+    """
+
+    # $1 is the unit file's name, then pairs of (relative path, content).
+    # The first line of output is the temporary directory, so messages can
+    # be mapped back to the editor's files.
+    SCRIPT = """
+d=$(mktemp -d) || exit 1
+trap 'rm -rf "$d"' EXIT
+trap 'exit 143' HUP INT TERM
+echo "$d"
+unit=$1
+shift
+while [ $# -gt 1 ]; do
+    mkdir -p "$d/$(dirname "$1")" && printf '%s' "$2" > "$d/$1" || exit 1
+    shift 2
+done
+command -v systemd-analyze >/dev/null || { echo "systemd-analyze is not installed"; exit 127; }
+systemd-analyze $SCOPE verify --man=no "$d/$unit" 2>&1
+"""
+    LOCATION = re.compile(r"^(?P<path>/\S+?):(?P<line>\d+): (?P<message>.*)$")
+
+    def __init__(self, host, unit_name, user=False):
+        self.host = host
+        self.unit_name = unit_name
+        self.user = user
+        self.lock = threading.Lock()
+        self.process = None
+        self.generation = 0
+
+    def command(self, files):
+        script = self.SCRIPT.replace("$SCOPE", "--user" if self.user else "--system")
+        cmd = ["sh", "-c", script, "sh", self.unit_name]
+        for relative, content in files:
+            cmd.extend([relative, content])
+        return cmd
+
+    def verify(self, files):
+        """Check [(relative path, content)] and return a list of diagnostics, or None if cancelled
+
+        The unit file itself must be among the files, named after the unit;
+        drop-ins are "<unit>.d/<name>.conf". Each diagnostic is a dict with
+        file (a relative path, or None), line (or None), message and severity.
+        """
+        with tracer.span("verify.run", host=self.host.address, files=len(files)) as span:
+            with self.lock:
+                self._stop()
+                self.generation += 1
+                generation = self.generation
+                try:
+                    if hasattr(self.host, "connect"):
+                        self.host.connect()
+                    process = self.process = subprocess.Popen(
+                        self.host.argv(self.command(files)), stdin=subprocess.DEVNULL,
+                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                        start_new_session=True  # Its own process group, so cancelling stops every child
+                    )
+                except OSError as e:
+                    return [{"file": None, "line": None, "message": f"Cannot run systemd-analyze: {e}",
+                             "severity": "error"}]
+
+            output, _ = process.communicate()
+            with self.lock:
+                if generation != self.generation:
+                    span.set(cancelled=True)
+                    return None  # Superseded by a newer run
+                self.process = None
+        return self.parse(output.decode("utf-8", "replace"), [relative for relative, _ in files])
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            self._stop()
+
+    def _stop(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.process = None
+
+    def parse(self, output, relatives):
+        lines = output.splitlines()
+        if not lines:
+            return []
+        directory = lines[0].rstrip("/") + "/"
+        diagnostics = []
+        for line in lines[1:]:
+            if not line.strip():
+                continue
+            file = number = None
+            match = self.LOCATION.match(line)
+            if match and match.group("path").startswith(directory):
+                relative = match.group("path")[len(directory):]
+                if relative in relatives:
+                    file, number, line = relative, int(match.group("line")), match.group("message")
+            # Whatever else mentions the copy is about the unit being edited
+            line = line.replace(directory, "")
+            diagnostics.append({
+                "file": file,
+                "line": number,
+                "message": line,
+                "severity": "warning" if "ignoring" in line.lower() else "error",
+            })
+        return diagnostics
+
+
+class TerminalResolver:
+    """Finds a terminal emulator once per session and remembers it"""
+
+    TERMINALS = [
+        {
+            'binary': 'gnome-terminal',
+            'args': ['--', 'bash', '-c']
+        },
+        {
+            'binary': 'xfce4-terminal',
+            'args': ['-e', 'bash -c']
+        },
+        {
+            'binary': 'konsole',
+            'args': ['-e', 'bash -c']
+        },
+        {
+            'binary': 'x-terminal-emulator',
+            'args': ['-e', 'bash -c']
+        }
+    ]
+
+    def __init__(self, host, in_flatpak=False, preferred=None):
+        self.host = host
+        self.in_flatpak = in_flatpak
+        self.preferred = self.parse_preference(preferred)
+        self.terminal = None
+        self.resolved = False
+        self.failed = set()  # Binaries that failed to launch this session
+
+    @classmethod
+    def parse_preference(cls, preferred):
+        """Accept "binary", "binary arg..." or {"binary": ..., "args": [...]}"""
+        if not preferred:
+            return None
+        if isinstance(preferred, dict):
+            return {'binary': preferred['binary'], 'args': list(preferred.get('args', ['-e', 'bash', '-c']))}
+        binary, *args = shlex.split(preferred)
+        for terminal in cls.TERMINALS:
+            if terminal['binary'] == binary and not args:
+                return terminal
+        return {'binary': binary, 'args': args or ['-e', 'bash', '-c']}
+
+    def candidates(self):
+        terminals = [self.preferred] if self.preferred else []
+        terminals += [t for t in self.TERMINALS if t not in terminals]
+        return [t for t in terminals if t['binary'] not in self.failed]
+
+    def get(self):
+        """Return the terminal to use, probing for one only on first use"""
+        if not self.resolved:
+            self.terminal = self.resolve()
+            self.resolved = True
+        return self.terminal
+
+    def resolve(self):
+        candidates = self.candidates()
+        if not self.in_flatpak:
+            import shutil  # Only the window resolves terminals; keep CLI startup lean
+            for terminal in candidates:
+                if shutil.which(terminal['binary']):
+                    return terminal
+            return None
+
+        # Probe every candidate on the host in one round trip
+        probe = 'for t; do command -v "$t" >/dev/null 2>&1 && { echo "$t"; exit 0; }; done; exit 1'
+        cmd = ["sh", "-c", probe, "sh"] + [t['binary'] for t in candidates]
+        result = self.host.run(cmd)
+        found = result.stdout.strip()
+        for terminal in candidates:
+            if terminal['binary'] == found:
+                return terminal
+        return None
+
+    def invalidate(self, failed_binary=None):
+        """Forget the cached terminal, skipping one that just failed"""
+        if failed_binary:
+            self.failed.add(failed_binary)
+        self.resolved = False
+        self.terminal = None
+
+
+class ServiceSnapshot:
+    """The last known services of one manager, with per-state name indexes"""
+
+    # Filter tabs answered from the indexes; "all" and "user" show everything
+    STATES = ("running", "inactive", "failed")
+
+    def __init__(self):
+        self.services = {}  # full_name -> service dict
+        self.index = {state: set() for state in self.STATES}
+        self.version = 0  # Bumped whenever a service is added, changed or removed
+        self._search_index = None
+        self._search_version = -1
+
+    @staticmethod
+    def states_of(service):
+        """Return the filter tabs a service belongs to, as the tabs have always sorted them"""
+        states = []
+        if service['active'] == "active" and service['sub'] == "running":
+            states.append("running")
+        if service['active'] == "inactive":
+            states.append("inactive")
+        if service['sub'] == "failed":
+            states.append("failed")
+        return states
+
+    def update(self, service):
+        """Store a service dict; returns True if its filter tabs changed"""
+        name = service['full_name']
+        old = self.services.get(name)
+        if old != service:
+            self.version += 1
+        old_states = self.states_of(old) if old else []
+        new_states = self.states_of(service)
+        self.services[name] = service
+        if old_states == new_states:
+            return False
+        for state in old_states:
+            self.index[state].discard(name)
+        for state in new_states:
+            self.index[state].add(name)
+        return True
+
+    def remove(self, name):
+        if self.services.pop(name, None) is not None:
+            self.version += 1
+        for names in self.index.values():
+            names.discard(name)
+
+    def matches(self, name, filter_type):
+        if filter_type in self.index:
+            return name in self.index[filter_type]
+        return True
+
+    def search_index(self):
+        """Return a search index for the current contents, rebuilding only after changes"""
+        if self._search_index is None or self._search_version != self.version:
+            self._search_index = ServiceSearchIndex(self.services)
+            self._search_version = self.version
+        return self._search_index
+
+
+class ServiceSearchIndex:
+    """Normalized service fields for ranked search, built once per snapshot"""
+
+    # Match ranks, best first
+    EXACT, PREFIX, SUBSTRING, DESCRIPTION, FUZZY = range(5)
+
+    def __init__(self, services):
+        self.entries = {
+            full_name: (
+                service['name'].lower(),
+                service['description'].lower(),
+                f"{service['active']} ({service['sub']})"
+            )
+            for full_name, service in services.items()
+        }
+        self.last_query = None
+        self.last_results = None
+
+    def search(self, query):
+        """Return {full_name: rank} for services matching query, or None for no query"""
+        query = query.strip().lower()
+        if not query:
+            return None
+
+        # Every rank is monotonic in the query, so a longer query only
+        # needs to look at what the previous one matched
+        if self.last_query and query.startswith(self.last_query):
+            candidates = self.last_results
+        else:
+            candidates = self.entries
+
+        fuzzy = re.compile(".*?".join(map(re.escape, query)))
+        results = {}
+        for full_name in candidates:
+            name, description, status = self.entries[full_name]
+            if name == query:
+                rank = self.EXACT
+            elif name.startswith(query):
+                rank = self.PREFIX
+            elif query in name:
+                rank = self.SUBSTRING
+            elif query in description or query in status:
+                rank = self.DESCRIPTION
+            elif fuzzy.search(name):
+                rank = self.FUZZY
+            else:
+                continue
+            results[full_name] = rank
+
+        self.last_query = query
+        self.last_results = results
+        return results
+
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} TB"
+
+
+class ResourceHistory:
+    """Fixed-size rings of CPU %, memory bytes and IO bytes/s for one unit"""
+
+    def __init__(self, size=SAMPLE_HISTORY):
+        self.cpu = array("d", [0.0] * size)
+        self.memory = array("d", [0.0] * size)
+        self.io = array("d", [0.0] * size)
+        self.position = 0  # Next slot to write
+        self.count = 0
+        # Raw counters from the previous pass, for rates
+        self.last_time = None
+        self.last_cpu_usec = 0
+        self.last_io_bytes = 0
+
+    def add(self, now, cpu_usec, memory, io_bytes):
+        if self.last_time is not None and now > self.last_time:
+            elapsed = now - self.last_time
+            size = len(self.cpu)
+            self.cpu[self.position] = max(0, cpu_usec - self.last_cpu_usec) / (elapsed * 1e4)
+            self.memory[self.position] = memory
+            self.io[self.position] = max(0, io_bytes - self.last_io_bytes) / elapsed
+            self.position = (self.position + 1) % size
+            self.count = min(self.count + 1, size)
+        self.last_time = now
+        self.last_cpu_usec = cpu_usec
+        self.last_io_bytes = io_bytes
+
+    def latest(self):
+        """(cpu %, memory bytes, io bytes/s) of the newest sample, or None"""
+        if not self.count:
+            return None
+        index = self.position - 1
+        return self.cpu[index], self.memory[index], self.io[index]
+
+    def series(self, values):
+        """The samples of one ring, oldest first"""
+        size = len(values)
+        start = (self.position - self.count) % size
+        return [values[(start + i) % size] for i in range(self.count)]
+
+
+class CgroupSampler:
+    """Reads per-service CPU, memory and IO straight from the cgroup v2 tree
+
+    A pass is a handful of small reads per unit and spawns nothing; units
+    without a cgroup (stopped, or not on the unified hierarchy) are skipped.
+    """
+
+    def __init__(self, root="/sys/fs/cgroup"):
+        self.root = root
+        uid = os.getuid()
+        user_manager = os.path.join(root, "user.slice", f"user-{uid}.slice", f"user@{uid}.service")
+        # Slices a unit's cgroup may sit in, most likely first. User services
+        # without a Slice= (on older systemd, all of them) sit directly
+        # under the user manager.
+        self.slices = {
+            False: [os.path.join(root, "system.slice")],
+            True: [os.path.join(user_manager, name) for name in ("app.slice", "session.slice", "background.slice")]
+            + [user_manager],
+        }
+        self.paths = {}  # (user, unit name) -> cgroup directory last found
+        self.history = {}  # unit name -> ResourceHistory
+
+    @property
+    def available(self):
+        return os.path.exists(os.path.join(self.root, "cgroup.controllers"))
+
+    @staticmethod
+    def _read(path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return os.read(fd, 4096)
+        finally:
+            os.close(fd)
+
+    def read_unit(self, directory):
+        """(cpu usage µs, memory bytes, io bytes) for one cgroup directory"""
+        cpu_usec = 0
+        for line in self._read(os.path.join(directory, "cpu.stat")).splitlines():
+            if line.startswith(b"usage_usec "):
+                cpu_usec = int(line[11:])
+                break
+        memory = int(self._read(os.path.join(directory, "memory.current")))
+        io_bytes = 0
+        try:
+            for line in self._read(os.path.join(directory, "io.stat")).splitlines():
+                for field in line.split()[1:]:
+                    if field.startswith((b"rbytes=", b"wbytes=")):
+                        io_bytes += int(field[7:])
+        except FileNotFoundError:
+            pass  # io controller not enabled for this slice
+        return cpu_usec, memory, io_bytes
+
+    def read(self, name, user):
+        key = (user, name)
+        directory = self.paths.get(key)
+        if directory is not None:
+            try:
+                return self.read_unit(directory)
+            except (OSError, ValueError):
+                del self.paths[key]
+        for slice_dir in self.slices[user]:
+            directory = os.path.join(slice_dir, name)
+            try:
+                values = self.read_unit(directory)
+            except (OSError, ValueError):
+                continue
+            self.paths[key] = directory
+            return values
+        return None
+
+    def sample(self, unit_names, user=False):
+        """Take one sample of each unit, updating its history"""
+        now = time.monotonic()
+        for name in unit_names:
+            values = self.read(name, user)
+            if values is None:
+                self.history.pop(name, None)
+                continue
+            history = self.history.get(name)
+            if history is None:
+                history = self.history[name] = ResourceHistory()
+            history.add(now, *values)
+
+    def forget(self, keep):
+        """Drop the history of units no longer sampled"""
+        for name in [name for name in self.history if name not in keep]:
+            del self.history[name]
+
+
+class UnitOriginIndex:
+    """Which manager each unit belongs to, and where its unit file lives"""
+
+    def __init__(self, system_snapshot, user_snapshot):
+        self.snapshots = {False: system_snapshot, True: user_snapshot}
+        self.paths = {False: {}, True: {}}  # unit name -> fragment path ("" if unknown)
+
+    def update_scope(self, user, paths):
+        self.paths[user] = dict(paths)
+
+    def has_unit(self, unit_name, user):
+        return unit_name in self.paths[user] or unit_name in self.snapshots[user].services
+
+    def is_user(self, unit_name, prefer_user=False):
+        """Resolve a unit to its manager; units present in both go to prefer_user's side"""
+        in_system = self.has_unit(unit_name, False)
+        in_user = self.has_unit(unit_name, True)
+        if in_system and in_user:
+            return prefer_user
+        return in_user
+
+    def fragment_path(self, unit_name, user):
+        return self.paths[user].get(unit_name, "")
+
+
+class DependencyGraph:
+    """Forward and reverse dependencies of every loaded unit of one manager
+
+    Built from one batched property fetch over all units, then kept up to
+    date a unit at a time: update() only touches the reverse entries of
+    edges that actually changed, so "who depends on X" is always a dict
+    lookup.
+    """
+
+    # Unit properties that hold dependencies, and what their reverse is called
+    KINDS = ("Requires", "Wants", "PartOf", "After", "Before")
+    REVERSE = {
+        "Requires": "RequiredBy",
+        "Wants": "WantedBy",
+        "PartOf": "ConsistsOf",
+        "After": "FollowedBy",  # Units ordered after this one
+        "Before": "PrecededBy",  # Units ordered before this one
+    }
+
+    def __init__(self):
+        self.forward = {}  # unit -> {kind: tuple of units}
+        self.reverse = {}  # unit -> {kind: set of units depending on it that way}
+        self.loaded = False  # A full fetch has been applied
+        self.loading = False
+        self.generation = 0  # Bumped per fetch so stale results are dropped
+
+    def __len__(self):
+        return len(self.forward)
+
+    def __contains__(self, unit):
+        return unit in self.forward
+
+    def update(self, unit, dependencies):
+        """Set a unit's dependencies ({kind: [units]}, or None if it's gone)
+
+        Returns the units whose forward or reverse lists changed.
+        """
+        old = self.forward.get(unit, {})
+        new = {} if dependencies is None else {
+            kind: tuple(dependencies.get(kind, ())) for kind in self.KINDS if dependencies.get(kind)
+        }
+        if old == new and (dependencies is None) == (unit not in self.forward):
+            return set()
+
+        changed = {unit}
+        for kind in self.KINDS:
+            before, after = set(old.get(kind, ())), set(new.get(kind, ()))
+            for target in before - after:
+                entry = self.reverse[target][kind]
+                entry.discard(unit)
+                if not entry:
+                    del self.reverse[target][kind]
+                    if not self.reverse[target]:
+                        del self.reverse[target]
+                changed.add(target)
+            for target in after - before:
+                self.reverse.setdefault(target, {}).setdefault(kind, set()).add(unit)
+                changed.add(target)
+
+        if dependencies is None:
+            self.forward.pop(unit, None)
+        else:
+            self.forward[unit] = new
+        return changed
+
+    def replace(self, all_dependencies):
+        """Apply a full fetch, recomputing only units whose dependencies differ"""
+        changed = set()
+        for unit in [unit for unit in self.forward if unit not in all_dependencies]:
+            changed |= self.update(unit, None)
+        for unit, dependencies in all_dependencies.items():
+            changed |= self.update(unit, dependencies)
+        self.loaded = True
+        return changed
+
+    def dependencies(self, unit):
+        """{kind: sorted units} this unit depends on"""
+        return {kind: sorted(units) for kind, units in self.forward.get(unit, {}).items()}
+
+    def dependents(self, unit):
+        """{reverse kind: sorted units} that depend on this unit"""
+        return {self.REVERSE[kind]: sorted(units) for kind, units in self.reverse.get(unit, {}).items()}
+
+
+class SnapshotCache:
+    """The last complete service list of each manager, kept on disk for the next launch
+
+    Entries are tagged with the boot ID and a fingerprint of the unit and
+    generator directories, and are ignored once either changes: after a
+    reboot, after unit files were added or edited, or after a daemon-reload
+    (which recreates the generator directories).
+    """
+
+    FIELDS = ("full_name", "load", "active", "sub", "description")
+
+    def __init__(self, address="localhost", cache_dir=None, local_files=True):
+        if cache_dir is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+            cache_dir = os.path.join(cache_home, "systemd-pilot")
+        self.cache_dir = cache_dir
+        self.address = address
+        # Only directories we can see are fingerprinted; inside a Flatpak
+        # sandbox only the boot ID is checked
+        self.local_files = local_files
+
+    def path(self, user):
+        name = re.sub(r"[^A-Za-z0-9_.@-]", "_", self.address)
+        return os.path.join(self.cache_dir, f"snapshot-{name}-{'user' if user else 'system'}.json")
+
+    @staticmethod
+    def boot_id():
+        try:
+            with open("/proc/sys/kernel/random/boot_id") as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def fingerprint(self, user):
+        """Modification times of the unit and generator directories and their files"""
+        if not self.local_files:
+            return ""
+        directories = (USER_UNIT_DIRS + USER_GENERATOR_DIRS) if user else (SYSTEM_UNIT_DIRS + SYSTEM_GENERATOR_DIRS)
+        parts = []
+        for directory in directories:
+            directory = os.path.expandvars(os.path.expanduser(directory))
+            try:
+                newest = os.stat(directory).st_mtime_ns
+                count = 0
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        count += 1
+                        newest = max(newest, entry.stat(follow_symlinks=False).st_mtime_ns)
+            except OSError:
+                continue  # Missing directories don't contribute
+            parts.append(f"{directory}:{count}:{newest}")
+        return "|".join(parts)
+
+    def load(self, user):
+        """Return (services, paths) from the cache, or None if missing or out of date"""
+        try:
+            with open(self.path(user)) as f:
+                data = json.load(f)
+            if (data.get("version") != SNAPSHOT_CACHE_VERSION
+                    or data.get("boot_id") != self.boot_id()
+                    or data.get("fingerprint") != self.fingerprint(user)):
+                return None
+            services = [dict(zip(self.FIELDS, row), name=row[0][:-8]) for row in data["services"]]
+            return services, data.get("paths", {})
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable snapshot cache {self.path(user)}: {e}")
+            return None
+
+    def save(self, user, services, paths):
+        """Write a manager's services and unit file paths, replacing the old entry atomically"""
+        data = {
+            "version": SNAPSHOT_CACHE_VERSION,
+            "boot_id": self.boot_id(),
+            "fingerprint": self.fingerprint(user),
+            "services": [[service[field] for field in self.FIELDS] for service in services],
+            "paths": paths,
+        }
+        path = self.path(user)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Failed to write snapshot cache {path}: {e}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def invalidate(self, user):
+        try:
+            os.unlink(self.path(user))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Failed to remove snapshot cache {self.path(user)}: {e}")
+
+
+class LRUCache:
+    """A small mapping that evicts the least recently used entry when full; safe across threads"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class JournalPager:
+    """Reads a unit's journal one page at a time, newest first, by cursor
+
+    Page 0 holds the newest entries; page n+1 holds the entries just older
+    than the oldest one on page n, fetched with --after-cursor in reverse
+    mode. Pages after a cursor never change, so they are cached across
+    pagers and revisiting them is free; page 0 is always read fresh.
+    """
+
+    cache = LRUCache(JOURNAL_CACHE_PAGES)
+
+    def __init__(self, host, unit_name, user=False, since=None, until=None,
+                 priority=None, page_size=JOURNAL_PAGE_SIZE):
+        self.host = host
+        self.unit_name = unit_name
+        self.user = user
+        self.since = since
+        self.until = until
+        self.priority = priority
+        self.page_size = page_size
+        # Cursor each page is read after; None is the newest page. Index n+1
+        # is known once page n has been read, None afterwards means no more.
+        self.page_cursors = [None]
+        self.complete = False
+
+    def command(self, after_cursor):
+        cmd = ["journalctl"]
+        if self.user:
+            cmd.append("--user")
+        cmd.extend(["-u", self.unit_name, "-o", "json", "--no-pager", "-r", "-n", str(self.page_size)])
+        # Filters go to journalctl so the journal does the skipping
+        if self.since:
+            cmd.append(f"--since={self.since}")
+        if self.until:
+            cmd.append(f"--until={self.until}")
+        if self.priority:
+            cmd.append(f"--priority={self.priority}")
+        if after_cursor:
+            cmd.append(f"--after-cursor={after_cursor}")
+        return cmd
+
+    def has_page(self, index):
+        return index < len(self.page_cursors)
+
+    def read_page(self, index):
+        """Return page `index` as lines ordered oldest to newest"""
+        after_cursor = self.page_cursors[index]
+        key = (self.host.address, self.unit_name, self.user, self.since, self.until, self.priority, self.page_size, after_cursor)
+        page = self.cache.get(key) if after_cursor is not None else None
+        if page is None:
+            page = self.fetch(after_cursor)
+            if after_cursor is not None:
+                self.cache.put(key, page)
+
+        lines, oldest_cursor = page
+        if index == len(self.page_cursors) - 1:
+            if oldest_cursor is None:
+                self.complete = True
+            else:
+                self.page_cursors.append(oldest_cursor)
+        return lines
+
+    def fetch(self, after_cursor):
+        result = self.host.run(self.command(after_cursor), text=False)
+        if result.returncode != 0 and not result.stdout:
+            raise SystemdError(result.stderr.decode("utf-8", "replace").strip()
+                               or f"journalctl exited with status {result.returncode}")
+
+        lines = []
+        cursor = None
+        count = 0
+        for raw in result.stdout.splitlines():
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            count += 1
+            cursor = entry.get("__CURSOR", cursor)
+            lines.append(format_journal_record(entry))
+        lines.reverse()
+
+        # A short page means the start of the journal was reached
+        return lines, (cursor if count >= self.page_size else None)
+
+    @classmethod
+    def clear_cache(cls):
+        cls.cache.clear()
+
+
+def format_journal_record(entry):
+    """Render a parsed journal record as a syslog-style line"""
+    message = entry.get("MESSAGE") or ""
+    if isinstance(message, list):  # Non-UTF-8 messages arrive as byte arrays
+        message = bytes(message).decode("utf-8", "replace")
+
+    timestamp = entry.get("__REALTIME_TIMESTAMP")
+    when = datetime.fromtimestamp(int(timestamp) / 1e6).strftime("%b %d %H:%M:%S") if timestamp else ""
+    identifier = entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM") or ""
+    pid = entry.get("_PID")
+    if pid:
+        return f"{when} {identifier}[{pid}]: {message}"
+    return f"{when} {identifier}: {message}"
+
+
+def in_flatpak():
+    """Check if the application is running inside Flatpak"""
+    return os.path.exists("/.flatpak-info")
+
+
+def host_from_settings(entry, via):
+    """Build (name, transport, backend) for a "hosts" entry in settings.json"""
+    name = entry.get("name") or entry.get("ssh")
+    transport = entry.get("transport", "ssh")
+    if transport == "fake":
+        host = FakeHost(name, units=entry.get("units", 200), latency=entry.get("latency", 0.0))
+        return name, host, SystemctlBackend(host, is_root=True)
+    if transport == "ssh" and entry.get("ssh"):
+        host = SSHHost(entry["ssh"], options=entry.get("ssh_options", ()), via=via)
+        is_root = entry.get("root", entry["ssh"].startswith("root@"))
+        return name, host, SystemctlBackend(host, is_root=is_root)
+    raise ValueError(f"Unknown transport {transport!r} or missing ssh destination")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Host-side command worker for the Flatpak build of systemd Pilot.
+
+Started once as `flatpak-spawn --host python3 -c <this file>` and kept
+running, so each host command costs one message on a pipe instead of a
+flatpak-spawn round trip through the portal.
+
+Frames in both directions are a 4-byte big-endian length followed by that
+many bytes of UTF-8 JSON. The worker first sends {"ready": true}. A request
+{"id": n, "commands": [{"argv": [...], "input": str or null}, ...],
+"parallel": bool} is answered by {"id": n, "results": [...]} with one
+{"returncode", "stdout", "stderr"} or {"error": "..."} per command, in
+order. Output is decoded with surrogateescape so arbitrary bytes survive
+the JSON round trip. Requests are handled concurrently; replies may come
+back in any order.
+
+This file must only use the standard library: it runs on the host, outside
+the sandbox.
+"""
+import json
+import struct
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HEADER = struct.Struct(">I")
+MAX_PARALLEL = 8
+
+write_lock = threading.Lock()
+
+
+def read_frame(stream):
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    payload = stream.read(HEADER.unpack(header)[0])
+    return json.loads(payload.decode("utf-8"))
+
+
+def write_frame(stream, message):
+    payload = json.dumps(message).encode("utf-8")
+    with write_lock:
+        stream.write(HEADER.pack(len(payload)) + payload)
+        stream.flush()
+
+
+def run_command(command):
+    data = command.get("input")
+    try:
+        result = subprocess.run(
+            command["argv"],
+            input=data.encode("utf-8", "surrogateescape") if data is not None else None,
+            stdin=subprocess.DEVNULL if data is None else None,
+            capture_output=True
+        )
+    except (OSError, KeyError, TypeError) as e:
+        return {"error": str(e)}
+    return {
+        "returncode": result.returncode,
+        "stdout": result.stdout.decode("utf-8", "surrogateescape"),
+        "stderr": result.stderr.decode("utf-8", "surrogateescape"),
+    }
+
+
+def handle(request, output):
+    commands = request.get("commands") or []
+    if request.get("parallel") and len(commands) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(commands), MAX_PARALLEL)) as executor:
+            results = list(executor.map(run_command, commands))
+    else:
+        results = [run_command(command) for command in commands]
+    write_frame(output, {"id": request.get("id"), "results": results})
+
+
+def main():
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    write_frame(stdout, {"ready": True})
+    while True:
+        try:
+            request = read_frame(stdin)
+        except ValueError:
+            return 1  # Lost framing; the app will start a new worker
+        if request is None:
+            return 0  # The app went away
+        threading.Thread(target=handle, args=(request, stdout), daemon=True).start()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,768 @@
 #!/usr/bin/env python3
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+# Any argument selects the command-line mode, which must not load gi
+if __name__ == "__main__" and len(sys.argv) > 1:
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-gi.require_version('GtkSource', '5')
-from gi.repository import Gtk, Adw, GLib, Gio, Gdk, Pango, GtkSource
-import subprocess
+from gi.repository import Gtk, Adw, GLib, GObject, Gio, Gdk, Pango
+import threading
 import os
-from datetime import datetime
+import re
+import json
+import signal
+import shlex
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import (
+    APP_VERSION, BULK_CONCURRENCY, SHOW_BATCH_SIZE, SYSTEM_UNIT_DIRS, USER_UNIT_DIRS,
+    load_settings, in_flatpak, host_from_settings, format_bytes, format_journal_record,
+    SystemdError, LocalHost, FlatpakHost, PrivilegedHelper, SystemctlBackend,
+    TerminalResolver, ServiceSnapshot, CgroupSampler, UnitOriginIndex, JournalPager,
+    SnapshotCache, DependencyGraph, UnitVerifier, tracer, traced,
+)
+
+# Resource sampling: base interval, slowest interval, and the share of one
+# CPU a sampling pass may use
+SAMPLE_INTERVAL_MS = 2000
+SAMPLE_MAX_INTERVAL_MS = 10000
+SAMPLE_CPU_BUDGET = 0.005
+
+# Journal lines kept by the log viewer, and bytes read from journalctl per callback
+LOG_BUFFER_LINES = 5000
+LOG_READ_CHUNK = 64 * 1024
+# Seconds journalctl gets to exit after SIGTERM before it is killed
+LOG_STOP_TIMEOUT = 2
+
+# Journal history pages kept in a history view's model at once
+JOURNAL_VIEW_PAGES = 8
+
+# Set to print how long startup took, phase by phase
+STARTUP_TIMING = bool(os.environ.get("SYSTEMD_PILOT_STARTUP_TIMING"))
+
+# Exit statuses meaning the terminal binary itself could not be run (not
+# found, not executable), as reported by flatpak-spawn or the shell
+TERMINAL_MISSING_STATUSES = (126, 127)
+
+# How long to wait after a unit directory changes before re-reading it
+UNIT_DIR_SETTLE_MS = 500
+
+# How long to gather unit signals before re-reading the affected units
+SIGNAL_COALESCE_MS = 50
+
+# Delay between the last keystroke and running the search
+SEARCH_DEBOUNCE_MS = 120
+
+# Hosts loaded at once
+HOST_FETCH_CONCURRENCY = 16
+
+# How long to wait for the jobs of a bulk action to finish
+BULK_JOB_TIMEOUT = 300
+
+# Units listed per dependency section before the rest is summarised
+DEPENDENCY_ROWS_SHOWN = 200
+
+# Pause in typing before the unit editor re-runs systemd-analyze verify
+VERIFY_DEBOUNCE_MS = 600
+
+
+class StartupTimer:
+    """Records startup milestones, relative to the start of main.py
+
+    Only active with SYSTEMD_PILOT_STARTUP_TIMING set; each milestone is
+    kept the first time it is reached and the report goes to stderr.
+    """
+
+    def __init__(self, started, enabled=False):
+        self.started = started
+        self.enabled = enabled
+        self.marks = {}
+        self.reported = False
+
+    def mark(self, name):
+        if self.enabled and name not in self.marks:
+            self.marks[name] = (time.perf_counter() - self.started) * 1000
+
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        phases = " | ".join(f"{name} {ms:.1f} ms" for name, ms in self.marks.items())
+        print(f"startup: {phases}", file=sys.stderr)
+
+
+def load_gtksource():
+    """Import GtkSource on first use; only the editors need it"""
+    gi.require_version('GtkSource', '5')
+    from gi.repository import GtkSource
+    return GtkSource
+
+
+startup = StartupTimer(STARTED, enabled=STARTUP_TIMING)
+startup.mark("imports")
+
+
+class SystemdDBusBackend:
+    """Talk to org.freedesktop.systemd1 directly over D-Bus"""
+
+    name = "dbus"
+    BUS_NAME = "org.freedesktop.systemd1"
+    OBJECT_PATH = "/org/freedesktop/systemd1"
+    MANAGER_INTERFACE = "org.freedesktop.systemd1.Manager"
+    UNIT_PATH_PREFIX = "/org/freedesktop/systemd1/unit/"
+    # Unit interface properties that map onto service dict fields
+    PROPERTY_FIELDS = {
+        "ActiveState": "active",
+        "SubState": "sub",
+        "LoadState": "load",
+        "Description": "description",
+    }
+
+    def __init__(self, system_bus, session_bus=None):
+        self.buses = {False: system_bus, True: session_bus}
+
+    @classmethod
+    def connect(cls):
+        """Return a backend if systemd is reachable on the system bus, else None"""
+        try:
+            system_bus = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+            has_owner = system_bus.call_sync(
+                "org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                "NameHasOwner", GLib.Variant("(s)", (cls.BUS_NAME,)),
+                GLib.VariantType.new("(b)"), Gio.DBusCallFlags.NONE, -1, None
+            ).unpack()[0]
+            if not has_owner:
+                return None
+        except GLib.Error as e:
+            print(f"systemd D-Bus backend unavailable: {e.message}")
+            return None
+
+        try:
+            session_bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        except GLib.Error:
+            session_bus = None
+        return cls(system_bus, session_bus)
+
+    def _call(self, user, method, parameters=None, reply_type=None, interactive=False):
+        bus = self.buses[user]
+        if bus is None:
+            raise SystemdError("No session bus available for the user manager")
+
+        flags = Gio.DBusCallFlags.NONE
+        if interactive:
+            # Let polkit ask for a password instead of failing outright
+            flags = Gio.DBusCallFlags.ALLOW_INTERACTIVE_AUTHORIZATION
+
+        try:
+            with tracer.span("dbus.call", method=method, user=user):
+                result = bus.call_sync(
+                    self.BUS_NAME, self.OBJECT_PATH, self.MANAGER_INTERFACE, method,
+                    parameters, GLib.VariantType.new(reply_type) if reply_type else None,
+                    flags, -1, None
+                )
+        except GLib.Error as e:
+            if Gio.DBusError.is_remote_error(e):
+                Gio.DBusError.strip_remote_error(e)
+            raise SystemdError(e.message) from e
+        return result.unpack() if result is not None else ()
+
+    @staticmethod
+    def _service_from_unit_info(info):
+        # (name, description, load, active, sub, following, path, job id, job type, job path)
+        unit_name = info[0]
+        return {
+            'name': unit_name[:-8],
+            'full_name': unit_name,
+            'load': info[2],
+            'active': info[3],
+            'sub': info[4],
+            'description': info[1]
+        }
+
+    def _unit_file_list(self, user):
+        try:
+            files, = self._call(user, "ListUnitFilesByPatterns",
+                                GLib.Variant("(asas)", ([], ["*.service"])), "(a(ss))")
+        except SystemdError:
+            # systemd < 238 only has the unfiltered call
+            files, = self._call(user, "ListUnitFiles", None, "(a(ss))")
+        return [(os.path.basename(path), path, state) for path, state in files
+                if path.endswith('.service')]
+
+    def list_unit_files(self, user=False):
+        """Return a dict of installed service unit files and their enablement state"""
+        return {unit_name: state for unit_name, _, state in self._unit_file_list(user)}
+
+    def unit_file_paths(self, user=False):
+        """Return {unit name: fragment path} for installed service unit files"""
+        return {unit_name: path for unit_name, path, _ in self._unit_file_list(user)}
+
+    def _list_units(self, user):
+        try:
+            units, = self._call(user, "ListUnitsByPatterns",
+                                GLib.Variant("(asas)", ([], ["*.service"])), "(a(ssssssouso))")
+        except SystemdError:
+            units, = self._call(user, "ListUnits", None, "(a(ssssssouso))")
+        return {info[0]: self._service_from_unit_info(info) for info in units if info[0].endswith('.service')}
+
+    def iter_services(self, user=False):
+        """Yield lists of service dicts as each round trip completes"""
+        if user:
+            yield [s for s in self._list_units(True).values() if s['load'] != 'not-found']
+            return
+
+        unit_files = self.list_unit_files()
+        loaded = self._list_units(False)
+        yield list(loaded.values())
+
+        missing = sorted(name for name in unit_files if name not in loaded)
+        loadable = [name for name in missing if not name.endswith("@.service")]
+        for start in range(0, len(loadable), SHOW_BATCH_SIZE):
+            chunk = loadable[start:start + SHOW_BATCH_SIZE]
+            batch = []
+            try:
+                # Loads every unit in the chunk and reports them in order
+                infos, = self._call(False, "ListUnitsByNames",
+                                    GLib.Variant("(as)", (chunk,)), "(a(ssssssouso))")
+            except SystemdError as e:
+                print(f"Failed to load unit details: {e}")
+                infos = []
+            for unit_name, info in zip(chunk, infos):
+                service = self._service_from_unit_info(info)
+                service['name'] = unit_name[:-8]
+                service['full_name'] = unit_name
+                batch.append(service)
+            # Anything the manager couldn't load keeps the defaults
+            for unit_name in chunk[len(batch):]:
+                batch.append(self._placeholder_service(unit_name))
+            yield batch
+
+        templates = [name for name in missing if name.endswith("@.service")]
+        if templates:
+            yield [self._placeholder_service(name) for name in templates]
+
+    @staticmethod
+    def _placeholder_service(unit_name):
+        return {
+            'name': unit_name[:-8],
+            'full_name': unit_name,
+            'load': 'loaded',
+            'active': 'inactive',
+            'sub': 'dead',
+            'description': ''
+        }
+
+    def list_services(self, user=False):
+        """Return service dicts for the system or user manager"""
+        return [service for batch in self.iter_services(user) for service in batch]
+
+    def get_services(self, unit_names, user=False):
+        """Return current service dicts for just the given units"""
+        loadable = [name for name in unit_names if not name.endswith("@.service")]
+        infos = []
+        if loadable:
+            infos, = self._call(user, "ListUnitsByNames",
+                                GLib.Variant("(as)", (loadable,)), "(a(ssssssouso))")
+        services = {}
+        for unit_name, info in zip(loadable, infos):
+            service = self._service_from_unit_info(info)
+            service['name'] = unit_name[:-8]
+            service['full_name'] = unit_name
+            services[unit_name] = service
+        return [services.get(name) or self._placeholder_service(name) for name in unit_names]
+
+    def unit_command(self, command, unit_name, user=False):
+        """Run start/stop/restart/enable/disable on a unit"""
+        if command in ("start", "stop", "restart"):
+            method = {"start": "StartUnit", "stop": "StopUnit", "restart": "RestartUnit"}[command]
+            self._call(user, method, GLib.Variant("(ss)", (unit_name, "replace")), "(o)", interactive=True)
+        elif command == "enable":
+            self._call(user, "EnableUnitFiles", GLib.Variant("(asbb)", ([unit_name], False, False)),
+                       "(ba(sss))", interactive=True)
+            # systemctl enable reloads the manager afterwards; match it
+            self.daemon_reload(user)
+        elif command == "disable":
+            self._call(user, "DisableUnitFiles", GLib.Variant("(asb)", ([unit_name], False)),
+                       "(a(sss))", interactive=True)
+            self.daemon_reload(user)
+        else:
+            raise SystemdError(f"Unsupported command: {command}")
+
+    def bulk_command(self, command, unit_names, user=False, concurrency=BULK_CONCURRENCY):
+        """Run a command on many units; returns {unit: error message or None}
+
+        Called from a worker thread. Jobs are queued with up to
+        `concurrency` in flight and followed through JobRemoved, which is
+        delivered on a private main context so the UI loop is not involved.
+        """
+        unit_names = list(unit_names)
+        if command in ("enable", "disable"):
+            # Unit file changes take the whole list in one call
+            try:
+                if command == "enable":
+                    self._call(user, "EnableUnitFiles", GLib.Variant("(asbb)", (unit_names, False, False)),
+                               "(ba(sss))", interactive=True)
+                else:
+                    self._call(user, "DisableUnitFiles", GLib.Variant("(asb)", (unit_names, False)),
+                               "(a(sss))", interactive=True)
+                self.daemon_reload(user)
+            except SystemdError as e:
+                return {name: str(e) for name in unit_names}
+            return {name: None for name in unit_names}
+
+        if command not in ("start", "stop", "restart"):
+            raise SystemdError(f"Unsupported command: {command}")
+        method = {"start": "StartUnit", "stop": "StopUnit", "restart": "RestartUnit"}[command]
+        bus = self.buses[user]
+        results = {}
+        jobs = {}      # job path -> unit name, while the job runs
+        finished = {}  # job path -> result, for jobs that ended before we saw their path
+
+        context = GLib.MainContext.new()
+        context.push_thread_default()
+        try:
+            def on_job_removed(connection, sender, path, interface, signal, parameters):
+                _, job_path, unit_name, result = parameters.unpack()
+                if job_path in jobs:
+                    name = jobs.pop(job_path)
+                    results[name] = None if result == "done" else f"Job {result}"
+                else:
+                    finished[job_path] = result
+
+            subscription = bus.signal_subscribe(
+                self.BUS_NAME, self.MANAGER_INTERFACE, "JobRemoved", self.OBJECT_PATH, None,
+                Gio.DBusSignalFlags.NONE, on_job_removed
+            )
+            try:
+                self._call(user, "Subscribe")
+            except SystemdError:
+                pass  # Already subscribed, or we will time out below
+
+            def queue(name):
+                try:
+                    job_path, = self._call(
+                        user, method, GLib.Variant("(ss)", (name, "replace")), "(o)", interactive=True
+                    )
+                except SystemdError as e:
+                    results[name] = str(e)
+                    return
+                if job_path in finished:
+                    result = finished.pop(job_path)
+                    results[name] = None if result == "done" else f"Job {result}"
+                else:
+                    jobs[job_path] = name
+
+            pending = list(unit_names)
+            # The first call may prompt; polkit keeps the authorization for
+            # the rest, so the remaining units never prompt again
+            if pending:
+                first = pending.pop(0)
+                queue(first)
+                error = results.get(first)
+                if error and ("denied" in error.lower() or "authenticat" in error.lower()):
+                    # Cancelled or refused: don't prompt once per unit
+                    for name in pending:
+                        results[name] = error
+                    pending = []
+
+            # Wake up at least once a second to check the deadline
+            ticker = GLib.timeout_source_new_seconds(1)
+            ticker.set_callback(lambda *args: True)
+            ticker.attach(context)
+            deadline = time.monotonic() + BULK_JOB_TIMEOUT
+            while pending or jobs:
+                while pending and len(jobs) < max(1, concurrency):
+                    queue(pending.pop(0))
+                if not jobs:
+                    continue
+                if time.monotonic() > deadline:
+                    for name in jobs.values():
+                        results[name] = "Timed out waiting for the job to finish"
+                    for name in pending:
+                        results[name] = "Timed out before the job was queued"
+                    break
+                context.iteration(True)
+
+            ticker.destroy()
+            bus.signal_unsubscribe(subscription)
+        finally:
+            context.pop_thread_default()
+        return {name: results.get(name) for name in unit_names}
+
+    def daemon_reload(self, user=False):
+        """Reload the manager configuration"""
+        self._call(user, "Reload", None, None, interactive=True)
+
+    @classmethod
+    def unit_name_from_path(cls, path):
+        """Decode a unit object path (bus label escaping) back to its unit name"""
+        label = path[len(cls.UNIT_PATH_PREFIX):]
+        return re.sub(r"_([0-9a-f]{2})", lambda m: chr(int(m.group(1), 16)), label)
+
+    def watch(self, user, callback):
+        """Subscribe to manager and unit signals on one bus
+
+        callback(user, unit_name, changes, removed, lifecycle) is called
+        from the main loop; changes maps service dict fields to new values
+        and may be empty, meaning the unit should be re-read. lifecycle is
+        True for UnitNew and UnitRemoved, which only say the unit was loaded
+        or unloaded. A unit_name of None means the whole manager reloaded.
+        """
+        bus = self.buses[user]
+        if bus is None:
+            return []
+
+        # systemd only emits unit signals once a client has subscribed
+        try:
+            self._call(user, "Subscribe")
+        except SystemdError as e:
+            print(f"Failed to subscribe to systemd signals: {e}")
+            return []
+
+        def on_manager_signal(connection, sender, path, interface, signal, parameters):
+            args = parameters.unpack()
+            if signal == "UnitNew":
+                unit_name, removed, lifecycle = args[0], False, True
+            elif signal == "UnitRemoved":
+                unit_name, removed, lifecycle = args[0], True, True
+            elif signal == "JobRemoved":
+                unit_name, removed, lifecycle = args[2], False, False
+            elif signal == "Reloading":
+                if not args[0]:  # Emitted with False once the reload finished
+                    callback(user, None, {}, False, False)
+                return
+            else:
+                return
+            if unit_name.endswith(".service"):
+                callback(user, unit_name, {}, removed, lifecycle)
+
+        def on_properties_changed(connection, sender, path, interface, signal, parameters):
+            unit_name = self.unit_name_from_path(path)
+            if not unit_name.endswith(".service"):
+                return
+            _, changed, invalidated = parameters.unpack()
+            changes = {
+                field: changed[prop]
+                for prop, field in self.PROPERTY_FIELDS.items()
+                if prop in changed
+            }
+            if changes or any(prop in invalidated for prop in self.PROPERTY_FIELDS):
+                # Invalidated-only properties carry no value; re-read the unit
+                callback(user, unit_name, changes if not invalidated else {}, False, False)
+
+        return [
+            bus.signal_subscribe(
+                self.BUS_NAME, self.MANAGER_INTERFACE, None, self.OBJECT_PATH, None,
+                Gio.DBusSignalFlags.NONE, on_manager_signal
+            ),
+            bus.signal_subscribe(
+                self.BUS_NAME, "org.freedesktop.DBus.Properties", "PropertiesChanged", None,
+                "org.freedesktop.systemd1.Unit", Gio.DBusSignalFlags.NONE, on_properties_changed
+            ),
+        ]
+
+
+class ServiceItem(GObject.Object):
+    """A service in the list model; rows bind to these as they scroll into view"""
+    __gtype_name__ = "SystemdPilotServiceItem"
+
+    FIELDS = ('name', 'full_name', 'load', 'active', 'sub', 'description')
+
+    name = GObject.Property(type=str, default="")
+    full_name = GObject.Property(type=str, default="")
+    load = GObject.Property(type=str, default="")
+    active = GObject.Property(type=str, default="")
+    sub = GObject.Property(type=str, default="")
+    description = GObject.Property(type=str, default="")
+    # Live on the item so they survive row recycling
+    expanded = GObject.Property(type=bool, default=False)
+    selected = GObject.Property(type=bool, default=False)
+
+    def __init__(self, service_data):
+        super().__init__()
+        self.update(service_data)
+
+    def update(self, service_data):
+        """Copy changed fields from a service dict, notifying only on real changes"""
+        for field in self.FIELDS:
+            value = service_data.get(field, "")
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+
+
+class ServiceRow(Adw.ExpanderRow):
+    """A recyclable row widget for ServiceItem, built once per visible slot"""
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.item = None
+        self.item_handler = None
+
+        # Details box
+        details_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        details_box.set_margin_start(12)
+        details_box.set_margin_end(12)
+        details_box.set_margin_top(6)
+        details_box.set_margin_bottom(6)
+        details_box.add_css_class("dark")
+
+        def create_detail_label():
+            label = Gtk.Label(xalign=0)
+            label.set_wrap(True)
+            label.set_wrap_mode(Pango.WrapMode.WORD_CHAR)
+            label.set_hexpand(True)
+            label.add_css_class("white")
+            details_box.append(label)
+            return label
+
+        self.description_label = create_detail_label()
+        self.load_label = create_detail_label()
+        self.active_label = create_detail_label()
+        self.sub_label = create_detail_label()
+        self.unit_file_label = create_detail_label()
+        self.resources_label = create_detail_label()
+
+        # CPU history of the last SAMPLE_HISTORY samples
+        self.history = None
+        self.sparkline = Gtk.DrawingArea()
+        self.sparkline.set_content_height(32)
+        self.sparkline.set_draw_func(self.draw_sparkline)
+        details_box.append(self.sparkline)
+
+        # Add action buttons
+        buttons_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        buttons_box.set_margin_top(6)
+        for label, tooltip, handler in (
+            ("Status", "Show detailed service status", window.on_show_status),
+            ("Start", None, window.on_start_service),
+            ("Stop", None, window.on_stop_service),
+            ("Restart", None, window.on_restart_service),
+            ("Enable", None, window.on_enable_service),
+            ("Disable", None, window.on_disable_service),
+            ("Edit", "Override settings for this unit", window.on_edit_service),
+        ):
+            buttons_box.append(self.create_button(label, tooltip, handler))
+        details_box.append(buttons_box)
+
+        # Log buttons
+        log_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        log_box.set_halign(Gtk.Align.END)
+        log_box.append(self.create_button("Dependencies", "Show what this unit depends on and what depends on it",
+                                          window.on_show_dependencies))
+        log_box.append(self.create_button("Follow Log", None, window.on_follow_log))
+        log_box.append(self.create_button("Log", None, window.on_show_log))
+        details_box.append(log_box)
+
+        # Add details to row
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.NEVER)
+        scrolled.set_child(details_box)
+        self.add_row(scrolled)
+
+        # Latest CPU and memory, filled in by the sampler while visible
+        self.usage_label = Gtk.Label()
+        self.usage_label.add_css_class("dim-label")
+        self.usage_label.add_css_class("caption")
+        self.add_suffix(self.usage_label)
+
+        # Checkbox for bulk actions
+        self.select_check = Gtk.CheckButton()
+        self.select_check.set_valign(Gtk.Align.CENTER)
+        self.select_check.set_tooltip_text("Select for bulk actions")
+        self.select_check.connect("toggled", self.on_select_toggled)
+        self.add_prefix(self.select_check)
+
+        self.connect("notify::expanded", self.on_expanded_changed)
+
+    def create_button(self, label, tooltip, handler):
+        button = Gtk.Button(label=label)
+        if tooltip:
+            button.set_tooltip_text(tooltip)
+        button.add_css_class("dark-button")
+        # Handlers keep their (button, service_name) signature; the name is
+        # looked up at click time because the row is rebound while scrolling
+        button.connect("clicked", lambda b: self.item and handler(b, self.item.name))
+        return button
+
+    def bind(self, item):
+        self.item = item
+        self.sync()
+        self.item_handler = item.connect("notify", lambda *args: self.sync())
+
+    def unbind(self):
+        if self.item is not None and self.item_handler is not None:
+            self.item.disconnect(self.item_handler)
+        self.item = None
+        self.item_handler = None
+        self.show_resources(None)
+
+    def show_resources(self, history):
+        """Show a unit's latest sample and CPU sparkline, or hide them"""
+        self.history = history
+        latest = history.latest() if history is not None else None
+        self.usage_label.set_visible(latest is not None)
+        self.resources_label.set_visible(latest is not None)
+        self.sparkline.set_visible(latest is not None)
+        if latest is None:
+            return
+        cpu, memory, io = latest
+        self.usage_label.set_text(f"{cpu:.1f}% · {format_bytes(memory)}")
+        self.resources_label.set_text(
+            f"CPU: {cpu:.1f}%   Memory: {format_bytes(memory)}   IO: {format_bytes(io)}/s"
+        )
+        if self.get_expanded():
+            self.sparkline.queue_draw()
+
+    def draw_sparkline(self, area, cr, width, height):
+        if self.history is None:
+            return
+        values = self.history.series(self.history.cpu)
+        if len(values) < 2:
+            return
+        top = max(max(values), 1.0)  # At least a 1% scale so idle units stay flat
+        step = width / (len(self.history.cpu) - 1)
+        x0 = width - step * (len(values) - 1)
+        cr.set_source_rgb(0.45, 0.82, 0.09)
+        cr.set_line_width(1.5)
+        for i, value in enumerate(values):
+            point = (x0 + i * step, height - 1 - (height - 2) * value / top)
+            if i == 0:
+                cr.move_to(*point)
+            else:
+                cr.line_to(*point)
+        cr.stroke()
+
+    def sync(self):
+        """Show the bound item's current state"""
+        item = self.item
+        self.set_title(item.name)
+        self.set_subtitle(f"{item.active} ({item.sub})")
+        if self.get_expanded() != item.expanded:
+            self.set_expanded(item.expanded)
+        if self.select_check.get_active() != item.selected:
+            self.select_check.set_active(item.selected)
+
+        self.description_label.set_text(f"Description: {item.description}")
+        self.load_label.set_text(f"Load: {item.load}")
+        self.active_label.set_text(f"Active: {item.active}")
+        if item.sub == "running":
+            self.sub_label.set_markup("Sub-state: <span foreground='#73d216'>running</span>")
+        else:
+            self.sub_label.set_text(f"Sub-state: {item.sub}")
+        unit_file = self.window.unit_file_path(item.full_name)
+        self.unit_file_label.set_visible(bool(unit_file))
+        if unit_file:
+            self.unit_file_label.set_text(f"Unit file: {unit_file}")
+
+    def on_expanded_changed(self, row, pspec):
+        if self.item is not None and self.item.expanded != self.get_expanded():
+            self.item.expanded = self.get_expanded()
+            self.window.on_item_expanded(self.item)
+
+    def on_select_toggled(self, check):
+        if self.item is not None and self.item.selected != check.get_active():
+            self.window.set_item_selected(self.item, check.get_active())
+
+
+class ServiceScope:
+    """Everything the window keeps for one manager (system or user)"""
+
+    def __init__(self, machine, user):
+        self.machine = machine  # The ManagedHost this manager runs on
+        self.user = user
+        self.snapshot = ServiceSnapshot()
+        self.store = Gio.ListStore(item_type=ServiceItem)
+        self.items = {}  # full_name -> ServiceItem in self.store
+        self.loaded = False  # Snapshot is complete and current
+        self.stale = False  # Showing the on-disk cache until a load completes
+        self.load_failed = False  # The last load ended in an error
+        self.loading = False
+        self.generation = 0  # Bumped per load so stale worker results are dropped
+        self.seen_names = set()  # Units reported by the load in progress
+        self.pending_refresh = {}  # unit name -> drop if not found, flushed in one batch
+        self.refresh_source_id = None
+
+
+class ManagedHost:
+    """A machine the window manages: its transport, backend and cached snapshots"""
+
+    def __init__(self, name, transport, backend, systemctl_backend=None):
+        self.name = name
+        self.transport = transport
+        self.backend = backend
+        # System and user managers each keep their own cached snapshot
+        self.scopes = {False: ServiceScope(self, False), True: ServiceScope(self, True)}
+        self.unit_origins = UnitOriginIndex(self.scopes[False].snapshot, self.scopes[True].snapshot)
+        # Built the first time a unit's dependencies are viewed. D-Bus has
+        # no batched property call or file access, so dependency fetches and
+        # the unit editor always go through systemctl.
+        self.dependency_graphs = {False: DependencyGraph(), True: DependencyGraph()}
+        if systemctl_backend is None:
+            systemctl_backend = backend if isinstance(backend, SystemctlBackend) else SystemctlBackend(transport)
+        self.systemctl_backend = systemctl_backend
+
+    @classmethod
+    def from_settings(cls, entry, via):
+        """Build a host from a "hosts" entry in settings.json"""
+        return cls(*host_from_settings(entry, via))
 
-APP_VERSION = "2.0.0"
 
 class SystemdManagerWindow(Adw.ApplicationWindow):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.set_default_size(800, 600)
         self.set_title("systemd Pilot")
-        self.all_services = []
         self.is_root = os.geteuid() == 0
         self.current_filter = "all"  # Track current filter
+        self.settings = load_settings()
+        # Inside Flatpak every host command goes through one persistent worker
+        self.host = FlatpakHost() if self.is_running_in_flatpak() else LocalHost()
+        # One authorization covers every privileged action until it idles out
+        self.helper = PrivilegedHelper(self.run_host_command, use_pkexec=not self.is_root)
+        self.connect("close-request", self.on_close_request)
+        # This computer first, then any machines configured in settings.json;
+        # each keeps its own snapshots and they load concurrently
+        self.local = ManagedHost("This computer", self.host, self.create_backend(),
+                                 SystemctlBackend(self.host, is_root=self.is_root, helper=self.helper))
+        self.hosts = [self.local] + self.create_remote_hosts()
+        self.machine = self.local  # The host shown in the list
+        self.fetch_pool = ThreadPoolExecutor(max_workers=HOST_FETCH_CONCURRENCY)
+        self.unit_dir_monitors = []
+        self.origin_refresh_ids = {}
+        self.selected_items = set()  # Items of the current scope ticked for bulk actions
+        self.dependency_viewers = []  # Open DependencyViewer windows, told when a graph changes
+        # Resource sampling covers only rows on screen and expanded ones
+        self.sampler = CgroupSampler()
+        self.bound_rows = {}  # ServiceItem -> ServiceRow currently showing it
+        self.expanded_items = set()
+        self.sample_source_id = None
+        # The previous session's snapshots, shown while the first load runs
+        self.snapshot_cache = SnapshotCache(local_files=self.host.local_files)
+        self.terminal_resolver = TerminalResolver(
+            self.host,
+            in_flatpak=self.is_running_in_flatpak(),
+            preferred=os.environ.get("SYSTEMD_PILOT_TERMINAL") or self.settings.get("terminal")
+        )
 
         # Set up search action
         search_action = Gio.SimpleAction.new("search", None)
         search_action.connect("activate", self.toggle_search)
         self.add_action(search_action)
 
+        # Hidden tracing page (Ctrl+Shift+D)
+        tracing_action = Gio.SimpleAction.new("tracing", None)
+        tracing_action.connect("activate", lambda action, param: TracingWindow(self).present())
+        self.add_action(tracing_action)
+
         # Main layout
         self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         self.set_content(self.main_box)
@@ -38,6 +777,13 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
         self.search_button.connect("toggled", self.on_search_toggled)
         header.pack_end(self.search_button)
 
+        # Host picker, only when there is more than one machine to manage
+        if len(self.hosts) > 1:
+            self.host_dropdown = Gtk.DropDown.new_from_strings([machine.name for machine in self.hosts])
+            self.host_dropdown.set_tooltip_text("Machine to manage")
+            self.host_dropdown.connect("notify::selected", self.on_host_changed)
+            header.pack_start(self.host_dropdown)
+
         # Create menu
         menu = Gio.Menu()
         menu.append("New Service", "app.new_service")
@@ -104,23 +850,23 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
         self.search_bar = Gtk.SearchBar()
         self.search_entry = Gtk.SearchEntry()
         self.search_entry.set_hexpand(True)
+        # The entry debounces typing before emitting search-changed
+        self.search_entry.set_search_delay(SEARCH_DEBOUNCE_MS)
         self.search_entry.connect("search-changed", self.on_search_changed)
         self.search_bar.set_child(self.search_entry)
         self.search_bar.set_key_capture_widget(self)
         self.search_bar.connect_entry(self.search_entry)
         self.main_box.append(self.search_bar)
 
-        # Create scrolled window
-        scrolled = Gtk.ScrolledWindow()
-        scrolled.set_vexpand(True)
-        self.main_box.append(scrolled)
+        # Shown while the list comes from the snapshot cache
+        self.stale_banner = Adw.Banner(title="Showing services from the last session — refreshing…")
+        self.stale_banner.connect("button-clicked", lambda banner: self.load_services())
+        self.main_box.append(self.stale_banner)
 
-        # Create list box for services
-        self.list_box = Gtk.ListBox()
-        self.list_box.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.list_box.add_css_class("boxed-list")
-        self.list_box.set_filter_func(self.filter_services)
-        scrolled.set_child(self.list_box)
+        # Loading spinner and list share a stack so neither is rebuilt
+        self.content_stack = Gtk.Stack()
+        self.content_stack.set_vexpand(True)
+        self.main_box.append(self.content_stack)
 
         # Add loading spinner
         self.spinner_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
@@ -134,13 +880,100 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
         loading_label = Gtk.Label(label="Loading services...")
         self.spinner_box.append(loading_label)
         
-        self.list_box.append(self.spinner_box)
+        self.content_stack.add_named(self.spinner_box, "loading")
         self.spinner.start()
 
-        # Load services after window is shown
+        # Service model: scope store -> filtered -> sorted -> view.
+        # Switching tabs only swaps the store or re-runs the filter.
+        self.search_results = None  # {full_name: rank} while a search is active
+        self.service_filter = Gtk.CustomFilter.new(self.filter_services)
+        self.filter_model = Gtk.FilterListModel(model=self.scopes[False].store, filter=self.service_filter)
+
+        # Plain name order normally; search results are ranked first. The
+        # ranked sorter only ever sees the (small) filtered result set.
+        self.name_sorter = Gtk.StringSorter.new(Gtk.PropertyExpression.new(ServiceItem, None, "name"))
+        self.rank_sorter = Gtk.MultiSorter()
+        self.rank_sorter.append(Gtk.CustomSorter.new(self.compare_search_rank))
+        self.rank_sorter.append(Gtk.StringSorter.new(Gtk.PropertyExpression.new(ServiceItem, None, "name")))
+        self.sorted_model = Gtk.SortListModel(model=self.filter_model, sorter=self.name_sorter)
+
+        # Rows are created only for the visible slots and rebound while scrolling
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_row_setup)
+        factory.connect("bind", self.on_row_bind)
+        factory.connect("unbind", self.on_row_unbind)
+
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.sorted_model), factory=factory)
+        self.list_view.add_css_class("service-list")
+
+        # Create scrolled window
+        self.scrolled = Gtk.ScrolledWindow()
+        self.scrolled.set_vexpand(True)
+        self.scrolled.set_child(self.list_view)
+        self.content_stack.add_named(self.scrolled, "list")
+        self.content_stack.set_visible_child_name("loading")
+
+        # Bulk actions for the selected services, shown while any are ticked
+        self.bulk_bar = Gtk.ActionBar()
+        self.bulk_bar.set_revealed(False)
+        self.bulk_label = Gtk.Label()
+        self.bulk_bar.pack_start(self.bulk_label)
+        clear_button = Gtk.Button(label="Clear")
+        clear_button.connect("clicked", lambda b: self.clear_selection())
+        self.bulk_bar.pack_start(clear_button)
+        self.bulk_buttons = []
+        for label, command in (
+            ("Start", "start"),
+            ("Stop", "stop"),
+            ("Restart", "restart"),
+            ("Enable", "enable"),
+            ("Disable", "disable"),
+        ):
+            button = Gtk.Button(label=label)
+            button.connect("clicked", self.on_bulk_action, command)
+            self.bulk_buttons.append(button)
+        for button in reversed(self.bulk_buttons):
+            self.bulk_bar.pack_end(button)
+        self.main_box.append(self.bulk_bar)
+
+        # Paint the cached list right away, then load the real state after
+        # the window is shown and diff it in
+        self.restore_cached_snapshot(self.scopes[False])
         GLib.idle_add(self.load_services)
 
-        # Add CSS provider
+        # Prefer dark before the first frame so the window doesn't flash
+        style_manager = Adw.StyleManager.get_default()
+        style_manager.set_color_scheme(Adw.ColorScheme.PREFER_DARK)
+
+        # Everything else waits until the window is on screen
+        self.add_tick_callback(self.on_first_frame)
+        startup.mark("window")
+
+    def on_first_frame(self, widget, frame_clock):
+        startup.mark("first frame")
+        GLib.idle_add(self.finish_startup)
+        return GLib.SOURCE_REMOVE
+
+    def finish_startup(self):
+        """Setup that isn't needed for the first frame"""
+        self.install_css()
+
+        # Other hosts are fetched alongside so switching to them is instant
+        for machine in self.hosts[1:]:
+            self.load_services(machine.scopes[False])
+
+        self.watch_unit_directories()
+
+        if self.sampler.available:
+            self.sample_source_id = GLib.timeout_add(SAMPLE_INTERVAL_MS, self.sample_resources)
+
+        # Follow state changes pushed by systemd instead of polling
+        if hasattr(self.local.backend, "watch"):
+            for user in (False, True):
+                self.local.backend.watch(user, self.on_unit_signal)
+        return False
+
+    def install_css(self):
         css_provider = Gtk.CssProvider()
         css_provider.load_from_data(b"""
             .dark {
@@ -193,333 +1026,430 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
             Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
         )
 
-        style_manager = Adw.StyleManager.get_default()
-        style_manager.set_color_scheme(Adw.ColorScheme.PREFER_DARK)
-
     @staticmethod
     def is_running_in_flatpak():
         """Check if the application is running inside Flatpak"""
-        return os.path.exists("/.flatpak-info")
+        return in_flatpak()
 
-    def run_host_command(self, cmd):
+    @staticmethod
+    def run_host_command(cmd):
         """Run a command on the host system, handling Flatpak if needed"""
         if SystemdManagerWindow.is_running_in_flatpak():
             return ["flatpak-spawn", "--host"] + cmd
         return cmd
 
-    def load_services(self):
-        """Load systemd services based on current filter"""
-        try:
-            if self.spinner_box.get_parent():
-                self.list_box.remove(self.spinner_box)
-
-            # For user filter, handle separately
-            if self.current_filter == "user":
-                user_cmd = ["systemctl", "--user", "list-units", "--type=service", "--all", "--no-pager", "--plain"]
-                user_output = subprocess.run(
-                    self.run_host_command(user_cmd),
-                    capture_output=True,
-                    text=True,
-                    check=True
-                ).stdout
-                self.parse_systemctl_output(user_output)
-                return
-
-            services_dict = {}  # Use dictionary to avoid duplicates
-
-            # First get all installed unit files
-            unit_files_cmd = ["systemctl", "list-unit-files", "--type=service", "--no-pager", "--plain"]
-            unit_files_output = subprocess.run(
-                self.run_host_command(unit_files_cmd),
-                capture_output=True,
-                text=True,
-                check=True
-            ).stdout
-
-            # Then get active units with their current state
-            units_cmd = ["systemctl", "list-units", "--type=service", "--all", "--no-pager", "--plain"]
-            if self.current_filter != "all":
-                if self.current_filter == "running":
-                    units_cmd.extend(["--state=active"])
-                elif self.current_filter == "inactive":
-                    units_cmd.extend(["--state=inactive"])
-                elif self.current_filter == "failed":
-                    units_cmd.extend(["--state=failed"])
-
-            units_output = subprocess.run(
-                self.run_host_command(units_cmd),
-                capture_output=True,
-                text=True,
-                check=True
-            ).stdout
-
-            # Parse unit files first (to get all installed services)
-            for line in unit_files_output.splitlines():
-                if not line.strip() or line.startswith("UNIT FILE"):
-                    continue
-                parts = line.split(maxsplit=2)
-                if len(parts) >= 2:
-                    unit_name = parts[0]
-                    if unit_name.endswith('.service'):
-                        # Get service description using systemctl show
-                        show_cmd = ["systemctl", "show", unit_name, "--property=Description"]
-                        try:
-                            desc_output = subprocess.run(
-                                self.run_host_command(show_cmd),
-                                capture_output=True,
-                                text=True,
-                                check=True
-                            ).stdout
-                            description = desc_output.strip().split("=", 1)[1] if "=" in desc_output else ""
-                        except subprocess.CalledProcessError:
-                            description = ""
-
-                        services_dict[unit_name] = {
-                            'name': unit_name[:-8],
-                            'full_name': unit_name,
-                            'load': 'loaded',
-                            'active': 'inactive',
-                            'sub': 'dead',
-                            'description': description
-                        }
-
-            # Update with current state from list-units
-            for line in units_output.splitlines():
-                if not line.strip() or line.startswith("UNIT"):
-                    continue
-                parts = line.split(maxsplit=4)
-                if len(parts) >= 4:
-                    unit_name = parts[0]
-                    if unit_name.endswith('.service'):
-                        description = parts[4] if len(parts) > 4 else services_dict.get(unit_name, {}).get('description', '')
-                        services_dict[unit_name] = {
-                            'name': unit_name[:-8],
-                            'full_name': unit_name,
-                            'load': parts[1],
-                            'active': parts[2],
-                            'sub': parts[3],
-                            'description': description
-                        }
-
-            # Convert to list and apply filters
-            services = list(services_dict.values())
-            
-            if self.current_filter != "all":
-                filtered_services = []
-                for service in services:
-                    if self.current_filter == "running" and service['active'] == "active":
-                        filtered_services.append(service)
-                    elif self.current_filter == "inactive" and service['active'] == "inactive":
-                        filtered_services.append(service)
-                    elif self.current_filter == "failed" and service['sub'] == "failed":
-                        filtered_services.append(service)
-                services = filtered_services
-
-            self.all_services = services
-            self.refresh_display()
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error loading services: {e}")
-            self.show_error_dialog("Failed to load service information")
-
-    def parse_systemctl_output(self, output):
-        """Parse systemctl output"""
-        services = []
-        for line in output.splitlines():
-            if not line.strip() or line.startswith("UNIT") or "not-found" in line:
-                continue
-                
-            parts = line.split(maxsplit=4)
-            if len(parts) >= 4:
-                unit_name = parts[0]
-                if unit_name.endswith('.service'):
-                    service_data = {
-                        'name': unit_name[:-8],  # Remove '.service' suffix
-                        'full_name': unit_name,  # Keep full name for systemctl commands
-                        'load': parts[1],
-                        'active': parts[2],
-                        'sub': parts[3],
-                        'description': parts[4] if len(parts) > 4 else ''
-                    }
-                    services.append(service_data)
-
-        self.all_services = services
+    def create_backend(self):
+        """Pick the D-Bus backend when systemd is reachable, systemctl otherwise"""
+        if os.environ.get("SYSTEMD_PILOT_BACKEND") != "systemctl":
+            backend = SystemdDBusBackend.connect()
+            if backend is not None:
+                return backend
+        return SystemctlBackend(self.host, is_root=self.is_root, helper=self.helper)
+
+    def create_remote_hosts(self):
+        """Build the extra machines listed under "hosts" in settings.json"""
+        hosts = []
+        for entry in self.settings.get("hosts", []):
+            try:
+                hosts.append(ManagedHost.from_settings(entry, via=self.host))
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Ignoring host entry {entry!r}: {e}")
+        return hosts
+
+    def on_close_request(self, window):
+        if self.sample_source_id is not None:
+            GLib.source_remove(self.sample_source_id)
+            self.sample_source_id = None
+        self.helper.close()
+        self.fetch_pool.shutdown(wait=False, cancel_futures=True)
+        for machine in self.hosts:
+            machine.transport.close()
+        return False
+
+    # The shown host's backend and snapshots
+    @property
+    def backend(self):
+        return self.machine.backend
+
+    @property
+    def scopes(self):
+        return self.machine.scopes
+
+    @property
+    def unit_origins(self):
+        return self.machine.unit_origins
+
+    @property
+    def scope(self):
+        """The scope shown by the selected filter tab"""
+        return self.scopes[self.current_filter == "user"]
+
+    def on_host_changed(self, dropdown, pspec):
+        self.machine = self.hosts[dropdown.get_selected()]
         self.refresh_display()
 
-    def create_service_row(self, service_data):
-        """Create a row for a service"""
-        row = Adw.ExpanderRow()
-        
-        # Set the service name as title
-        row.set_title(service_data['name'])
-        
-        # Set the status as subtitle
-        status_class = "service-active" if service_data['active'] == "active" else "service-inactive"
-        status_text = f"{service_data['active']} ({service_data['sub']})"
-        row.set_subtitle(status_text)
+    def load_services(self, scope=None):
+        """Fetch services in a worker thread and stream them into the list"""
+        scope = scope or self.scope
+        scope.generation += 1
+        scope.loading = True
+        scope.load_failed = False
+        scope.seen_names = set()
+        if scope is self.scope:
+            self.update_stale_banner()
+
+        # A bounded pool, so many hosts load in parallel without a thread each
+        self.fetch_pool.submit(self._load_services_worker, scope, scope.generation)
+        return False
+
+    def restore_cached_snapshot(self, scope):
+        """Fill an empty scope of this computer from the snapshot cache, marked stale"""
+        if scope.machine is not self.local or scope.items:
+            return
+        cached = self.snapshot_cache.load(scope.user)
+        if cached is None:
+            return
+        services, paths = cached
+        scope.machine.unit_origins.update_scope(scope.user, paths)
+        self.apply_services(scope, services)
+        scope.stale = True
+        if scope is self.scope:
+            startup.mark("cached data")
+            self.content_stack.set_visible_child_name("list")
+            self.update_stale_banner()
+
+    def _load_services_worker(self, scope, generation):
+        """Runs off the main loop; hands each batch back through GLib.idle_add"""
+        backend = scope.machine.backend
+        try:
+            for batch in backend.iter_services(user=scope.user):
+                if generation != scope.generation:
+                    return  # A newer load superseded this one
+                GLib.idle_add(self._on_services_batch, scope, generation, batch)
+            # Index unit origins alongside the snapshot so actions never probe
+            paths = backend.unit_file_paths(user=scope.user)
+        except SystemdError as e:
+            print(f"Error loading services from {scope.machine.name}: {e}")
+            GLib.idle_add(self._on_services_error, scope, generation)
+        except Exception as e:
+            # A bug or unexpected output must not leave the scope loading forever
+            print(f"Unexpected error loading services from {scope.machine.name}: {e!r}")
+            GLib.idle_add(self._on_services_error, scope, generation)
+        else:
+            GLib.idle_add(self._on_services_loaded, scope, generation, paths)
+
+    def _on_services_batch(self, scope, generation, batch):
+        if generation != scope.generation:
+            return False
 
-        # Details box
-        details_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
-        details_box.set_margin_start(12)
-        details_box.set_margin_end(12)
-        details_box.set_margin_top(6)
-        details_box.set_margin_bottom(6)
-        details_box.add_css_class("dark")
+        if scope is self.scope:
+            startup.mark("first data")
+            self.content_stack.set_visible_child_name("list")
+        scope.seen_names.update(service['full_name'] for service in batch)
+        self.apply_services(scope, batch)
+        return False
 
-        # Add service details
-        def create_detail_label(text):
-            # Special handling for running state in details
-            if "Sub-state: running" in text:
-                prefix, _ = text.split("running", 1)
-                label = Gtk.Label(xalign=0)
-                label.set_markup(f"{prefix}<span foreground='#73d216'>running</span>")
+    def _on_services_loaded(self, scope, generation, paths):
+        if generation != scope.generation:
+            return False
+        scope.machine.unit_origins.update_scope(scope.user, paths)
+        if scope is self.scope:
+            startup.mark("all data")
+            startup.report()
+            self.content_stack.set_visible_child_name("list")
+        self.remove_unseen_items(scope)
+        scope.loading = False
+        scope.loaded = True
+        scope.stale = False
+        if scope is self.scope:
+            self.update_stale_banner()
+        if scope.machine is self.local:
+            # Written off the main loop; the dicts are replaced, never mutated
+            self.fetch_pool.submit(
+                self.snapshot_cache.save, scope.user, list(scope.snapshot.services.values()), dict(paths)
+            )
+        return False
+
+    def _on_services_error(self, scope, generation):
+        if generation == scope.generation:
+            scope.loading = False
+            scope.load_failed = True
+            if scope is self.scope:
+                self.update_stale_banner()  # The cached list is no longer being refreshed
+            if scope.machine is self.local:
+                self.show_error_dialog("Failed to load service information")
             else:
-                label = Gtk.Label(label=text, xalign=0)
-            
-            label.set_wrap(True)
-            label.set_wrap_mode(Pango.WrapMode.WORD_CHAR)
-            label.set_hexpand(True)
-            label.add_css_class("white")
-            return label
-
-        details_box.append(create_detail_label(f"Description: {service_data['description']}"))
-        details_box.append(create_detail_label(f"Load: {service_data['load']}"))
-        details_box.append(create_detail_label(f"Active: {service_data['active']}"))
-        details_box.append(create_detail_label(f"Sub-state: {service_data['sub']}"))
-
-
-
-        # Add action buttons
-        buttons_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-        buttons_box.set_margin_top(6)
-        
-        status_button = Gtk.Button(label="Status")
-        status_button.set_tooltip_text("Show detailed service status")
-        status_button.connect("clicked", self.on_show_status, service_data['name'])
-        status_button.add_css_class("dark-button")
-        buttons_box.append(status_button)
-
-        start_button = Gtk.Button(label="Start")
-        start_button.connect("clicked", self.on_start_service, service_data['name'])
-        start_button.add_css_class("dark-button")
-        buttons_box.append(start_button)
-
-        stop_button = Gtk.Button(label="Stop")
-        stop_button.connect("clicked", self.on_stop_service, service_data['name'])
-        stop_button.add_css_class("dark-button")
-        buttons_box.append(stop_button)
-
-        restart_button = Gtk.Button(label="Restart")
-        restart_button.connect("clicked", self.on_restart_service, service_data['name'])
-        restart_button.add_css_class("dark-button")
-        buttons_box.append(restart_button)
-
-        enable_button = Gtk.Button(label="Enable")
-        enable_button.connect("clicked", self.on_enable_service, service_data['name'])
-        enable_button.add_css_class("dark-button")
-        buttons_box.append(enable_button)
-
-        disable_button = Gtk.Button(label="Disable")
-        disable_button.connect("clicked", self.on_disable_service, service_data['name'])
-        disable_button.add_css_class("dark-button")
-        buttons_box.append(disable_button)
-
-        edit_button = Gtk.Button(label="Edit")
-        edit_button.set_tooltip_text("Override settings for this unit")
-        edit_button.connect("clicked", self.on_edit_service, service_data['name'])
-        edit_button.add_css_class("dark-button")
-        buttons_box.append(edit_button)
-
-        details_box.append(buttons_box)
+                self.show_error_dialog(f"Failed to load service information from {scope.machine.name}")
+        return False
+
+    @traced("render.apply_services")
+    def apply_services(self, scope, services):
+        """Merge service dicts into a scope, touching only what changed"""
+        new_items = []
+        states_changed = False
+
+        for service in services:
+            states_changed |= scope.snapshot.update(service)
+            item = scope.items.get(service['full_name'])
+            if item is None:
+                item = ServiceItem(service)
+                scope.items[service['full_name']] = item
+                new_items.append(item)
+            else:
+                # Only changed properties notify, so only those rows redraw
+                item.update(service)
+
+        if new_items:
+            scope.store.splice(scope.store.get_n_items(), 0, new_items)
+
+        if new_items and scope is self.scope and self.search_results is not None:
+            self.update_search()
+            return
+
+        # The filter reads the state indexes, which it can't watch; re-run it
+        # when a unit moved between tabs and a state tab is showing
+        if states_changed and scope is self.scope and self.current_filter in ServiceSnapshot.STATES:
+            self.refilter()
+
+    def remove_services(self, scope, unit_names):
+        for name in unit_names:
+            scope.snapshot.remove(name)
+            item = scope.items.pop(name, None)
+            if item is not None:
+                self.set_item_selected(item, False)
+                found, position = scope.store.find(item)
+                if found:
+                    scope.store.remove(position)
+
+    def remove_unseen_items(self, scope):
+        """Drop items the finished load didn't report, splicing contiguous runs"""
+        store = scope.store
+        position = store.get_n_items()
+        while position > 0:
+            end = position
+            while position > 0 and store.get_item(position - 1).full_name not in scope.seen_names:
+                position -= 1
+            if position < end:
+                for index in range(position, end):
+                    item = store.get_item(index)
+                    self.set_item_selected(item, False)
+                    name = item.full_name
+                    del scope.items[name]
+                    scope.snapshot.remove(name)
+                store.splice(position, end - position, [])
+            else:
+                position -= 1
 
-        # Add details to row
-        scrolled = Gtk.ScrolledWindow()
-        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.NEVER)
-        scrolled.set_child(details_box)
-        row.add_row(scrolled)
+    def refresh_services(self, unit_names, user=False, drop_not_found=(), machine=None):
+        """Re-read a few units in the background and update just their rows"""
+        scope = (machine or self.machine).scopes[user]
 
-        # Create button box for actions
-        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-        button_box.set_halign(Gtk.Align.END)
-        
-        # Add Follow Log button
-        follow_log_button = Gtk.Button(label="Follow Log")
-        follow_log_button.add_css_class("dark-button")
-        follow_log_button.connect("clicked", self.on_follow_log, service_data['name'])
-        button_box.append(follow_log_button)
-
-        # Add Log button
-        log_button = Gtk.Button(label="Log")
-        log_button.add_css_class("dark-button")
-        log_button.connect("clicked", self.on_show_log, service_data['name'])
-        button_box.append(log_button)
-
-        # Status button
-        status_button = Gtk.Button(label="Status")
-        status_button.add_css_class("dark-button")
-        status_button.connect("clicked", self.on_show_status, service_data['name'])
-        button_box.append(status_button)
-
-        return row
+        def worker():
+            try:
+                services = scope.machine.backend.get_services(unit_names, user=user)
+            except SystemdError as e:
+                print(f"Error refreshing {', '.join(unit_names)}: {e}")
+                return
+            GLib.idle_add(self._on_services_refreshed, scope, services, drop_not_found)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_services_refreshed(self, scope, services, drop_not_found):
+        # Units systemd unloaded and can no longer find are gone for good
+        gone = {s['full_name'] for s in services if s['full_name'] in drop_not_found and s['load'] == "not-found"}
+        self.remove_services(scope, gone)
+        self.apply_services(scope, [s for s in services if s['full_name'] not in gone])
+        return False
+
+    def on_unit_signal(self, user, unit_name, changes, removed, lifecycle=False):
+        """Apply a systemd signal to the one service it concerns"""
+        scope = self.local.scopes[user]  # Signals come from this computer's bus
+        if not scope.loaded and not scope.loading:
+            return  # Nothing cached for this manager yet
+
+        if unit_name is None:
+            # Someone ran daemon-reload; unit files may have come or gone.
+            # The cache is rewritten once the reload's load completes.
+            self.snapshot_cache.invalidate(user)
+            self.load_services(scope)
+            self.reload_dependency_graph(self.local, user)
+            return
+
+        service = scope.snapshot.services.get(unit_name)
+        if changes and service is not None:
+            self.apply_services(scope, [dict(service, **changes)])
+            return
+
+        if service is None and (removed or scope.loading):
+            return  # Unknown unit going away, or one the running load will report
+        if lifecycle and service is not None and service['active'] == "inactive":
+            # Loading or garbage-collecting an idle unit changes nothing we
+            # show. Re-reading it would load it again, and systemd would drop
+            # it again with another signal: a loop. Jobs and property changes
+            # still report real state changes.
+            return
+
+        # Coalesce re-reads so a burst of signals costs one backend call
+        scope.pending_refresh[unit_name] = scope.pending_refresh.get(unit_name, False) or removed
+        if scope.refresh_source_id is None:
+            scope.refresh_source_id = GLib.timeout_add(SIGNAL_COALESCE_MS, self.flush_signal_refresh, scope)
+
+    def flush_signal_refresh(self, scope):
+        pending, scope.pending_refresh = scope.pending_refresh, {}
+        scope.refresh_source_id = None
+        drop_not_found = {name for name, removed in pending.items() if removed}
+        self.refresh_services(list(pending), user=scope.user, drop_not_found=drop_not_found,
+                              machine=scope.machine)
+        self.refresh_dependencies(scope.machine, scope.user, list(pending))
+        return False
+
+    def dependency_graph(self, machine, user):
+        """A manager's dependency graph, starting its bulk fetch on first use"""
+        graph = machine.dependency_graphs[user]
+        if not graph.loaded and not graph.loading:
+            self.load_dependency_graph(machine, user)
+        return graph
+
+    def reload_dependency_graph(self, machine, user):
+        """Re-fetch a graph after daemon-reload, if it was ever built"""
+        graph = machine.dependency_graphs[user]
+        if graph.loaded or graph.loading:
+            self.load_dependency_graph(machine, user)
+
+    def load_dependency_graph(self, machine, user):
+        """Fetch every unit's dependencies in the background and diff them into the graph"""
+        graph = machine.dependency_graphs[user]
+        graph.generation += 1
+        graph.loading = True
+        generation = graph.generation
+
+        def worker():
+            dependencies = {}
+            try:
+                for batch in machine.systemctl_backend.iter_dependencies(user=user):
+                    if generation != graph.generation:
+                        return  # A newer fetch superseded this one
+                    dependencies.update(batch)
+            except SystemdError as e:
+                print(f"Error loading dependencies from {machine.name}: {e}")
+                dependencies = None
+            GLib.idle_add(self._on_dependencies_loaded, graph, generation, dependencies)
+
+        self.fetch_pool.submit(worker)
+
+    def _on_dependencies_loaded(self, graph, generation, dependencies):
+        if generation != graph.generation:
+            return False
+        graph.loading = False
+        if dependencies is None:
+            self.notify_dependency_viewers(graph, None)
+            return False
+        # Only units whose edges differ from the previous fetch are touched
+        changed = graph.replace({unit: deps for unit, deps in dependencies.items() if deps is not None})
+        self.notify_dependency_viewers(graph, changed)
+        return False
+
+    def refresh_dependencies(self, machine, user, unit_names):
+        """Re-read just these units' dependencies and update their nodes"""
+        graph = machine.dependency_graphs[user]
+        if not graph.loaded:
+            return
+        generation = graph.generation
+
+        def worker():
+            updates = {}
+            try:
+                for batch in machine.systemctl_backend.iter_dependencies(unit_names, user=user):
+                    updates.update(batch)
+            except SystemdError as e:
+                print(f"Error refreshing dependencies of {', '.join(unit_names)}: {e}")
+                return
+            GLib.idle_add(self._on_dependencies_refreshed, graph, generation, updates)
+
+        self.fetch_pool.submit(worker)
+
+    def _on_dependencies_refreshed(self, graph, generation, updates):
+        if generation != graph.generation:
+            return False  # A full fetch started since; it covers these units
+        changed = set()
+        for unit, dependencies in updates.items():
+            changed |= graph.update(unit, dependencies)
+        if changed:
+            self.notify_dependency_viewers(graph, changed)
+        return False
+
+    def notify_dependency_viewers(self, graph, changed):
+        for viewer in list(self.dependency_viewers):
+            viewer.on_graph_changed(graph, changed)
+
+    @traced("render.row_setup")
+    def on_row_setup(self, factory, list_item):
+        list_item.set_activatable(False)
+        list_item.set_child(ServiceRow(self))
+
+    @traced("render.row_bind")
+    def on_row_bind(self, factory, list_item):
+        row, item = list_item.get_child(), list_item.get_item()
+        row.bind(item)
+        self.bound_rows[item] = row
+        row.show_resources(self.sampler.history.get(item.full_name))
+
+    def on_row_unbind(self, factory, list_item):
+        row = list_item.get_child()
+        if row.item is not None:
+            self.bound_rows.pop(row.item, None)
+        row.unbind()
+
+    def on_item_expanded(self, item):
+        if item.expanded:
+            self.expanded_items.add(item)
+        else:
+            self.expanded_items.discard(item)
+
+    def sample_resources(self):
+        """One sampling pass over the visible and expanded running services"""
+        self.sample_source_id = None
+        interval = SAMPLE_MAX_INTERVAL_MS
+        # Only this computer's cgroups can be read, and only while someone looks
+        if self.machine is self.local and self.is_visible():
+            scope = self.scope
+            items = [item for item in set(self.bound_rows) | self.expanded_items
+                     if item.active in ("active", "reloading", "deactivating")
+                     and scope.items.get(item.full_name) is item]
+            started = time.perf_counter()
+            self.sampler.sample([item.full_name for item in items], user=scope.user)
+            cost = time.perf_counter() - started
+            for item, row in self.bound_rows.items():
+                row.show_resources(self.sampler.history.get(item.full_name))
+
+            # Faster while a row is open, slower when unfocused, and never so
+            # fast that sampling itself costs more than its CPU budget
+            interval = SAMPLE_INTERVAL_MS // 2 if self.expanded_items & set(self.bound_rows) else SAMPLE_INTERVAL_MS
+            if not self.is_active():
+                interval *= 2
+            interval = int(min(max(interval, cost * 1000 / SAMPLE_CPU_BUDGET), SAMPLE_MAX_INTERVAL_MS))
+        self.sample_source_id = GLib.timeout_add(interval, self.sample_resources)
+        return False
 
     def run_systemctl_command(self, command, service_name):
         """Run a systemctl command with pkexec if needed"""
-        try:
-            # Get the row and its expanded state
-            row = None
-            scrolled_window = None
-            scroll_value = None
-            
-            # Find the scrolled window
-            for widget in self.main_box:
-                if isinstance(widget, Gtk.ScrolledWindow):
-                    scrolled_window = widget
-                    vadjustment = scrolled_window.get_vadjustment()
-                    scroll_value = vadjustment.get_value()
-                    break
-            
-            # Find the row
-            for child in self.list_box.observe_children():
-                if child.get_title() == service_name:
-                    row = child
-                    break
-            
-            was_expanded = row.get_expanded() if row else False
-            
-            # Check if this is a user service by listing all user services
-            is_user_service = self.check_if_user_service(service_name)
-            
-            service_name = f"{service_name}.service"  # Add .service suffix
-            
-            # Build command based on service type
-            if is_user_service:
-                cmd = ["systemctl", "--user", command, service_name]
-            else:
-                cmd = ["systemctl", command, service_name]
-                if not self.is_root:
-                    cmd.insert(0, "pkexec")
-            
-            # Run command with Flatpak handling
-            subprocess.run(self.run_host_command(cmd), check=True)
-            
-            # Use a callback to refresh all services but keep the current row expanded and scroll position
-            def refresh_and_restore():
-                self.refresh_data()
-                # Find the row again after refresh and expand it if it was expanded
-                if was_expanded:
-                    for child in self.list_box.observe_children():
-                        if child.get_title() == service_name[:-8]:  # Remove .service suffix
-                            child.set_expanded(True)
-                            # Restore scroll position
-                            if scrolled_window and scroll_value is not None:
-                                GLib.idle_add(lambda: scrolled_window.get_vadjustment().set_value(scroll_value))
-                            break
-                return False
-            
-            GLib.timeout_add(1000, refresh_and_restore)
-            
-        except subprocess.CalledProcessError as e:
-            self.show_error_dialog(f"Failed to {command} service: {e}")
+        # Check if this is a user service by listing all user services
+        is_user_service = self.check_if_user_service(service_name)
+        service_name = f"{service_name}.service"  # Add .service suffix
+        machine = self.machine
+
+        # Off the main loop: the first privileged action waits for the
+        # authorization prompt, and jobs can take a while
+        def worker():
+            try:
+                machine.backend.unit_command(command, service_name, user=is_user_service)
+            except SystemdError as e:
+                GLib.idle_add(self.show_error_dialog, f"Failed to {command} service: {e}")
+                return
+            # Only this unit's row needs to change
+            GLib.idle_add(self.refresh_services, [service_name], is_user_service, (), machine)
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def on_start_service(self, button, service_name):
         self.run_systemctl_command("start", service_name)
@@ -536,97 +1466,128 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
     def on_disable_service(self, button, service_name):
         self.run_systemctl_command("disable", service_name)
 
+    def set_item_selected(self, item, selected):
+        """Tick or untick a service for bulk actions"""
+        item.selected = selected
+        if selected:
+            self.selected_items.add(item)
+        else:
+            self.selected_items.discard(item)
+        self.update_bulk_bar()
+
+    def clear_selection(self):
+        for item in list(self.selected_items):
+            item.selected = False
+        self.selected_items.clear()
+        self.update_bulk_bar()
+
+    def update_bulk_bar(self):
+        count = len(self.selected_items)
+        self.bulk_label.set_text(f"{count} selected")
+        self.bulk_bar.set_revealed(count > 0)
+
+    def on_bulk_action(self, button, command):
+        """Run a command on every selected service with a single authorization"""
+        units = sorted(item.full_name for item in self.selected_items)
+        if not units:
+            return
+        scope = self.scope
+        concurrency = self.settings.get("bulk_concurrency", BULK_CONCURRENCY)
+        for bulk_button in self.bulk_buttons:
+            bulk_button.set_sensitive(False)
+        self.bulk_label.set_text(f"Running {command} on {len(units)} services...")
+
+        def worker():
+            try:
+                results = scope.machine.backend.bulk_command(command, units, user=scope.user,
+                                                             concurrency=concurrency)
+            except SystemdError as e:
+                results = {name: str(e) for name in units}
+            GLib.idle_add(self._on_bulk_done, command, units, scope, results)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_bulk_done(self, command, units, scope, results):
+        for button in self.bulk_buttons:
+            button.set_sensitive(True)
+        self.update_bulk_bar()
+        self.refresh_services(units, user=scope.user, machine=scope.machine)
+
+        failed = [f"{name}: {error}" for name, error in results.items() if error]
+        if failed:
+            self.show_error_dialog(
+                f"Failed to {command} {len(failed)} of {len(units)} services:\n" + "\n".join(failed)
+            )
+        return False
+
     def on_edit_service(self, button, service_name):
-        """Open systemctl edit for the service"""
+        """Open the unit file and its drop-ins in the unit editor"""
+        editor = UnitEditor(
+            self,
+            self.machine,
+            f"{service_name}.service",
+            user=self.check_if_user_service(service_name)
+        )
+        editor.present()
+
+    def edit_in_terminal(self, machine, unit_name, user):
+        """Open systemctl edit for the unit"""
         try:
-            # Get the row and its expanded state
-            row = None
-            for child in self.list_box.observe_children():
-                if child.get_title() == service_name:
-                    row = child
-                    break
-            
-            was_expanded = row.get_expanded() if row else False
-            
-            # Check if this is a user service
-            is_user_service = self.check_if_user_service(service_name)
-            service_name = f"{service_name}.service"
-            
-            # Build the edit command based on service type
-            if is_user_service:
-                edit_cmd = f"systemctl --user edit {service_name}; read -p 'Press Enter to close...'"
+            # Build the edit command based on service type; in a terminal
+            # the host's elevation tool may prompt (sudo without -n)
+            transport = machine.transport
+            if user:
+                edit_cmd = f"systemctl --user edit {unit_name}"
             else:
-                edit_cmd = f"pkexec systemctl edit {service_name}; read -p 'Press Enter to close...'"
-            
-            terminal = self.get_terminal_command()
-            if terminal is None:
-                self.show_error_dialog("No suitable terminal emulator found. Please install gnome-terminal, xfce4-terminal, or konsole.")
-                return
+                edit_cmd = shlex.join(transport.elevate[:1] + ["systemctl", "edit", unit_name])
             
-            # Build the complete command
-            terminal_cmd = [terminal['binary']]
-            terminal_cmd.extend(terminal['args'])
-            terminal_cmd.append(edit_cmd)
-            
-            # Use run_host_command for the complete command
-            cmd = self.run_host_command(terminal_cmd)
-            
-            GLib.spawn_async(
-                argv=cmd,
-                flags=GLib.SpawnFlags.SEARCH_PATH | GLib.SpawnFlags.DO_NOT_REAP_CHILD,
-                child_setup=None,
-                user_data=None
-            )
-            
-            # Use a callback to restore expanded state after edit
-            def restore_expanded_state():
-                if was_expanded:
-                    for child in self.list_box.observe_children():
-                        if child.get_title() == service_name[:-8]:
-                            child.set_expanded(True)
-                            break
-                return False
-            
-            GLib.timeout_add(1000, restore_expanded_state)
+            self.launch_in_terminal(f"{transport.terminal_command(edit_cmd)}; read -p 'Press Enter to close...'")
             
         except GLib.Error as e:
             self.show_error_dialog(f"Failed to edit service: {e.message}")
 
     def refresh_data(self, *args):
         """Refresh the service data"""
+        # Hidden scopes, on every host, reload the next time they are shown
+        for machine in self.hosts:
+            for scope in machine.scopes.values():
+                if scope is not self.scope:
+                    scope.loaded = False
         self.load_services()
 
     def on_search_toggled(self, button):
         self.search_bar.set_search_mode(button.get_active())
 
     def on_search_changed(self, entry):
-        self.list_box.invalidate_filter()
-
-    def filter_services(self, row):
+        self.update_search()
+
+    @traced("filter.search")
+    def update_search(self):
+        """Run the search against the current scope's index and show the results"""
+        index = self.scope.snapshot.search_index()
+        self.search_results = index.search(self.search_entry.get_text())
+        self.sorted_model.set_sorter(self.name_sorter if self.search_results is None else self.rank_sorter)
+        if self.search_results is not None:
+            self.rank_sorter.changed(Gtk.SorterChange.DIFFERENT)
+        self.refilter()
+
+    def refilter(self):
+        """Re-run the list filter over every item of the shown scope"""
+        with tracer.span("filter.pass", items=self.scope.store.get_n_items()):
+            self.service_filter.changed(Gtk.FilterChange.DIFFERENT)
+
+    def compare_search_rank(self, item1, item2, *args):
+        rank1 = self.search_results.get(item1.full_name, 0)
+        rank2 = self.search_results.get(item2.full_name, 0)
+        return (rank1 > rank2) - (rank1 < rank2)
+
+    def filter_services(self, item):
         """Filter services based on search text and current filter"""
-        if not hasattr(row, 'get_title'):
-            return True
-
-        # First apply search filter
-        show_by_search = True
-        if self.search_entry.get_text():
-            search_text = self.search_entry.get_text().lower()
-            title = row.get_title().lower()
-            subtitle = row.get_subtitle().lower()
-            show_by_search = search_text in title or search_text in subtitle
-
-        # Then apply status filter
-        show_by_status = True
-        if self.current_filter != "all":
-            subtitle = row.get_subtitle().lower()
-            if self.current_filter == "running":
-                show_by_status = "running" in subtitle
-            elif self.current_filter == "inactive":
-                show_by_status = "inactive" in subtitle
-            elif self.current_filter == "failed":
-                show_by_status = "failed" in subtitle
-
-        return show_by_search and show_by_status
+        # Status tabs are a set lookup in the snapshot's state index
+        if not self.scope.snapshot.matches(item.full_name, self.current_filter):
+            return False
+        # Search results come precomputed from the index
+        return self.search_results is None or item.full_name in self.search_results
 
     def show_error_dialog(self, message):
         dialog = Adw.MessageDialog(
@@ -637,17 +1598,39 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
         dialog.add_response("ok", "_OK")
         dialog.present()
 
+    @traced("render.refresh_display")
     def refresh_display(self):
-        """Update the display with the current service data"""
-        while True:
-            row = self.list_box.get_first_child()
-            if row is None:
-                break
-            self.list_box.remove(row)
-
-        for service_data in self.all_services:
-            row = self.create_service_row(service_data)
-            self.list_box.append(row)
+        """Show the selected scope's cached snapshot through the current filter"""
+        scope = self.scope
+        if self.filter_model.get_model() is not scope.store:
+            self.clear_selection()  # Bulk actions run against one manager
+            self.sampler.forget(())  # Histories belong to the previous manager
+            self.filter_model.set_model(scope.store)
+        if self.search_results is not None:
+            self.update_search()  # Results belong to the previous scope's index
+        else:
+            self.refilter()
+
+        if not scope.loaded and not scope.loading:
+            # First visit (or stale after a refresh): fetch this manager once,
+            # showing last session's list meanwhile if there is one
+            self.restore_cached_snapshot(scope)
+            self.content_stack.set_visible_child_name("list" if scope.items else "loading")
+            self.load_services(scope)
+        elif scope.store.get_n_items() or scope.loaded:
+            self.content_stack.set_visible_child_name("list")
+        self.update_stale_banner()
+
+    def update_stale_banner(self):
+        """Say whether the visible cached list is being refreshed or failed to refresh"""
+        scope = self.scope
+        if scope.load_failed:
+            self.stale_banner.set_title("Showing services from the last session — loading the current list failed")
+            self.stale_banner.set_button_label("Retry")
+        else:
+            self.stale_banner.set_title("Showing services from the last session — refreshing…")
+            self.stale_banner.set_button_label(None)
+        self.stale_banner.set_revealed(scope.stale)
 
     def toggle_search(self, action, param):
         self.search_button.set_active(not self.search_button.get_active())
@@ -661,20 +1644,30 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
                     btn.set_active(False)
             
             self.current_filter = filter_type
-            self.refresh_data()  # Reload with new filter
+            self.refresh_display()  # Served from the cached snapshot
 
     def on_daemon_reload(self, button):
         """Reload systemd daemon configuration"""
-        try:
-            cmd = ["systemctl", "daemon-reload"]
-            if not self.is_root:
-                cmd.insert(0, "pkexec")
-            
-            subprocess.run(cmd, check=True)
-            self.refresh_data()  # Refresh the service list
-            
-        except subprocess.CalledProcessError as e:
-            self.show_error_dialog(f"Failed to reload daemon: {e}")
+        machine = self.machine
+
+        def worker():
+            try:
+                machine.backend.daemon_reload()
+            except SystemdError as e:
+                GLib.idle_add(self.show_error_dialog, f"Failed to reload daemon: {e}")
+                return
+            GLib.idle_add(self.on_manager_reloaded, machine, False)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_manager_reloaded(self, machine, user):
+        """Drop what a daemon-reload made stale and refresh the service list"""
+        if machine is self.local:
+            self.snapshot_cache.invalidate(user)
+        if machine is not self.local or not hasattr(machine.backend, "watch"):
+            # No Reloading signal will arrive for this manager
+            self.reload_dependency_graph(machine, user)
+        self.refresh_data()
 
     def on_show_status(self, button, service_name):
         """Show detailed status of the service"""
@@ -682,26 +1675,10 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
             service_file = f"{service_name}.service"
             is_user_service = self.check_if_user_service(service_name)
             # Simple status command without pkexec, just like running it in terminal
-            status_cmd = f"systemctl {'--user ' if is_user_service else ''}status {service_file}; read -p 'Press Enter to close...'"
+            status_cmd = f"systemctl {'--user ' if is_user_service else ''}status {service_file}"
             
-            terminal = self.get_terminal_command()
-            if terminal is None:
-                self.show_error_dialog("No suitable terminal emulator found. Please install gnome-terminal, xfce4-terminal, or konsole.")
-                return
-            
-            # Build the complete command
-            terminal_cmd = [terminal['binary']]
-            terminal_cmd.extend(terminal['args'])
-            terminal_cmd.append(status_cmd)
-            
-            # Use run_host_command for the complete command
-            cmd = self.run_host_command(terminal_cmd)
-            
-            GLib.spawn_async(
-                argv=cmd,
-                flags=GLib.SpawnFlags.SEARCH_PATH | GLib.SpawnFlags.DO_NOT_REAP_CHILD,
-                child_setup=None,
-                user_data=None
+            self.launch_in_terminal(
+                f"{self.machine.transport.terminal_command(status_cmd)}; read -p 'Press Enter to close...'"
             )
             
         except GLib.Error as e:
@@ -709,139 +1686,1041 @@ class SystemdManagerWindow(Adw.ApplicationWindow):
 
     def check_if_user_service(self, service_name):
         """Helper method to check if a service is a user service"""
-        try:
-            # Check if service exists in system paths first
-            system_paths = [
-                "/etc/systemd/system",
-                "/usr/lib/systemd/system",
-                "/lib/systemd/system",
-                "/usr/local/lib/systemd/system"
-            ]
-            
-            service_file = f"{service_name}.service"
-            
-            # Check system paths first
-            for path in system_paths:
-                if os.path.exists(os.path.join(path, service_file)):
-                    return False  # It's a system service
-            
-            # If not found in system paths, check user paths
-            user_service_path = os.path.expanduser(f"~/.config/systemd/user/{service_file}")
-            if os.path.exists(user_service_path):
-                return True
-            
-            # Final check with systemctl --user
-            check_cmd = ["systemctl", "--user", "list-unit-files", "--type=service", "--all", "--no-pager", "--plain"]
-            result = subprocess.run(
-                self.run_host_command(check_cmd),
-                capture_output=True,
-                text=True,
-                check=True
+        # Answered from the origin index: a unit known to one manager belongs
+        # to it, one known to both to whichever the visible list is showing
+        return self.unit_origins.is_user(f"{service_name}.service", prefer_user=self.scope.user)
+
+    def unit_file_path(self, unit_name):
+        """The indexed unit file of a unit in the visible list, or "" if not known"""
+        return self.unit_origins.fragment_path(unit_name, self.scope.user)
+
+    def watch_unit_directories(self):
+        """Re-index unit origins when files appear or vanish in the unit directories"""
+        for user, directories in ((False, SYSTEM_UNIT_DIRS), (True, USER_UNIT_DIRS)):
+            for directory in directories:
+                directory = os.path.expanduser(directory)
+                if not os.path.isdir(directory):
+                    continue
+                try:
+                    monitor = Gio.File.new_for_path(directory).monitor_directory(
+                        Gio.FileMonitorFlags.WATCH_MOVES, None
+                    )
+                except GLib.Error as e:
+                    print(f"Cannot watch {directory}: {e.message}")
+                    continue
+                monitor.connect("changed", self.on_unit_directory_changed, user)
+                self.unit_dir_monitors.append(monitor)
+
+    def on_unit_directory_changed(self, monitor, file, other_file, event, user):
+        if event == Gio.FileMonitorEvent.CHANGES_DONE_HINT:
+            return
+        names = [f.get_basename() for f in (file, other_file) if f is not None]
+        if not any(name.endswith('.service') for name in names):
+            return
+        if not self.local.scopes[user].loaded:
+            return  # Indexed on the scope's first load anyway
+        # Package upgrades touch many files at once; re-index once they settle
+        if user not in self.origin_refresh_ids:
+            self.origin_refresh_ids[user] = GLib.timeout_add(
+                UNIT_DIR_SETTLE_MS, self.refresh_unit_origins, user
             )
-            return any(service_file in line for line in result.stdout.splitlines())
-            
-        except subprocess.CalledProcessError:
-            # If in doubt, assume it's a system service
-            return False
+
+    def refresh_unit_origins(self, user):
+        del self.origin_refresh_ids[user]
+
+        def worker():
+            try:
+                paths = self.local.backend.unit_file_paths(user=user)
+            except SystemdError as e:
+                print(f"Error indexing unit files: {e}")
+                return
+            GLib.idle_add(self.local.unit_origins.update_scope, user, paths)
+
+        threading.Thread(target=worker, daemon=True).start()
+        return False
 
     def get_terminal_command(self):
         """Helper function to find an available terminal emulator"""
-        terminals = [
-            {
-                'binary': 'gnome-terminal',
-                'args': ['--', 'bash', '-c']
-            },
-            {
-                'binary': 'xfce4-terminal',
-                'args': ['-e', 'bash -c']
-            },
-            {
-                'binary': 'konsole',
-                'args': ['-e', 'bash -c']
-            },
-            {
-                'binary': 'x-terminal-emulator',
-                'args': ['-e', 'bash -c']
-            }
-        ]
-        
-        for terminal in terminals:
-            try:
-                # Use run_host_command to check if terminal exists
-                subprocess.run(
-                    self.run_host_command(['which', terminal['binary']]),
-                    check=True,
-                    capture_output=True
-                )
-                return terminal
-            except subprocess.CalledProcessError:
-                continue
-        return None
+        return self.terminal_resolver.get()
+
+    def launch_in_terminal(self, command, retry=True):
+        """Run a shell command in the session's terminal emulator"""
+        # Resolving may probe the host for terminals on first use
+        with tracer.span("terminal.resolve"):
+            terminal = self.get_terminal_command()
+        if terminal is None:
+            self.show_error_dialog("No suitable terminal emulator found. Please install gnome-terminal, xfce4-terminal, or konsole.")
+            return
+
+        # Build the complete command
+        terminal_cmd = [terminal['binary']]
+        terminal_cmd.extend(terminal['args'])
+        terminal_cmd.append(command)
+
+        try:
+            with tracer.span("terminal.spawn", terminal=terminal['binary']):
+                pid = GLib.spawn_async(
+                    argv=self.run_host_command(terminal_cmd),
+                    flags=GLib.SpawnFlags.SEARCH_PATH | GLib.SpawnFlags.DO_NOT_REAP_CHILD,
+                    child_setup=None,
+                    user_data=None
+                )[0]
+        except GLib.Error:
+            if not retry:
+                raise
+            # The cached binary is gone; look again, skipping it
+            self.terminal_resolver.invalidate(terminal['binary'])
+            self.launch_in_terminal(command, retry=False)
+            return
+
+        def on_terminal_exit(pid, status):
+            GLib.spawn_close_pid(pid)
+            # Only a terminal that could not be run (e.g. missing on the host
+            # behind flatpak-spawn) is replaced; any other exit status is the
+            # session's own, such as an editor the user quit
+            missing = os.waitstatus_to_exitcode(status) in TERMINAL_MISSING_STATUSES
+            if missing and retry:
+                self.terminal_resolver.invalidate(terminal['binary'])
+                self.launch_in_terminal(command, retry=False)
+
+        GLib.child_watch_add(GLib.PRIORITY_DEFAULT, pid, on_terminal_exit)
 
     def on_show_log(self, button, service_name):
-        """Show service logs in GNOME Logs"""
+        """Browse the service's journal history, newest first"""
+        viewer = JournalHistoryViewer(
+            self,
+            self.machine.transport,
+            f"{service_name}.service",
+            user=self.check_if_user_service(service_name)
+        )
+        viewer.present()
+
+    def on_show_dependencies(self, button, service_name):
+        """Open the dependency explorer on the service"""
+        viewer = DependencyViewer(
+            self,
+            self.machine,
+            f"{service_name}.service",
+            user=self.check_if_user_service(service_name)
+        )
+        viewer.present()
+
+    def on_follow_log(self, button, service_name):
+        """Stream the service's journal into an in-app log viewer"""
         try:
-            service_file = f"{service_name}.service"
-            is_user_service = self.check_if_user_service(service_name)
-            
-            # Build the command to open GNOME Logs
-            if is_user_service:
-                # For user services, open user journal
-                cmd = ["gnome-logs", "--identifier", service_file]
-            else:
-                # For system services, might need elevated privileges
-                cmd = ["pkexec", "gnome-logs", "--identifier", service_file]
-            
-            # Use run_host_command for Flatpak compatibility
-            cmd = self.run_host_command(cmd)
-            
-            GLib.spawn_async(
-                argv=cmd,
-                flags=GLib.SpawnFlags.SEARCH_PATH | GLib.SpawnFlags.DO_NOT_REAP_CHILD,
-                child_setup=None,
-                user_data=None
+            viewer = LogViewer(
+                self,
+                self.machine.transport.argv,
+                f"{service_name}.service",
+                user=self.check_if_user_service(service_name)
             )
-            
+            viewer.present()
+
         except GLib.Error as e:
-            self.show_error_dialog(f"Failed to show logs: {e.message}\nPlease make sure GNOME Logs (gnome-logs) is installed.")
+            self.show_error_dialog(f"Failed to show service logs: {e.message}")
 
-    def on_follow_log(self, button, service_name):
-        """Show real-time service logs using journalctl -fu"""
+class LogViewer(Gtk.Window):
+    """Streams a unit's journal into a bounded, virtualized list of lines"""
+
+    def __init__(self, parent, run_host_command, unit_name, user=False, max_lines=LOG_BUFFER_LINES):
+        super().__init__(title=f"Log: {unit_name}")
+        self.set_default_size(900, 600)
+        self.set_transient_for(parent)
+        self.max_lines = max_lines
+
+        # Lines parsed since the last frame; bounded so a burst can't grow it
+        self.pending = deque(maxlen=max_lines)
+        self.partial = b""
+        self.tick_id = None
+        self.paused = False
+
+        # Create header bar
+        header = Gtk.HeaderBar()
+        self.set_titlebar(header)
+
+        pause_button = Gtk.ToggleButton(icon_name="media-playback-pause-symbolic")
+        pause_button.set_tooltip_text("Pause updates")
+        pause_button.connect("toggled", self.on_pause_toggled)
+        header.pack_start(pause_button)
+
+        clear_button = Gtk.Button(icon_name="edit-clear-all-symbolic")
+        clear_button.set_tooltip_text("Clear")
+        clear_button.connect("clicked", self.on_clear_clicked)
+        header.pack_start(clear_button)
+
+        # Only the visible lines get label widgets
+        self.lines = Gtk.StringList()
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_line_setup)
+        factory.connect("bind", self.on_line_bind)
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.lines), factory=factory)
+
+        self.scrolled = Gtk.ScrolledWindow()
+        self.scrolled.set_vexpand(True)
+        self.scrolled.set_child(self.list_view)
+        self.set_child(self.scrolled)
+
+        cmd = ["journalctl"]
+        if user:
+            cmd.append("--user")
+        cmd.extend(["-u", unit_name, "-o", "json", "--follow", "-n", str(max_lines), "--no-pager"])
+
+        self.cancellable = Gio.Cancellable()
+        self.unit_name = unit_name
+        self.started = time.perf_counter()
+        self.first_output = True
+        with tracer.span("log.spawn", unit=unit_name):
+            self.process = Gio.Subprocess.new(
+                run_host_command(cmd),
+                Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_MERGE
+            )
+        self.stream = self.process.get_stdout_pipe()
+        self.read_more()
+
+        self.connect("close-request", self.on_close_request)
+
+    def on_line_setup(self, factory, list_item):
+        label = Gtk.Label(xalign=0)
+        label.set_wrap(True)
+        label.set_wrap_mode(Pango.WrapMode.WORD_CHAR)
+        label.add_css_class("monospace")
+        list_item.set_child(label)
+
+    def on_line_bind(self, factory, list_item):
+        list_item.get_child().set_text(list_item.get_item().get_string())
+
+    def read_more(self):
+        # Low priority so a chatty unit never starves input or redraws
+        self.stream.read_bytes_async(LOG_READ_CHUNK, GLib.PRIORITY_LOW, self.cancellable, self.on_bytes_read)
+
+    def on_bytes_read(self, stream, result):
         try:
-            service_file = f"{service_name}.service"
-            is_user_service = self.check_if_user_service(service_name)
-            
-            # Build the journalctl command
-            follow_cmd = f"journalctl {'--user ' if is_user_service else ''}-fu {service_file}"
-            
-            terminal = self.get_terminal_command()
-            if terminal is None:
-                self.show_error_dialog("No suitable terminal emulator found. Please install gnome-terminal, xfce4-terminal, or konsole.")
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as e:
+            if not e.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                self.pending.append(f"-- Failed to read journal: {e.message} --")
+                self.schedule_repaint()
+            return
+
+        if not data:
+            if self.partial:
+                self.pending.append(self.format_entry(self.partial))
+            self.pending.append("-- journalctl exited --")
+            self.schedule_repaint()
+            return
+
+        if self.first_output:
+            # How long journalctl took to deliver the backlog's first chunk
+            self.first_output = False
+            if tracer.enabled:
+                tracer.record("log.first_output", self.started, time.perf_counter() - self.started,
+                              {"unit": self.unit_name})
+
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        # Anything older than the buffer would be dropped anyway; skip parsing it
+        for line in lines[-self.max_lines:]:
+            if line:
+                self.pending.append(self.format_entry(line))
+        self.schedule_repaint()
+        self.read_more()
+
+    @classmethod
+    def format_entry(cls, line):
+        """Render one line of journalctl -o json output"""
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return line.decode("utf-8", "replace")  # journalctl notices, not records
+        return format_journal_record(entry)
+
+    def schedule_repaint(self):
+        """Fold everything that arrives before the next frame into one model update"""
+        if self.tick_id is None and not self.paused:
+            self.tick_id = self.list_view.add_tick_callback(self.on_tick)
+
+    def on_tick(self, widget, frame_clock):
+        self.tick_id = None
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        new_lines = list(self.pending)
+        self.pending.clear()
+        if not new_lines:
+            return
+
+        adjustment = self.scrolled.get_vadjustment()
+        at_bottom = adjustment.get_value() + adjustment.get_page_size() >= adjustment.get_upper() - 1
+
+        # Trim from the front so the model never holds more than max_lines
+        n_items = self.lines.get_n_items()
+        overflow = max(0, n_items + len(new_lines) - self.max_lines)
+        if overflow >= n_items:
+            self.lines.splice(0, n_items, new_lines[-self.max_lines:])
+        else:
+            if overflow:
+                self.lines.splice(0, overflow, [])
+            self.lines.splice(self.lines.get_n_items(), 0, new_lines)
+
+        if at_bottom:
+            self.list_view.scroll_to(self.lines.get_n_items() - 1, Gtk.ListScrollFlags.NONE, None)
+
+    def on_pause_toggled(self, button):
+        self.paused = button.get_active()
+        if not self.paused:
+            self.schedule_repaint()
+
+    def on_clear_clicked(self, button):
+        self.pending.clear()
+        self.lines.splice(0, self.lines.get_n_items(), [])
+
+    def on_close_request(self, window):
+        self.cancellable.cancel()
+        # flatpak-spawn forwards SIGTERM to the host's journalctl; SIGKILL
+        # would only kill flatpak-spawn and leave journalctl following
+        self.process.send_signal(signal.SIGTERM)
+        GLib.timeout_add_seconds(LOG_STOP_TIMEOUT, self.on_stop_timeout)
+        return False
+
+    def on_stop_timeout(self):
+        # Does nothing if journalctl has already exited
+        self.process.force_exit()
+        return GLib.SOURCE_REMOVE
+
+
+class JournalHistoryViewer(Gtk.Window):
+    """Browses a unit's journal history, loading older pages on scroll"""
+
+    PRIORITIES = ["All", "emerg", "alert", "crit", "err", "warning", "notice", "info", "debug"]
+
+    def __init__(self, parent, host, unit_name, user=False):
+        super().__init__(title=f"History: {unit_name}")
+        self.set_default_size(900, 600)
+        self.set_transient_for(parent)
+        self.host = host
+        self.unit_name = unit_name
+        self.user = user
+        self.pager = None
+        self.generation = 0
+        self.loading = False
+        # Pages currently in the model, as an inclusive index range and sizes
+        self.first_page = 0
+        self.page_sizes = []
+
+        header = Gtk.HeaderBar()
+        self.set_titlebar(header)
+
+        refresh_button = Gtk.Button(icon_name="view-refresh-symbolic")
+        refresh_button.set_tooltip_text("Reload newest entries")
+        refresh_button.connect("clicked", self.on_refresh_clicked)
+        header.pack_start(refresh_button)
+
+        # Filters
+        filter_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        filter_box.set_margin_start(6)
+        filter_box.set_margin_end(6)
+        filter_box.set_margin_top(6)
+        filter_box.set_margin_bottom(6)
+
+        self.since_entry = Gtk.Entry(placeholder_text="Since (e.g. -1h, yesterday)")
+        self.since_entry.set_hexpand(True)
+        self.since_entry.connect("activate", self.on_apply_filters)
+        filter_box.append(self.since_entry)
+
+        self.until_entry = Gtk.Entry(placeholder_text="Until (e.g. now, 2024-12-01 12:00)")
+        self.until_entry.set_hexpand(True)
+        self.until_entry.connect("activate", self.on_apply_filters)
+        filter_box.append(self.until_entry)
+
+        self.priority_dropdown = Gtk.DropDown.new_from_strings(self.PRIORITIES)
+        self.priority_dropdown.set_tooltip_text("Maximum priority")
+        filter_box.append(self.priority_dropdown)
+
+        apply_button = Gtk.Button(label="Apply")
+        apply_button.connect("clicked", self.on_apply_filters)
+        filter_box.append(apply_button)
+
+        self.lines = Gtk.StringList()
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_line_setup)
+        factory.connect("bind", self.on_line_bind)
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.lines), factory=factory)
+
+        self.scrolled = Gtk.ScrolledWindow()
+        self.scrolled.set_vexpand(True)
+        self.scrolled.set_child(self.list_view)
+        self.scrolled.connect("edge-reached", self.on_edge_reached)
+
+        self.status_label = Gtk.Label(xalign=0)
+        self.status_label.set_margin_start(6)
+        self.status_label.set_margin_bottom(6)
+        self.status_label.add_css_class("dim-label")
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        box.append(filter_box)
+        box.append(self.scrolled)
+        box.append(self.status_label)
+        self.set_child(box)
+
+        self.reset_pager()
+
+    def on_line_setup(self, factory, list_item):
+        label = Gtk.Label(xalign=0)
+        label.set_wrap(True)
+        label.set_wrap_mode(Pango.WrapMode.WORD_CHAR)
+        label.add_css_class("monospace")
+        list_item.set_child(label)
+
+    def on_line_bind(self, factory, list_item):
+        list_item.get_child().set_text(list_item.get_item().get_string())
+
+    def reset_pager(self):
+        priority = self.priority_dropdown.get_selected()
+        self.pager = JournalPager(
+            self.host,
+            self.unit_name,
+            user=self.user,
+            since=self.since_entry.get_text().strip() or None,
+            until=self.until_entry.get_text().strip() or None,
+            priority=self.PRIORITIES[priority] if priority > 0 else None
+        )
+        self.generation += 1
+        self.loading = False
+        self.first_page = 0
+        self.page_sizes = []
+        self.lines.splice(0, self.lines.get_n_items(), [])
+        self.load_page(0)
+
+    def load_page(self, index):
+        """Read a page in the background and add it at the matching end"""
+        if self.loading or not self.pager.has_page(index):
+            return
+        self.loading = True
+        self.status_label.set_text("Loading...")
+        pager = self.pager
+        generation = self.generation
+
+        def worker():
+            try:
+                lines = pager.read_page(index)
+            except SystemdError as e:
+                GLib.idle_add(self.on_page_error, generation, str(e))
                 return
-            
-            # Build the complete command
-            terminal_cmd = [terminal['binary']]
-            terminal_cmd.extend(terminal['args'])
-            terminal_cmd.append(follow_cmd)
-            
-            # Use run_host_command for Flatpak compatibility
-            cmd = self.run_host_command(terminal_cmd)
-            
-            GLib.spawn_async(
-                argv=cmd,
-                flags=GLib.SpawnFlags.SEARCH_PATH | GLib.SpawnFlags.DO_NOT_REAP_CHILD,
-                child_setup=None,
-                user_data=None
+            GLib.idle_add(self.on_page_loaded, generation, index, lines)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_page_loaded(self, generation, index, lines):
+        if generation != self.generation:
+            return False
+        self.loading = False
+        last_page = self.first_page + len(self.page_sizes) - 1
+
+        if not self.page_sizes or index == last_page + 1:
+            # Older page goes on top
+            self.lines.splice(0, 0, lines)
+            self.page_sizes.append(len(lines))
+            if len(self.page_sizes) > JOURNAL_VIEW_PAGES:
+                # Drop the newest page from the bottom; it stays in the cache
+                newest = self.page_sizes.pop(0)
+                self.lines.splice(self.lines.get_n_items() - newest, newest, [])
+                self.first_page += 1
+            if index == 0:
+                self.list_view.scroll_to(max(self.lines.get_n_items() - 1, 0), Gtk.ListScrollFlags.NONE, None)
+        elif index == self.first_page - 1:
+            # Newer page goes at the bottom
+            self.lines.splice(self.lines.get_n_items(), 0, lines)
+            self.page_sizes.insert(0, len(lines))
+            self.first_page -= 1
+            if len(self.page_sizes) > JOURNAL_VIEW_PAGES:
+                oldest = self.page_sizes.pop()
+                self.lines.splice(0, oldest, [])
+
+        self.update_status()
+        return False
+
+    def on_page_error(self, generation, message):
+        if generation == self.generation:
+            self.loading = False
+            self.status_label.set_text(f"Failed to read journal: {message}")
+        return False
+
+    def update_status(self):
+        if self.pager.complete and self.first_page + len(self.page_sizes) == len(self.pager.page_cursors):
+            self.status_label.set_text(f"{self.lines.get_n_items()} entries, start of journal reached")
+        else:
+            self.status_label.set_text(f"{self.lines.get_n_items()} entries, scroll up for older entries")
+
+    def on_edge_reached(self, scrolled, position):
+        if position == Gtk.PositionType.TOP:
+            self.load_page(self.first_page + len(self.page_sizes))
+        elif position == Gtk.PositionType.BOTTOM and self.first_page > 0:
+            self.load_page(self.first_page - 1)
+
+    def on_apply_filters(self, widget):
+        self.reset_pager()
+
+    def on_refresh_clicked(self, button):
+        self.reset_pager()
+
+
+class DependencyViewer(Gtk.Window):
+    """Explores a unit's dependencies and dependents, answered from the machine's dependency graph"""
+
+    # Graph keys in display order, with their headings
+    SECTIONS = (
+        ("Requires", "Requires"),
+        ("Wants", "Wants"),
+        ("PartOf", "Part of"),
+        ("After", "Starts after"),
+        ("Before", "Starts before"),
+        ("RequiredBy", "Required by"),
+        ("WantedBy", "Wanted by"),
+        ("ConsistsOf", "Has parts"),
+        ("FollowedBy", "Started after it"),
+        ("PrecededBy", "Started before it"),
+    )
+
+    def __init__(self, parent, machine, unit_name, user=False):
+        super().__init__(title=f"Dependencies: {unit_name}")
+        self.set_default_size(600, 700)
+        self.set_transient_for(parent)
+        self.parent_window = parent
+        self.unit_name = unit_name
+        self.back_stack = []  # Units visited before this one
+
+        header = Gtk.HeaderBar()
+        self.set_titlebar(header)
+        self.back_button = Gtk.Button(icon_name="go-previous-symbolic")
+        self.back_button.set_tooltip_text("Back")
+        self.back_button.set_sensitive(False)
+        self.back_button.connect("clicked", self.on_back_clicked)
+        header.pack_start(self.back_button)
+
+        self.stack = Gtk.Stack()
+        loading_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        loading_box.set_valign(Gtk.Align.CENTER)
+        spinner = Gtk.Spinner()
+        spinner.set_size_request(32, 32)
+        spinner.start()
+        loading_box.append(spinner)
+        self.loading_label = Gtk.Label(label="Indexing unit dependencies...")
+        loading_box.append(self.loading_label)
+        self.stack.add_named(loading_box, "loading")
+
+        self.sections_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=18)
+        self.sections_box.set_margin_start(12)
+        self.sections_box.set_margin_end(12)
+        self.sections_box.set_margin_top(12)
+        self.sections_box.set_margin_bottom(12)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_vexpand(True)
+        scrolled.set_child(self.sections_box)
+        self.stack.add_named(scrolled, "graph")
+        self.set_child(self.stack)
+
+        parent.dependency_viewers.append(self)
+        self.connect("close-request", self.on_close_request)
+        self.graph = parent.dependency_graph(machine, user)
+        if self.graph.loaded:
+            self.render()
+
+    def on_graph_changed(self, graph, changed):
+        if graph is not self.graph:
+            return
+        if changed is None:
+            if not graph.loaded:
+                self.loading_label.set_text("Failed to load unit dependencies")
+            return
+        if self.stack.get_visible_child_name() == "loading" or self.unit_name in changed:
+            self.render()
+
+    def render(self):
+        """Rebuild the sections for the current unit"""
+        self.set_title(f"Dependencies: {self.unit_name}")
+        child = self.sections_box.get_first_child()
+        while child is not None:
+            self.sections_box.remove(child)
+            child = self.sections_box.get_first_child()
+
+        related = dict(self.graph.dependencies(self.unit_name), **self.graph.dependents(self.unit_name))
+        if self.unit_name not in self.graph and not related:
+            label = Gtk.Label(label=f"{self.unit_name} is not loaded, so systemd doesn't know its dependencies.")
+            label.set_wrap(True)
+            label.add_css_class("dim-label")
+            self.sections_box.append(label)
+
+        for key, heading in self.SECTIONS:
+            units = related.get(key)
+            if not units:
+                continue
+            group = Adw.PreferencesGroup(title=heading, description=f"{len(units)} units")
+            for unit in units[:DEPENDENCY_ROWS_SHOWN]:
+                row = Adw.ActionRow(title=unit, activatable=True)
+                row.add_suffix(Gtk.Image(icon_name="go-next-symbolic"))
+                row.connect("activated", self.on_unit_activated, unit)
+                group.add(row)
+            if len(units) > DEPENDENCY_ROWS_SHOWN:
+                group.add(Adw.ActionRow(title=f"... and {len(units) - DEPENDENCY_ROWS_SHOWN} more"))
+            self.sections_box.append(group)
+        self.stack.set_visible_child_name("graph")
+
+    def on_unit_activated(self, row, unit):
+        self.back_stack.append(self.unit_name)
+        self.back_button.set_sensitive(True)
+        self.unit_name = unit
+        self.render()
+
+    def on_back_clicked(self, button):
+        self.unit_name = self.back_stack.pop()
+        self.back_button.set_sensitive(bool(self.back_stack))
+        self.render()
+
+    def on_close_request(self, window):
+        self.parent_window.dependency_viewers.remove(self)
+        return False
+
+
+class UnitEditor(Gtk.Window):
+    """Edits a unit file and its drop-ins, checked by systemd-analyze verify as you type"""
+
+    def __init__(self, parent, machine, unit_name, user=False):
+        super().__init__(title=f"Edit {unit_name}")
+        self.set_default_size(800, 650)
+        self.set_transient_for(parent)
+        self.parent_window = parent
+        self.machine = machine
+        self.unit_name = unit_name
+        self.user = user
+        self.backend = machine.systemctl_backend
+        self.verifier = UnitVerifier(machine.transport, unit_name, user)
+        self.fragment_path = machine.unit_origins.fragment_path(unit_name, user)
+        self.files = []  # One dict per tab: path, relative, view, buffer, saved text, marks
+        self.verify_source_id = None
+        self.verify_generation = 0  # Bumped per run so superseded results are dropped
+        self.closing = False
+
+        header = Gtk.HeaderBar()
+        self.set_titlebar(header)
+        self.save_button = Gtk.Button(label="Save")
+        self.save_button.add_css_class("suggested-action")
+        self.save_button.set_tooltip_text("Save the changed files and reload the manager")
+        self.save_button.set_sensitive(False)
+        self.save_button.connect("clicked", self.on_save_clicked)
+        header.pack_end(self.save_button)
+        self.drop_in_button = Gtk.Button(icon_name="list-add-symbolic")
+        self.drop_in_button.set_tooltip_text("Add a drop-in that overrides settings of this unit")
+        self.drop_in_button.set_sensitive(False)
+        self.drop_in_button.connect("clicked", self.on_add_drop_in_clicked)
+        header.pack_start(self.drop_in_button)
+        terminal_button = Gtk.Button(icon_name="utilities-terminal-symbolic")
+        terminal_button.set_tooltip_text("Edit with systemctl edit in a terminal")
+        terminal_button.connect("clicked", self.on_terminal_clicked)
+        header.pack_start(terminal_button)
+
+        self.stack = Gtk.Stack()
+        loading_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        loading_box.set_valign(Gtk.Align.CENTER)
+        spinner = Gtk.Spinner()
+        spinner.set_size_request(32, 32)
+        spinner.start()
+        loading_box.append(spinner)
+        self.loading_label = Gtk.Label(label="Reading unit files...")
+        self.loading_label.set_wrap(True)
+        loading_box.append(self.loading_label)
+        self.stack.add_named(loading_box, "loading")
+
+        editor_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        self.notebook = Gtk.Notebook()
+        self.notebook.set_scrollable(True)
+        self.notebook.set_vexpand(True)
+        editor_box.append(self.notebook)
+
+        # Diagnostics from the last verify run; activating one jumps to its line
+        self.status_label = Gtk.Label(xalign=0)
+        self.status_label.set_margin_start(12)
+        self.status_label.set_margin_end(12)
+        self.status_label.set_margin_top(6)
+        self.status_label.set_margin_bottom(6)
+        self.status_label.add_css_class("dim-label")
+        editor_box.append(self.status_label)
+        self.diagnostics_list = Gtk.ListBox()
+        self.diagnostics_list.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.diagnostics_list.connect("row-activated", self.on_diagnostic_activated)
+        self.diagnostics_scrolled = Gtk.ScrolledWindow()
+        self.diagnostics_scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        self.diagnostics_scrolled.set_max_content_height(160)
+        self.diagnostics_scrolled.set_propagate_natural_height(True)
+        self.diagnostics_scrolled.set_child(self.diagnostics_list)
+        self.diagnostics_scrolled.set_visible(False)
+        editor_box.append(self.diagnostics_scrolled)
+        self.stack.add_named(editor_box, "editor")
+        self.set_child(self.stack)
+
+        self.connect("close-request", self.on_close_request)
+        self.load_files()
+
+    def load_files(self):
+        def worker():
+            try:
+                files = self.backend.read_unit_files(self.unit_name, self.user, fragment_path=self.fragment_path)
+            except SystemdError as e:
+                GLib.idle_add(self._on_files_loaded, None, str(e))
+                return
+            GLib.idle_add(self._on_files_loaded, files, None)
+
+        self.parent_window.fetch_pool.submit(worker)
+
+    def _on_files_loaded(self, files, error):
+        if self.closing:
+            return False
+        if error is not None:
+            self.loading_label.set_text(f"Cannot open {self.unit_name}: {error}")
+            return False
+        for index, (path, content) in enumerate(files):
+            self.add_file(path, content, fragment=index == 0)
+        self.drop_in_button.set_sensitive(True)
+        self.stack.set_visible_child_name("editor")
+        self.verify()
+        return False
+
+    def add_file(self, path, content, fragment=False, saved=True):
+        """Open a file in a new tab; unsaved files count as changed"""
+        GtkSource = load_gtksource()
+        view = GtkSource.View()
+        view.set_show_line_numbers(True)
+        view.set_show_line_marks(True)
+        view.set_monospace(True)
+        view.set_highlight_current_line(True)
+        for severity, icon in (("error", "dialog-error-symbolic"), ("warning", "dialog-warning-symbolic")):
+            attributes = GtkSource.MarkAttributes()
+            attributes.set_icon_name(icon)
+            attributes.connect("query-tooltip-text", self.on_mark_tooltip)
+            view.set_mark_attributes(severity, attributes, 1 if severity == "error" else 0)
+
+        buffer = view.get_buffer()
+        buffer.set_language(GtkSource.LanguageManager.get_default().get_language("ini"))
+        buffer.set_text(content)
+        buffer.place_cursor(buffer.get_start_iter())
+        warning = Gdk.RGBA()
+        warning.parse("#e5a50a")
+        buffer.create_tag("error", underline=Pango.Underline.ERROR)
+        buffer.create_tag("warning", underline=Pango.Underline.ERROR, underline_rgba=warning)
+
+        # Copies are verified under the names systemd would load them by
+        relative = self.unit_name if fragment else f"{self.unit_name}.d/{os.path.basename(path)}"
+        entry = {
+            "path": path,
+            "relative": relative,
+            "view": view,
+            "buffer": buffer,
+            "saved": content if saved else None,
+            "label": Gtk.Label(),
+            "messages": {},  # Source mark -> diagnostic text, for the gutter tooltips
+        }
+        self.files.append(entry)
+        buffer.connect("changed", self.on_buffer_changed, entry)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_child(view)
+        scrolled.set_tooltip_text(path)
+        self.notebook.append_page(scrolled, entry["label"])
+        self.update_tab(entry)
+        return entry
+
+    @staticmethod
+    def text(entry):
+        buffer = entry["buffer"]
+        return buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
+
+    def is_modified(self, entry):
+        return entry["saved"] is None or self.text(entry) != entry["saved"]
+
+    def update_tab(self, entry):
+        name = os.path.basename(entry["path"])
+        entry["label"].set_text(f"{name} *" if self.is_modified(entry) else name)
+        self.save_button.set_sensitive(any(self.is_modified(file) for file in self.files))
+
+    def on_buffer_changed(self, buffer, entry):
+        self.update_tab(entry)
+        # Verify once typing pauses, not per keystroke
+        if self.verify_source_id is not None:
+            GLib.source_remove(self.verify_source_id)
+        self.verify_source_id = GLib.timeout_add(VERIFY_DEBOUNCE_MS, self.on_verify_timeout)
+
+    def on_verify_timeout(self):
+        self.verify_source_id = None
+        self.verify()
+        return False
+
+    def verify(self):
+        """Check the editor's current text in the background; a newer run cancels this one"""
+        self.verify_generation += 1
+        generation = self.verify_generation
+        files = [(entry["relative"], self.text(entry)) for entry in self.files]
+        self.status_label.set_text("Checking...")
+
+        def worker():
+            diagnostics = self.verifier.verify(files)
+            if diagnostics is not None:
+                GLib.idle_add(self._on_verified, generation, diagnostics)
+
+        self.parent_window.fetch_pool.submit(worker)
+
+    def _on_verified(self, generation, diagnostics):
+        if generation != self.verify_generation or self.closing:
+            return False  # The text changed since this run started
+
+        for entry in self.files:
+            buffer = entry["buffer"]
+            start, end = buffer.get_bounds()
+            buffer.remove_tag_by_name("error", start, end)
+            buffer.remove_tag_by_name("warning", start, end)
+            buffer.remove_source_marks(start, end, None)
+            entry["messages"].clear()
+
+        child = self.diagnostics_list.get_first_child()
+        while child is not None:
+            self.diagnostics_list.remove(child)
+            child = self.diagnostics_list.get_first_child()
+
+        by_relative = {entry["relative"]: entry for entry in self.files}
+        for diagnostic in diagnostics:
+            entry = by_relative.get(diagnostic["file"])
+            location = ""
+            if entry is not None and diagnostic["line"] is not None:
+                self.mark_line(entry, diagnostic)
+                location = f"{os.path.basename(entry['path'])}:{diagnostic['line']}"
+            row = Adw.ActionRow(title=GLib.markup_escape_text(diagnostic["message"]), subtitle=location)
+            row.add_prefix(Gtk.Image(icon_name=f"dialog-{diagnostic['severity']}-symbolic"))
+            row.set_activatable(bool(location))
+            row.diagnostic = (entry, diagnostic["line"])
+            self.diagnostics_list.append(row)
+
+        if diagnostics:
+            self.status_label.set_text(f"{len(diagnostics)} problem{'s' if len(diagnostics) != 1 else ''} found")
+        else:
+            self.status_label.set_text("No problems found")
+        self.diagnostics_scrolled.set_visible(bool(diagnostics))
+        return False
+
+    def mark_line(self, entry, diagnostic):
+        """Underline the line and put the message in the gutter"""
+        buffer = entry["buffer"]
+        found, start = buffer.get_iter_at_line(diagnostic["line"] - 1)
+        if not found:
+            return
+        end = start.copy()
+        if not end.ends_line():
+            end.forward_to_line_end()
+        buffer.apply_tag_by_name(diagnostic["severity"], start, end)
+        mark = buffer.create_source_mark(None, diagnostic["severity"], start)
+        messages = entry["messages"]
+        messages[mark] = "\n".join(filter(None, [messages.get(mark), diagnostic["message"]]))
+
+    def on_mark_tooltip(self, attributes, mark):
+        for entry in self.files:
+            if mark in entry["messages"]:
+                return entry["messages"][mark]
+        return ""
+
+    def on_diagnostic_activated(self, listbox, row):
+        entry, line = row.diagnostic
+        if entry is None:
+            return
+        self.notebook.set_current_page(self.files.index(entry))
+        buffer = entry["buffer"]
+        found, where = buffer.get_iter_at_line(line - 1)
+        if found:
+            buffer.place_cursor(where)
+            entry["view"].scroll_to_mark(buffer.get_insert(), 0.2, False, 0, 0)
+        entry["view"].grab_focus()
+
+    def on_add_drop_in_clicked(self, button):
+        """Open a new override.conf drop-in, or the existing one"""
+        path = SystemctlBackend.editable_path(f"{self.unit_name}.d/override.conf", self.user)
+        for index, entry in enumerate(self.files):
+            if SystemctlBackend.editable_path(entry["path"], self.user) == path:
+                self.notebook.set_current_page(index)
+                return
+        suffix = self.unit_name.rpartition(".")[2]
+        section = "Unit" if suffix in ("target", "device", "scope") else suffix.capitalize()
+        entry = self.add_file(path, f"[{section}]\n", saved=False)
+        self.notebook.set_current_page(len(self.files) - 1)
+        entry["view"].grab_focus()
+        self.verify()
+
+    def on_terminal_clicked(self, button):
+        self.parent_window.edit_in_terminal(self.machine, self.unit_name, self.user)
+
+    def on_save_clicked(self, button):
+        """Write the changed files, then daemon-reload so they take effect"""
+        changes = [(entry, self.text(entry)) for entry in self.files if self.is_modified(entry)]
+        if not changes:
+            return
+        self.save_button.set_sensitive(False)
+        self.status_label.set_text("Saving...")
+
+        def worker():
+            saved = []
+            try:
+                for entry, text in changes:
+                    # Vendor files are copied to the administrator's directory
+                    path = SystemctlBackend.editable_path(entry["path"], self.user)
+                    self.backend.write_unit_file(path, text, self.user)
+                    saved.append((entry, path, text))
+                self.machine.backend.daemon_reload(self.user)
+            except SystemdError as e:
+                GLib.idle_add(self._on_saved, saved, str(e))
+                return
+            GLib.idle_add(self._on_saved, saved, None)
+
+        self.parent_window.fetch_pool.submit(worker)
+
+    def _on_saved(self, saved, error):
+        for entry, path, text in saved:
+            entry["path"], entry["saved"] = path, text
+            entry["view"].get_parent().set_tooltip_text(path)
+            self.update_tab(entry)
+        if saved:
+            self.parent_window.on_manager_reloaded(self.machine, self.user)
+        if error is not None:
+            self.save_button.set_sensitive(True)
+            self.status_label.set_text("Not saved")
+            dialog = Adw.MessageDialog(
+                transient_for=self,
+                heading="Error",
+                body=f"Error saving {self.unit_name}: {error}"
             )
-            
-        except GLib.Error as e:
-            self.show_error_dialog(f"Failed to show service logs: {e.message}")
+            dialog.add_response("ok", "_OK")
+            dialog.present()
+        else:
+            self.status_label.set_text(f"Saved and reloaded {'user' if self.user else 'system'} manager")
+        return False
+
+    def on_close_request(self, window):
+        if not self.closing and any(self.is_modified(entry) for entry in self.files):
+            dialog = Adw.MessageDialog(
+                transient_for=self,
+                heading="Discard Changes?",
+                body=f"Your changes to {self.unit_name} have not been saved."
+            )
+            dialog.add_response("cancel", "_Cancel")
+            dialog.add_response("discard", "_Discard")
+            dialog.set_response_appearance("discard", Adw.ResponseAppearance.DESTRUCTIVE)
+            dialog.connect("response", self.on_discard_response)
+            dialog.present()
+            return True
+        self.closing = True
+        if self.verify_source_id is not None:
+            GLib.source_remove(self.verify_source_id)
+            self.verify_source_id = None
+        self.verifier.cancel()
+        return False
+
+    def on_discard_response(self, dialog, response):
+        if response == "discard":
+            self.closing = True
+            self.close()
+
+
+class TracingWindow(Gtk.Window):
+    """Hidden debug page: span histograms, with recording and export controls"""
 
-class ServiceEditor(Gtk.Window):
     def __init__(self, parent):
+        super().__init__(title="Tracing")
+        self.set_default_size(900, 500)
+        self.set_transient_for(parent)
+
+        header = Gtk.HeaderBar()
+        self.set_titlebar(header)
+
+        self.record_switch = Gtk.Switch(active=tracer.enabled)
+        self.record_switch.set_valign(Gtk.Align.CENTER)
+        self.record_switch.set_tooltip_text("Record spans")
+        self.record_switch.connect("notify::active", self.on_record_toggled)
+        header.pack_start(self.record_switch)
+
+        clear_button = Gtk.Button(label="Clear")
+        clear_button.connect("clicked", self.on_clear_clicked)
+        header.pack_start(clear_button)
+
+        trace_button = Gtk.Button(label="Export Chrome Trace")
+        trace_button.connect("clicked", self.on_export_clicked, True)
+        header.pack_end(trace_button)
+
+        json_button = Gtk.Button(label="Export JSON")
+        json_button.connect("clicked", self.on_export_clicked, False)
+        header.pack_end(json_button)
+
+        self.text_view = Gtk.TextView(editable=False, cursor_visible=False, monospace=True)
+        self.text_view.set_left_margin(12)
+        self.text_view.set_top_margin(12)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_vexpand(True)
+        scrolled.set_child(self.text_view)
+        self.set_child(scrolled)
+
+        self.update()
+        self.source_id = GLib.timeout_add_seconds(1, self.update)
+        self.connect("close-request", self.on_close_request)
+
+    def update(self):
+        summary = tracer.summary()
+        lines = [f"{'span':<28} {'count':>8} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'total ms':>12}"]
+        for name, stats in summary.items():
+            lines.append(f"{name:<28} {stats['count']:>8} {stats['mean_ms']:>10.3f} {stats['p50_ms']:>10.3f} "
+                         f"{stats['p95_ms']:>10.3f} {stats['max_ms']:>10.3f} {stats['total_ms']:>12.1f}")
+        if not summary:
+            lines.append("")
+            lines.append("No spans recorded yet." if tracer.enabled else "Recording is off; turn it on to collect spans.")
+        self.text_view.get_buffer().set_text("\n".join(lines))
+        return True
+
+    def on_record_toggled(self, switch, pspec):
+        tracer.enabled = switch.get_active()
+        self.update()
+
+    def on_clear_clicked(self, button):
+        tracer.clear()
+        self.update()
+
+    def on_export_clicked(self, button, chrome):
+        dialog = Gtk.FileChooserDialog(
+            title="Export Chrome Trace" if chrome else "Export Span Histograms",
+            transient_for=self,
+            action=Gtk.FileChooserAction.SAVE
+        )
+        dialog.add_button("_Cancel", Gtk.ResponseType.CANCEL)
+        dialog.add_button("_Save", Gtk.ResponseType.ACCEPT)
+        dialog.set_current_name("systemd-pilot-trace.json" if chrome else "systemd-pilot-spans.json")
+        dialog.connect("response", self._on_export_response, chrome)
+        dialog.present()
+
+    def _on_export_response(self, dialog, response, chrome):
+        file = dialog.get_file() if response == Gtk.ResponseType.ACCEPT else None
+        dialog.destroy()
+        if file is None:
+            return
+        try:
+            tracer.export(file.get_path(), chrome=chrome)
+        except OSError as e:
+            error_dialog = Adw.MessageDialog(transient_for=self, heading="Error", body=f"Export failed: {e}")
+            error_dialog.add_response("ok", "_OK")
+            error_dialog.present()
+
+    def on_close_request(self, window):
+        GLib.source_remove(self.source_id)
+        return False
+
+
+class ServiceEditor(Gtk.Window):
+    def __init__(self, parent, helper=None):
         super().__init__(title="Create New Service")
         self.set_default_size(800, 600)
         self.set_transient_for(parent)
+        self.helper = helper or PrivilegedHelper(SystemdManagerWindow.run_host_command)
         
         # Create main box
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
@@ -857,6 +2736,7 @@ class ServiceEditor(Gtk.Window):
         header.pack_end(save_button)
         
         # Create source view
+        GtkSource = load_gtksource()
         source_view = GtkSource.View()
         source_view.set_show_line_numbers(True)
         source_view.set_auto_indent(True)
@@ -974,57 +2854,50 @@ WantedBy=multi-user.target
         dialog.present()
 
     def _on_save_response(self, dialog, response, text):
-        if response == Gtk.ResponseType.ACCEPT:
+        file = dialog.get_file() if response == Gtk.ResponseType.ACCEPT else None
+        dialog.destroy()
+        if not file:
+            return
+        file_path = file.get_path()
+
+        # Off the main loop: the helper may first wait for authorization
+        def worker():
             try:
-                file = dialog.get_file()
-                if file:
-                    file_path = file.get_path()
-                    home_dir = os.path.expanduser("~")
-                    
-                    # Check if saving to user's home directory or its subdirectories
-                    if file_path.startswith(home_dir):
-                        # Direct save without pkexec for user directory
-                        with open(file_path, 'w') as f:
-                            f.write(text)
-                        os.chmod(file_path, 0o644)  # Set permissions without pkexec
-                    else:
-                        # Use pkexec for system directories
-                        with open('/tmp/temp_service_file', 'w') as temp_file:
-                            temp_file.write(text)
-                        
-                        # Build the mv command
-                        cmd = ["pkexec", "mv", "/tmp/temp_service_file", file_path]
-                        if SystemdManagerWindow.is_running_in_flatpak():
-                            cmd = ["flatpak-spawn", "--host"] + cmd
-                        
-                        # Execute the command
-                        subprocess.run(cmd, check=True)
-                        
-                        # Set proper permissions
-                        chmod_cmd = ["pkexec", "chmod", "644", file_path]
-                        if SystemdManagerWindow.is_running_in_flatpak():
-                            chmod_cmd = ["flatpak-spawn", "--host"] + chmod_cmd
-                        subprocess.run(chmod_cmd, check=True)
-                    
-                    # Show success message
-                    success_dialog = Adw.MessageDialog(
-                        transient_for=self,
-                        heading="Success",
-                        body=f"Service file saved successfully to {file_path}\nDon't forget to reload systemd daemon to apply changes."
-                    )
-                    success_dialog.add_response("ok", "_OK")
-                    success_dialog.present()
-                    
+                home_dir = os.path.expanduser("~")
+                
+                # Check if saving to user's home directory or its subdirectories
+                if file_path.startswith(home_dir):
+                    # Direct save without pkexec for user directory
+                    with open(file_path, 'w') as f:
+                        f.write(text)
+                    os.chmod(file_path, 0o644)  # Set permissions without pkexec
+                else:
+                    # The privileged helper writes and chmods it in one step
+                    self.helper.request("install_unit", path=file_path, content=text)
             except Exception as e:
-                error_dialog = Adw.MessageDialog(
-                    transient_for=self,
-                    heading="Error",
-                    body=f"Error saving file: {str(e)}"
-                )
-                error_dialog.add_response("ok", "_OK")
-                error_dialog.present()
-        
-        dialog.destroy()
+                GLib.idle_add(self._on_saved, file_path, str(e))
+                return
+            GLib.idle_add(self._on_saved, file_path, None)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_saved(self, file_path, error):
+        if error is None:
+            # Show success message
+            dialog = Adw.MessageDialog(
+                transient_for=self,
+                heading="Success",
+                body=f"Service file saved successfully to {file_path}\nDon't forget to reload systemd daemon to apply changes."
+            )
+        else:
+            dialog = Adw.MessageDialog(
+                transient_for=self,
+                heading="Error",
+                body=f"Error saving file: {error}"
+            )
+        dialog.add_response("ok", "_OK")
+        dialog.present()
+        return False
 
 class SystemdManagerApp(Adw.Application):
     def __init__(self):
@@ -1036,6 +2909,7 @@ class SystemdManagerApp(Adw.Application):
         self.set_accels_for_action("win.search", ["<Control>f"])
         self.set_accels_for_action("app.new_service", ["<Control>n"])
         self.set_accels_for_action("app.reload", ["<Control>r"])
+        self.set_accels_for_action("win.tracing", ["<Control><Shift>d"])
         
         # Add reload action
         reload_action = Gio.SimpleAction.new("reload", None)
@@ -1093,8 +2967,14 @@ class SystemdManagerApp(Adw.Application):
         )
 
     def on_new_service_clicked(self, action, param):
-        editor = ServiceEditor(self.get_active_window())
+        window = self.get_active_window()
+        editor = ServiceEditor(window, helper=getattr(window, "helper", None))
         editor.present()
 
-app = SystemdManagerApp()
-app.run(None)
+def main():
+    app = SystemdManagerApp()
+    return app.run(None)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
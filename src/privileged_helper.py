@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Privileged helper for systemd Pilot.
+
+Started once through pkexec (as `python3 -c <this file> IDLE_TIMEOUT`) and
+kept running, so later privileged actions are one message on a pipe
+instead of a pkexec spawn and a polkit prompt each.
+
+Protocol: one JSON object per line. The helper first writes
+{"ready": true}; after that every request {"id": n, "op": ..., ...} gets
+one reply {"id": n, "ok": true, "result": ...} or
+{"id": n, "ok": false, "error": "..."}. Only the operations in OPERATIONS
+are accepted. The helper exits when stdin closes or after IDLE_TIMEOUT
+seconds without a request.
+
+This file must only use the standard library: it runs on the host, outside
+any Flatpak sandbox, as root.
+"""
+import json
+import os
+import re
+import select
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_IDLE_TIMEOUT = 300
+
+UNIT_NAME = re.compile(r"^[A-Za-z0-9:_.\\@-]+$")
+UNIT_SUFFIXES = (
+    ".service", ".socket", ".target", ".timer", ".path", ".mount",
+    ".automount", ".swap", ".slice", ".scope", ".device",
+)
+# Directories unit files may be installed into, and the verbs systemctl
+# may be run with
+UNIT_DIRS = ("/etc/systemd/system", "/etc/systemd/user")
+SYSTEMCTL_VERBS = ("start", "stop", "restart", "enable", "disable")
+MAX_CONCURRENCY = 32
+
+
+class RequestError(Exception):
+    pass
+
+
+def check_units(units):
+    if not isinstance(units, list) or not units:
+        raise RequestError("Expected a list of unit names")
+    for unit in units:
+        if not isinstance(unit, str) or unit.startswith("-") or not UNIT_NAME.match(unit):
+            raise RequestError(f"Invalid unit name: {unit!r}")
+    return units
+
+
+def systemctl(args):
+    result = subprocess.run(["systemctl"] + args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RequestError((result.stderr or result.stdout).strip() or f"systemctl exited with {result.returncode}")
+    return result.stdout
+
+
+def op_unit_command(request):
+    """start/stop/restart/enable/disable on system units"""
+    command = request.get("command")
+    if command not in SYSTEMCTL_VERBS:
+        raise RequestError(f"Command not allowed: {command!r}")
+    units = check_units(request.get("units"))
+    systemctl([command, "--"] + units)
+
+
+def op_bulk_command(request):
+    """One systemctl call per unit, run in parallel; returns {unit: error or None}"""
+    command = request.get("command")
+    if command not in SYSTEMCTL_VERBS:
+        raise RequestError(f"Command not allowed: {command!r}")
+    units = check_units(request.get("units"))
+    concurrency = request.get("concurrency", 8)
+    if not isinstance(concurrency, int):
+        raise RequestError("concurrency must be an integer")
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY))
+
+    def run(unit):
+        try:
+            systemctl([command, "--", unit])
+        except RequestError as e:
+            return str(e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(zip(units, executor.map(run, units)))
+
+
+def op_daemon_reload(request):
+    systemctl(["daemon-reload"])
+
+
+def op_install_unit(request):
+    """Write a unit file (or drop-in) into a system unit directory, mode 0644"""
+    path = request.get("path")
+    content = request.get("content")
+    if not isinstance(path, str) or not isinstance(content, str):
+        raise RequestError("Expected a path and file content")
+    path = os.path.normpath(path)
+    directory = os.path.dirname(path)
+    name = os.path.basename(path)
+
+    # Either <unit dir>/<unit> or <unit dir>/<unit>.d/<name>.conf
+    parent = os.path.dirname(directory)
+    if directory in UNIT_DIRS:
+        valid = UNIT_NAME.match(name) and name.endswith(UNIT_SUFFIXES)
+    elif parent in UNIT_DIRS and directory.endswith(".d"):
+        valid = UNIT_NAME.match(name) and name.endswith(".conf")
+    else:
+        valid = False
+    if not valid or os.path.islink(path):
+        raise RequestError(f"Not a unit file location: {path}")
+
+    os.makedirs(directory, mode=0o755, exist_ok=True)
+    # Write next to the target and rename, so the unit is never half written
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".systemd-pilot-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def op_ping(request):
+    return "pong"
+
+
+OPERATIONS = {
+    "ping": op_ping,
+    "unit_command": op_unit_command,
+    "bulk_command": op_bulk_command,
+    "daemon_reload": op_daemon_reload,
+    "install_unit": op_install_unit,
+}
+
+
+def handle(request):
+    if not isinstance(request, dict):
+        raise RequestError("Expected a JSON object")
+    operation = OPERATIONS.get(request.get("op"))
+    if operation is None:
+        raise RequestError(f"Operation not allowed: {request.get('op')!r}")
+    return operation(request)
+
+
+def write(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv):
+    idle_timeout = float(argv[0]) if argv else DEFAULT_IDLE_TIMEOUT
+    write({"ready": True})
+    while True:
+        readable, _, _ = select.select([sys.stdin], [], [], idle_timeout)
+        if not readable:
+            return 0  # Idle for too long
+        line = sys.stdin.readline()
+        if not line:
+            return 0  # The app went away
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id") if isinstance(request, dict) else None
+            result = handle(request)
+        except (RequestError, OSError, ValueError) as e:
+            write({"id": request_id, "ok": False, "error": str(e)})
+        else:
+            write({"id": request_id, "ok": True, "result": result})
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
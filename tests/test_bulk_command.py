@@ -0,0 +1,92 @@
+"""Bulk unit actions through one xargs call"""
+import os
+import subprocess
+
+import pytest
+
+from engine import FakeHost, LocalHost, SystemctlBackend
+
+
+FAKE_SYSTEMCTL = """#!/bin/sh
+# systemctl VERB -- UNIT
+case "$3" in
+    ok.service) exit 0 ;;
+    quiet.service) exit 3 ;;
+    *) printf 'Failed to %s %s: Unit %s not found.\\n' "$1" "$3" "$3" >&2
+       printf 'second line\\n' >&2
+       exit 5 ;;
+esac
+"""
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    systemctl = tmp_path / "systemctl"
+    systemctl.write_text(FAKE_SYSTEMCTL)
+    systemctl.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return SystemctlBackend(LocalHost(), is_root=True)
+
+
+def test_results_per_unit(local_backend):
+    results = local_backend.bulk_command("restart", ["ok.service", "quiet.service", "gone.service"])
+    assert results == {
+        "ok.service": None,
+        "quiet.service": "exit status 3",
+        # Output is flattened to the result line
+        "gone.service": "Failed to restart gone.service: Unit gone.service not found. second line",
+    }
+
+
+def test_unit_names_with_spaces_and_tabs_are_passed_through(local_backend):
+    results = local_backend.bulk_command("start", ["ok.service", "odd name.service"])
+    assert results["ok.service"] is None
+    assert "odd name.service not found" in results["odd name.service"]
+
+
+class ScriptedHost(FakeHost):
+    """Answers the xargs call with canned result lines"""
+
+    def __init__(self, output):
+        super().__init__(units=0)
+        self.output = output
+        self.calls = []
+
+    def run(self, cmd, input=None, text=True):
+        self.calls.append((cmd, input))
+        return subprocess.CompletedProcess(cmd, 0, self.output, "")
+
+
+def test_missing_and_unknown_result_lines():
+    host = ScriptedHost("0\ta.service\t\n"
+                        "1\tb.service\tJob failed\twith a tab\n"
+                        "0\tother.service\t\n"
+                        "garbage\n")
+    results = SystemctlBackend(host, is_root=True).bulk_command("stop", ["a.service", "b.service", "c.service"])
+    assert results == {
+        "a.service": None,
+        "b.service": "Job failed\twith a tab",
+        "c.service": "No result reported (authorization cancelled?)",
+    }
+    (cmd, input), = host.calls
+    assert cmd[:3] == ["xargs", "-0", "-n"] and cmd[-1] == "stop"
+    assert input == "a.service\0b.service\0c.service"
+
+
+def test_elevates_once_for_the_whole_batch():
+    host = ScriptedHost("")
+    host.elevate = ["sudo", "-n"]
+    results = SystemctlBackend(host).bulk_command("start", ["a.service", "b.service"], concurrency=3)
+    (cmd, _), = host.calls
+    assert cmd[:3] == ["sudo", "-n", "xargs"]
+    assert cmd[cmd.index("-P") + 1] == "3"
+    assert set(results.values()) == {"No result reported (authorization cancelled?)"}
+
+
+def test_fake_host_bulk_start():
+    host = FakeHost(units=30)
+    names = [name for name in host.units if name.endswith(".service")][:5]
+    results = SystemctlBackend(host, is_root=True).bulk_command("start", names + ["missing.service"])
+    assert all(results[name] is None for name in names)
+    assert "missing.service not found" in results["missing.service"]
+    assert all(host.units[name]['ActiveState'] == "active" for name in names)
@@ -0,0 +1,89 @@
+"""Resource sampling from a cgroup v2 tree laid out under a temporary root"""
+import os
+
+import pytest
+
+from engine import CgroupSampler, ResourceHistory
+
+
+def add_unit(directory, cpu_usec=0, memory=0, io=None):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "cpu.stat").write_text(f"usage_usec {cpu_usec}\nuser_usec 0\nsystem_usec 0\n")
+    (directory / "memory.current").write_text(f"{memory}\n")
+    if io is not None:
+        (directory / "io.stat").write_text(io)
+    return directory
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "cgroup.controllers").write_text("cpu io memory pids\n")
+    return tmp_path
+
+
+def user_manager(root):
+    uid = os.getuid()
+    return root / "user.slice" / f"user-{uid}.slice" / f"user@{uid}.service"
+
+
+def test_reads_system_units(root):
+    add_unit(root / "system.slice" / "sshd.service", cpu_usec=1500, memory=4096,
+             io="8:0 rbytes=100 wbytes=20 rios=1 wios=1\n8:16 rbytes=5 wbytes=0\n")
+    add_unit(root / "system.slice" / "cron.service", memory=10)  # No io.stat
+    sampler = CgroupSampler(str(root))
+    assert sampler.available
+    assert sampler.read("sshd.service", False) == (1500, 4096, 125)
+    assert sampler.read("cron.service", False) == (0, 10, 0)
+    assert sampler.read("missing.service", False) is None
+    assert sampler.read("sshd.service", True) is None
+
+
+@pytest.mark.parametrize("parent", ["app.slice", "session.slice", "background.slice", None])
+def test_finds_user_units_in_any_slice(root, parent):
+    manager = user_manager(root)
+    add_unit((manager / parent if parent else manager) / "syncthing.service", memory=7)
+    assert CgroupSampler(str(root)).read("syncthing.service", True) == (0, 7, 0)
+
+
+def test_remembers_and_refinds_paths(root):
+    unit = add_unit(root / "system.slice" / "web.service", memory=1)
+    sampler = CgroupSampler(str(root))
+    sampler.read("web.service", False)
+    assert sampler.paths[(False, "web.service")] == str(unit)
+
+    # Restarted into another slice: the stale path is dropped and the walk redone
+    (unit / "memory.current").unlink()
+    moved = add_unit(user_manager(root) / "web.service", memory=2)
+    assert sampler.read("web.service", False) is None
+    assert (False, "web.service") not in sampler.paths
+    assert sampler.read("web.service", True) == (0, 2, 0)
+    assert sampler.paths[(True, "web.service")] == str(moved)
+
+
+def test_sample_keeps_history_of_running_units(root):
+    unit = add_unit(root / "system.slice" / "a.service", cpu_usec=0, memory=100)
+    sampler = CgroupSampler(str(root))
+    sampler.sample(["a.service", "b.service"])
+    (unit / "cpu.stat").write_text("usage_usec 500000\n")
+    sampler.sample(["a.service", "b.service"])
+    assert set(sampler.history) == {"a.service"}
+    cpu, memory, io = sampler.history["a.service"].latest()
+    assert cpu > 0 and memory == 100 and io == 0
+
+    sampler.forget(keep=set())
+    assert sampler.history == {}
+
+
+def test_history_ring():
+    history = ResourceHistory(size=3)
+    assert history.latest() is None
+    for second in range(6):
+        # One CPU second per second is 100%
+        history.add(float(second), second * 1_000_000, second, second * 10)
+    assert history.series(history.cpu) == pytest.approx([100.0] * 3)
+    assert history.series(history.memory) == [3, 4, 5]
+    assert history.latest() == pytest.approx((100.0, 5, 10.0))
+
+
+def test_unavailable_without_unified_hierarchy(tmp_path):
+    assert not CgroupSampler(str(tmp_path)).available
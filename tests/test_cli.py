@@ -0,0 +1,34 @@
+"""The command-line mode, run as a process against the fake systemctl"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def spawn(*args):
+    env = dict(os.environ, SYSTEMD_PILOT_FAKE_UNITS="3000",
+               PATH=os.path.join(ROOT, "benchmarks", "fakebin") + os.pathsep + os.environ["PATH"])
+    return subprocess.Popen([sys.executable, os.path.join(ROOT, "src", "main.py")] + list(args),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+
+
+@pytest.mark.parametrize("args", [["--list"], ["--list", "--json"]])
+def test_closed_pipe_exits_quietly(args):
+    process = spawn(*args)
+    assert process.stdout.readline()
+    process.stdout.close()  # Like `| head -1`
+    stderr = process.stderr.read()
+    process.stderr.close()
+    assert process.wait() == 141
+    assert stderr == b""
+
+
+def test_full_listing():
+    process = spawn("--list", "--failed")
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0 and stderr == b""
+    lines = stdout.decode().splitlines()
+    assert lines and all("failed" in line for line in lines)
@@ -0,0 +1,37 @@
+"""Reverse dependency tracking"""
+from engine import DependencyGraph, FakeHost, SystemctlBackend
+
+
+def test_dependency_graph_reverse_edges():
+    graph = DependencyGraph()
+    graph.update("a.service", {"Requires": ["b.service"], "After": ["b.service", "c.target"]})
+    graph.update("d.service", {"Requires": ["b.service"]})
+    assert graph.dependents("b.service") == {
+        "RequiredBy": ["a.service", "d.service"],
+        "FollowedBy": ["a.service"],
+    }
+
+    changed = graph.update("a.service", {"Wants": ["b.service"]})
+    assert changed == {"a.service", "b.service", "c.target"}
+    assert graph.dependents("b.service") == {"RequiredBy": ["d.service"], "WantedBy": ["a.service"]}
+    assert graph.dependents("c.target") == {}
+    assert graph.update("a.service", {"Wants": ["b.service"]}) == set()
+
+    changed = graph.replace({"d.service": {"Requires": ["b.service"]}})
+    assert changed == {"a.service", "b.service"}
+    assert "a.service" not in graph
+    assert graph.dependents("b.service") == {"RequiredBy": ["d.service"]}
+    assert graph.loaded
+
+
+def test_dependency_graph_from_fake_host():
+    backend = SystemctlBackend(FakeHost(units=40), is_root=True)
+    graph = DependencyGraph()
+    dependencies = {}
+    for batch in backend.iter_dependencies():
+        dependencies.update(batch)
+    graph.replace({unit: deps for unit, deps in dependencies.items() if deps is not None})
+    wanted = graph.dependencies("multi-user.target")["Wants"]
+    assert wanted
+    for unit in wanted:
+        assert "multi-user.target" in graph.dependents(unit)["WantedBy"]
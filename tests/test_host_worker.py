@@ -0,0 +1,94 @@
+"""The Flatpak host worker's framing, and FlatpakHost talking to a real worker"""
+import io
+import sys
+
+import pytest
+
+import host_worker
+from engine import FlatpakHost, SystemdError
+
+
+class UnsandboxedHost(FlatpakHost):
+    """FlatpakHost with the worker started directly instead of through flatpak-spawn"""
+
+    def argv(self, cmd):
+        return [sys.executable] + cmd[1:] if cmd[0] == "python3" else cmd
+
+
+def frames(data):
+    stream = io.BytesIO(data)
+    while (message := host_worker.read_frame(stream)) is not None:
+        yield message
+
+
+def test_frames_round_trip():
+    stream = io.BytesIO()
+    messages = [{"ready": True}, {"id": 1, "stdout": "ünïcode \udcff"}, {}]
+    for message in messages:
+        host_worker.write_frame(stream, message)
+    data = stream.getvalue()
+    assert data[:4] == len(b'{"ready": true}').to_bytes(4, "big")
+    assert list(frames(data)) == messages
+    # The app's reader understands the worker's frames
+    assert FlatpakHost()._read_frame(io.BytesIO(data)) == messages[0]
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00\x00"])
+def test_truncated_header_ends_the_stream(data):
+    assert host_worker.read_frame(io.BytesIO(data)) is None
+
+
+def test_handle_replies_in_order():
+    output = io.BytesIO()
+    commands = [{"argv": [sys.executable, "-c", f"import sys; sys.stdout.write('{i}' + sys.stdin.read())"],
+                 "input": "in" if i % 2 else None} for i in range(5)]
+    commands.append({"argv": ["/nonexistent/command"], "input": None})
+    host_worker.handle({"id": 7, "commands": commands, "parallel": True}, output)
+    reply, = frames(output.getvalue())
+    assert reply["id"] == 7
+    assert [result.get("stdout") for result in reply["results"][:5]] == ["0", "1in", "2", "3in", "4"]
+    assert "error" in reply["results"][5]
+
+
+@pytest.fixture
+def host():
+    host = UnsandboxedHost()
+    yield host
+    host.close()
+
+
+def test_commands_go_through_one_worker(host):
+    result = host.run(["sh", "-c", "cat; echo err >&2; exit 3"], input="hello")
+    assert (result.returncode, result.stdout, result.stderr) == (3, "hello", "err\n")
+    worker = host.process
+    assert worker is not None
+
+    results = host.run_batch([["echo", str(i)] for i in range(10)], parallel=True)
+    assert [result.stdout for result in results] == [f"{i}\n" for i in range(10)]
+    assert host.process is worker
+
+    raw = host.run(["printf", "\\377"], text=False)
+    assert raw.stdout == b"\xff"
+
+
+def test_missing_command_raises_oserror(host):
+    with pytest.raises(OSError):
+        host.run(["/nonexistent/command"])
+
+
+def test_lost_worker_does_not_rerun_the_command(host, tmp_path):
+    marker = tmp_path / "runs"
+    host.run(["true"])
+    with pytest.raises(SystemdError, match="Lost the host worker"):
+        # Record the run, then kill the worker before it can reply
+        host.run(["sh", "-c", f'echo run >> "{marker}"; kill -9 $PPID'])
+    assert marker.read_text() == "run\n"
+    # The next command starts a new worker
+    assert host.run(["echo", "again"]).stdout == "again\n"
+
+
+def test_falls_back_to_spawning_without_a_worker(monkeypatch):
+    host = UnsandboxedHost()
+    monkeypatch.setattr(host, "SOURCE_PATH", "/nonexistent/host_worker.py")
+    assert host.run(["echo", "direct"]).stdout == "direct\n"
+    assert host.available is False and host.process is None
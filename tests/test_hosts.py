@@ -0,0 +1,107 @@
+"""Host transports: SSH connection sharing and the in-memory fake host"""
+import subprocess
+
+import pytest
+
+import engine
+from engine import FakeHost, LocalHost, SSHHost, SystemctlBackend, host_from_settings
+
+
+@pytest.fixture
+def ssh_calls(monkeypatch, tmp_path):
+    """Record the ssh control commands SSHHost runs; "check" answers with check_status"""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    calls = []
+    state = {"check_status": 255, "master_status": 0}
+
+    def run(argv, **kwargs):
+        calls.append(argv)
+        if "-O" in argv and argv[argv.index("-O") + 1] == "check":
+            return subprocess.CompletedProcess(argv, state["check_status"], b"", b"")
+        if "ControlMaster=yes" in argv:
+            return subprocess.CompletedProcess(argv, state["master_status"], "", "Permission denied")
+        return subprocess.CompletedProcess(argv, 0, "", "")
+
+    monkeypatch.setattr(engine.subprocess, "run", run)
+    return calls, state
+
+
+def test_ssh_argv_runs_through_the_shared_master(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    host = SSHHost("admin@web1", options=["-p", "2222"])
+    argv = host.argv(["systemctl", "show", "--property=Description", "--", "a b.service"])
+    assert argv[0] == "ssh"
+    assert "ControlMaster=auto" in argv
+    assert f"ControlPath={tmp_path}/systemd-pilot/ssh/%C" in argv
+    assert "BatchMode=yes" in argv
+    assert argv[argv.index("admin@web1") - 2:argv.index("admin@web1")] == ["-p", "2222"]
+    # The remote shell gets one quoted command line
+    assert argv[-2:] == ["--", "systemctl show --property=Description -- 'a b.service'"]
+
+
+def test_ssh_argv_goes_through_the_flatpak_host(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    class Via(LocalHost):
+        def argv(self, cmd):
+            return ["flatpak-spawn", "--host"] + cmd
+
+    assert SSHHost("web1", via=Via()).argv(["true"])[:3] == ["flatpak-spawn", "--host", "ssh"]
+
+
+def test_ssh_connects_once(ssh_calls):
+    calls, _ = ssh_calls
+    host = SSHHost("web1")
+    host.connect()
+    host.connect()
+    assert len(calls) == 2  # One check, one master start
+    assert calls[1][calls[1].index("ControlMaster=yes") + 1:calls[1].index("web1")] == ["-N", "-f"]
+
+
+def test_ssh_reuses_a_running_master(ssh_calls):
+    calls, state = ssh_calls
+    state["check_status"] = 0
+    SSHHost("web1").connect()
+    assert len(calls) == 1
+
+
+def test_ssh_reconnects_after_close(ssh_calls):
+    calls, _ = ssh_calls
+    host = SSHHost("web1")
+    host.connect()
+    host.close()
+    assert calls[-1][calls[-1].index("-O") + 1] == "exit"
+    assert not host.connected
+    calls.clear()
+    host.connect()
+    assert len(calls) == 2 and host.connected
+
+
+def test_ssh_connect_failure(ssh_calls):
+    _, state = ssh_calls
+    state["master_status"] = 255
+    host = SSHHost("web1")
+    with pytest.raises(OSError, match="Permission denied"):
+        host.connect()
+    assert not host.connected
+
+
+def test_fake_host_from_settings():
+    name, host, backend = host_from_settings({"name": "lab", "transport": "fake", "units": 30}, via=LocalHost())
+    assert name == "lab" and isinstance(host, FakeHost)
+    services = backend.list_services()
+    assert services and all(service['full_name'].startswith("lab-") for service in services)
+
+
+def test_fake_hosts_keep_separate_state():
+    first, second = FakeHost("one", units=10), FakeHost("two", units=10)
+    assert first.units["one-session-00001.service"]['ActiveState'] == "active"
+    results = SystemctlBackend(first, is_root=True).bulk_command("stop", ["one-session-00001.service"])
+    assert results == {"one-session-00001.service": None}
+    assert first.units["one-session-00001.service"]['ActiveState'] == "inactive"
+    assert second.units["two-session-00001.service"]['ActiveState'] == "active"
+
+
+def test_unknown_transport():
+    with pytest.raises(ValueError):
+        host_from_settings({"name": "x", "transport": "telnet"}, via=LocalHost())
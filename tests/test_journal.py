@@ -0,0 +1,74 @@
+"""Cursor-paged journal history against the fake host's journal"""
+import pytest
+
+from engine import FakeHost, JournalPager, LRUCache
+
+
+@pytest.fixture
+def host():
+    JournalPager.clear_cache()
+    yield FakeHost(units=10, journal_entries=250)
+    JournalPager.clear_cache()
+
+
+def first_service(host):
+    return next(name for name in host.units if name.endswith(".service"))
+
+
+def read_all(pager):
+    pages = []
+    index = 0
+    while pager.has_page(index):
+        pages.append(pager.read_page(index))
+        index += 1
+    return pages
+
+
+def test_pages_until_complete(host):
+    pager = JournalPager(host, first_service(host), page_size=100)
+    pages = read_all(pager)
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert pager.complete
+    # Each page runs oldest to newest and ends just before the next newer one
+    assert pages[0][-1].endswith("Handled request 249 in 55 ms")
+    assert pages[1][-1].endswith("Handled request 149 in 52 ms")
+    assert "Handled request 0 in" in pages[2][0]
+    assert len({line for page in pages for line in page}) == 250
+
+
+def test_filters_go_to_journalctl(host):
+    pager = JournalPager(host, "a.service", user=True, since="today", priority="err")
+    cmd = pager.command("s=fake;i=3")
+    assert cmd[:4] == ["journalctl", "--user", "-u", "a.service"]
+    assert "--since=today" in cmd and "--priority=err" in cmd
+    assert cmd[-1] == "--after-cursor=s=fake;i=3"
+    assert not any(arg.startswith("--after-cursor") for arg in pager.command(None))
+
+
+def test_newest_page_is_read_fresh(host):
+    unit = first_service(host)
+    JournalPager(host, unit, page_size=100).read_page(0)
+    JournalPager(host, unit, page_size=100).read_page(0)
+    assert len(JournalPager.cache.entries) == 0
+
+
+def test_older_pages_are_shared(host, monkeypatch):
+    unit = first_service(host)
+    first = JournalPager(host, unit, page_size=100)
+    first.read_page(0)
+    older = first.read_page(1)
+
+    second = JournalPager(host, unit, page_size=100)
+    second.read_page(0)
+    monkeypatch.setattr(host, "run", lambda *args, **kwargs: pytest.fail("page 1 was not cached"))
+    assert second.read_page(1) == older
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
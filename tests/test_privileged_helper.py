@@ -0,0 +1,51 @@
+"""The privileged helper's allow-list, checked without root"""
+import sys
+
+import pytest
+
+import privileged_helper
+from engine import PrivilegedHelper, SystemdError
+from privileged_helper import RequestError, handle
+
+
+@pytest.mark.parametrize("request_", [
+    {"op": "exec", "argv": ["rm", "-rf", "/"]},
+    {"op": None},
+    ["daemon_reload"],
+    {"op": "unit_command", "command": "mask", "units": ["ssh.service"]},
+    {"op": "unit_command", "command": "start", "units": []},
+    {"op": "unit_command", "command": "start", "units": ["--root=/tmp"]},
+    {"op": "unit_command", "command": "start", "units": ["ssh.service; reboot"]},
+    {"op": "bulk_command", "command": "stop", "units": ["a.service"], "concurrency": "8"},
+    {"op": "install_unit", "path": "/etc/passwd", "content": ""},
+    {"op": "install_unit", "path": "/etc/systemd/system/../../passwd", "content": ""},
+    {"op": "install_unit", "path": "/etc/systemd/system/evil.sh", "content": ""},
+    {"op": "install_unit", "path": "/etc/systemd/system/a.service.d/override.txt", "content": ""},
+    {"op": "install_unit", "path": "/usr/lib/systemd/system/a.service", "content": ""},
+    {"op": "install_unit", "path": "/etc/systemd/system/a.service", "content": None},
+])
+def test_rejected_requests(request_, monkeypatch):
+    monkeypatch.setattr(privileged_helper, "systemctl", lambda args: pytest.fail(f"ran systemctl {args}"))
+    with pytest.raises(RequestError):
+        handle(request_)
+
+
+def test_allowed_request_runs_systemctl(monkeypatch):
+    calls = []
+    monkeypatch.setattr(privileged_helper, "systemctl", calls.append)
+    handle({"op": "unit_command", "command": "restart", "units": ["ssh.service", "getty@tty1.service"]})
+    assert calls == [["restart", "--", "ssh.service", "getty@tty1.service"]]
+
+
+def test_client_reports_rejections():
+    # Runs the helper as the current user, through the real pipe protocol
+    helper = PrivilegedHelper(lambda cmd: [sys.executable] + cmd[1:], use_pkexec=False, idle_timeout=30)
+    try:
+        assert helper.request("ping") == "pong"
+        with pytest.raises(SystemdError, match="Operation not allowed"):
+            helper.request("shell", command="id")
+        with pytest.raises(SystemdError, match="Invalid unit name"):
+            helper.request("unit_command", command="start", units=["-x"])
+        assert helper.request("ping") == "pong"
+    finally:
+        helper.close()
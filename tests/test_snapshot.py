@@ -0,0 +1,65 @@
+"""The per-scope service snapshot: filter tabs and ranked search"""
+from engine import ServiceSearchIndex, ServiceSnapshot
+
+
+def service(name, active="active", sub="running", description=""):
+    return {'name': name, 'full_name': f"{name}.service", 'load': "loaded",
+            'active': active, 'sub': sub, 'description': description}
+
+
+def test_filter_tabs():
+    def states(active, sub):
+        return ServiceSnapshot.states_of({'active': active, 'sub': sub})
+
+    assert states("active", "running") == ["running"]
+    assert states("active", "exited") == []
+    assert states("inactive", "dead") == ["inactive"]
+    assert states("failed", "failed") == ["failed"]
+    assert states("activating", "start") == []
+
+
+def test_tab_indexes_follow_updates():
+    snapshot = ServiceSnapshot()
+    assert snapshot.update(service("a"))
+    assert snapshot.matches("a.service", "running")
+    assert not snapshot.update(service("a", description="changed"))  # Same tabs
+    assert snapshot.update(service("a", "failed", "failed"))
+    assert snapshot.matches("a.service", "failed")
+    assert not snapshot.matches("a.service", "running")
+
+
+def test_search_ranking():
+    snapshot = ServiceSnapshot()
+    for name, description in (
+        ("ssh", "OpenBSD Secure Shell server"),
+        ("sshd-keygen", "SSH key generation"),
+        ("openssh-agent", "Agent"),
+        ("systemd-hostnamed", "Hostname service"),  # s..s..h: a fuzzy match
+        ("cron", "Regular background program processing, ssh-free"),
+        ("nginx", "Web server"),
+    ):
+        snapshot.update(service(name, description=description))
+    index = snapshot.search_index()
+
+    assert index.search("ssh") == {
+        "ssh.service": ServiceSearchIndex.EXACT,
+        "sshd-keygen.service": ServiceSearchIndex.PREFIX,
+        "openssh-agent.service": ServiceSearchIndex.SUBSTRING,
+        "cron.service": ServiceSearchIndex.DESCRIPTION,
+        "systemd-hostnamed.service": ServiceSearchIndex.FUZZY,
+    }
+    # Narrowing the query reuses the previous results
+    assert index.search("sshd") == {
+        "sshd-keygen.service": ServiceSearchIndex.PREFIX,
+        "systemd-hostnamed.service": ServiceSearchIndex.FUZZY,
+    }
+    assert index.search("  ") is None
+
+
+def test_search_index_is_rebuilt_after_changes():
+    snapshot = ServiceSnapshot()
+    snapshot.update(service("nginx"))
+    index = snapshot.search_index()
+    assert snapshot.search_index() is index
+    snapshot.update(service("apache"))
+    assert "apache.service" in snapshot.search_index().search("apa")
@@ -0,0 +1,60 @@
+"""The on-disk snapshot cache and what invalidates it"""
+import pytest
+
+import engine
+from engine import FakeHost, SnapshotCache, SystemctlBackend
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    unit_dir = tmp_path / "units"
+    unit_dir.mkdir()
+    monkeypatch.setattr(engine, "SYSTEM_UNIT_DIRS", [str(unit_dir)])
+    monkeypatch.setattr(engine, "SYSTEM_GENERATOR_DIRS", [])
+    monkeypatch.setattr(SnapshotCache, "boot_id", staticmethod(lambda: "boot-1"))
+    cache = SnapshotCache(cache_dir=str(tmp_path / "cache"))
+    services = SystemctlBackend(FakeHost(units=20), is_root=True).list_services()
+    cache.save(False, services, {"a.service": str(unit_dir / "a.service")})
+    return cache, unit_dir, services
+
+
+def test_round_trip(cache):
+    cache, unit_dir, services = cache
+    loaded, paths = cache.load(False)
+    assert loaded == services
+    assert paths == {"a.service": str(unit_dir / "a.service")}
+    assert cache.load(True) is None
+
+
+def test_ignored_after_reboot(cache, monkeypatch):
+    cache, _, _ = cache
+    monkeypatch.setattr(SnapshotCache, "boot_id", staticmethod(lambda: "boot-2"))
+    assert cache.load(False) is None
+
+
+def test_ignored_after_unit_files_change(cache):
+    cache, unit_dir, _ = cache
+    (unit_dir / "new.service").write_text("[Service]\nExecStart=/bin/true\n")
+    assert cache.load(False) is None
+
+
+def test_only_boot_id_without_local_files(cache, monkeypatch):
+    cache, unit_dir, services = cache
+    remote = SnapshotCache("fake:lab", cache_dir=cache.cache_dir, local_files=False)
+    remote.save(False, services, {})
+    (unit_dir / "new.service").write_text("")
+    assert remote.load(False) is not None
+
+
+def test_invalidate(cache):
+    cache, _, _ = cache
+    cache.invalidate(False)
+    assert cache.load(False) is None
+    cache.invalidate(False)  # Already gone
+
+
+def test_unreadable_cache_is_ignored(cache):
+    cache, _, _ = cache
+    with open(cache.path(False), "w") as f:
+        f.write("{not json")
+    assert cache.load(False) is None
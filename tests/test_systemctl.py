@@ -0,0 +1,63 @@
+"""systemctl listings, JSON and plain, against the fake host"""
+import json
+
+import pytest
+
+from engine import FakeHost, NotJsonOutput, SystemctlBackend, iter_json_array
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10000])
+def test_iter_json_array_across_chunk_boundaries(size):
+    values = [{"unit": f"a{i}.service", "nested": [i, {"x": "], {"}]} for i in range(40)]
+    text = json.dumps(values, indent=1)
+    assert list(iter_json_array(chunked(text, size))) == values
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array(["  [", " ]\n"])) == []
+
+
+def test_iter_json_array_rejects_plain_output():
+    with pytest.raises(NotJsonOutput):
+        list(iter_json_array(["UNIT LOAD ACTIVE SUB DESCRIPTION\n"]))
+    with pytest.raises(NotJsonOutput):
+        list(iter_json_array([]))
+
+
+def test_iter_json_array_truncated():
+    with pytest.raises(ValueError):
+        list(iter_json_array(['[{"a": 1}, {"b"']))
+
+
+def test_json_and_plain_listings_agree():
+    json_backend = SystemctlBackend(FakeHost(units=300), is_root=True)
+    plain_backend = SystemctlBackend(FakeHost(units=300), is_root=True)
+    plain_backend.json_output = False
+
+    json_services = json_backend.list_services()
+    plain_services = plain_backend.list_services()
+    assert json_backend.json_output is True
+    assert sorted(json_services, key=lambda s: s['full_name']) == \
+        sorted(plain_services, key=lambda s: s['full_name'])
+
+    names = {service['full_name'] for service in json_services}
+    host = json_backend.host
+    # Unit files that aren't loaded are listed too
+    assert host.unloaded and host.unloaded <= names
+
+    not_found = {name for name, unit in host.units.items() if unit['LoadState'] == "not-found"}
+    assert not_found and not_found <= names
+    # The user manager's listing leaves them out
+    for backend in (json_backend, plain_backend):
+        user_names = {service['full_name'] for service in backend.list_services(user=True)}
+        assert user_names and not user_names & not_found
+
+
+def test_json_support_is_shared_per_host():
+    host = FakeHost(units=20)
+    SystemctlBackend(host, is_root=True).list_services()
+    assert SystemctlBackend(host).json_output is True
@@ -0,0 +1,89 @@
+"""Finding the terminal emulator once, and looking again after a failure"""
+import os
+
+import pytest
+
+from engine import LocalHost, TerminalResolver
+
+
+@pytest.fixture
+def bin_dir(tmp_path, monkeypatch):
+    # Only the terminals a test installs exist; sh runs the host probe
+    os.symlink("/bin/sh", tmp_path / "sh")
+    monkeypatch.setenv("PATH", str(tmp_path))
+    return tmp_path
+
+
+def install(bin_dir, *names):
+    for name in names:
+        path = bin_dir / name
+        path.write_text("#!/bin/sh\n")
+        path.chmod(0o755)
+
+
+class ProbingHost(LocalHost):
+    """Runs the host probe for real and counts the round trips"""
+
+    def __init__(self):
+        self.probes = []
+
+    def run(self, cmd, input=None, text=True):
+        self.probes.append(cmd[4:])
+        return super().run(cmd, input=input, text=text)
+
+
+def test_first_installed_terminal_is_cached(bin_dir):
+    install(bin_dir, "konsole", "xfce4-terminal")
+    resolver = TerminalResolver(LocalHost())
+    assert resolver.get()['binary'] == "xfce4-terminal"
+    # Gone from disk, but not looked up again until invalidated
+    (bin_dir / "xfce4-terminal").unlink()
+    assert resolver.get()['binary'] == "xfce4-terminal"
+    resolver.invalidate()
+    assert resolver.get()['binary'] == "konsole"
+
+
+def test_failed_terminal_is_skipped_for_the_session(bin_dir):
+    install(bin_dir, "gnome-terminal", "konsole")
+    resolver = TerminalResolver(LocalHost())
+    assert resolver.get()['binary'] == "gnome-terminal"
+    resolver.invalidate("gnome-terminal")
+    assert resolver.get()['binary'] == "konsole"
+    resolver.invalidate("konsole")
+    assert resolver.get() is None
+    # A terminal installed meanwhile is found on the next check
+    install(bin_dir, "x-terminal-emulator")
+    resolver.invalidate()
+    assert resolver.get()['binary'] == "x-terminal-emulator"
+
+
+def test_flatpak_probes_the_host_once(bin_dir):
+    install(bin_dir, "konsole", "x-terminal-emulator")
+    host = ProbingHost()
+    resolver = TerminalResolver(host, in_flatpak=True)
+    assert resolver.get()['binary'] == "konsole"
+    assert resolver.get()['binary'] == "konsole"
+    assert host.probes == [["gnome-terminal", "xfce4-terminal", "konsole", "x-terminal-emulator"]]
+
+    resolver.invalidate("konsole")
+    assert resolver.get()['binary'] == "x-terminal-emulator"
+    assert host.probes[1] == ["gnome-terminal", "xfce4-terminal", "x-terminal-emulator"]
+
+
+def test_preferred_terminal_comes_first(bin_dir):
+    install(bin_dir, "gnome-terminal", "alacritty")
+    resolver = TerminalResolver(LocalHost(), preferred="alacritty -e sh -c")
+    assert resolver.get() == {'binary': "alacritty", 'args': ["-e", "sh", "-c"]}
+    resolver.invalidate("alacritty")
+    assert resolver.get()['binary'] == "gnome-terminal"
+
+
+@pytest.mark.parametrize("preferred, expected", [
+    (None, None),
+    ("konsole", {'binary': "konsole", 'args': ["-e", "bash -c"]}),
+    ("kitty", {'binary': "kitty", 'args': ["-e", "bash", "-c"]}),
+    ({"binary": "foot"}, {'binary': "foot", 'args': ["-e", "bash", "-c"]}),
+    ({"binary": "wezterm", "args": ["start", "--"]}, {'binary': "wezterm", 'args': ["start", "--"]}),
+])
+def test_parse_preference(preferred, expected):
+    assert TerminalResolver.parse_preference(preferred) == expected
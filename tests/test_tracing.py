@@ -0,0 +1,136 @@
+"""Timing spans, their histograms and the Chrome trace export"""
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import engine
+from engine import (
+    NO_SPAN, FakeHost, PrivilegedHelper, SpanHistogram, SSHHost, SystemctlBackend, Tracer, UnitVerifier,
+)
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    """An enabled tracer in place of the module's shared one"""
+    tracer = Tracer(enabled=True)
+    monkeypatch.setattr(engine, "tracer", tracer)
+    return tracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span("host.run", argv="true") as span:
+        span.set(bytes_read=1)
+    assert tracer.span("x") is NO_SPAN
+    assert tracer.summary() == {} and tracer.chrome_trace()["traceEvents"] == []
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = SpanHistogram()
+    for micros in [3] * 90 + [1000] * 9 + [50000]:
+        histogram.add(micros / 1e6)
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["max_ms"] == 50.0
+    assert summary["buckets_us"] == {"4": 90, "1024": 9, "65536": 1}
+    # Percentiles are bucket upper bounds, never above the largest span
+    assert summary["p50_ms"] == 0.004
+    assert summary["p95_ms"] == 1.024
+    assert histogram.percentile(1.0) == 0.05
+    assert SpanHistogram().summary()["mean_ms"] == 0.0
+
+
+def test_spans_feed_histograms_and_events():
+    tracer = Tracer(enabled=True, max_events=3)
+    for index in range(5):
+        with tracer.span("parse.show", index=index) as span:
+            span.set(units=index * 2)
+    with pytest.raises(KeyError):
+        with tracer.span("host.run"):
+            raise KeyError("spans still end on errors")
+
+    summary = tracer.summary()
+    assert list(summary) == ["host.run", "parse.show"]
+    assert summary["parse.show"]["count"] == 5
+    # Only the newest events are kept for export; histograms count every span
+    assert [event[4] for event in tracer.events] == [{"index": 3, "units": 6}, {"index": 4, "units": 8}, {}]
+
+    tracer.clear()
+    assert tracer.summary() == {} and not tracer.events
+
+
+def test_chrome_trace_and_export(tmp_path):
+    tracer = Tracer(enabled=True)
+    with tracer.span("host.run", host="web1"):
+        pass
+    def bind():
+        with tracer.span("render.row_bind"):
+            pass
+
+    thread = threading.Thread(target=bind)
+    thread.start()
+    thread.join()
+
+    document = tracer.chrome_trace()
+    assert document["displayTimeUnit"] == "ms"
+    first, second = document["traceEvents"]
+    assert first["name"] == "host.run" and first["cat"] == "host" and first["ph"] == "X"
+    assert first["args"] == {"host": "web1"}
+    assert first["ts"] >= 0 and first["dur"] >= 0
+    assert first["tid"] != second["tid"]
+
+    tracer.export(tmp_path / "spans.json")
+    assert json.loads((tmp_path / "spans.json").read_text())["spans"]["host.run"]["count"] == 1
+    tracer.export(tmp_path / "trace.json", chrome=True)
+    assert len(json.loads((tmp_path / "trace.json").read_text())["traceEvents"]) == 2
+
+
+def test_host_calls_are_traced(tracer):
+    backend = SystemctlBackend(FakeHost(units=50), is_root=True)
+    backend.list_services()
+    summary = tracer.summary()
+    assert summary["parse.show"]["count"] >= 1
+    host_events = [event for event in tracer.events if event[0].startswith("host.")]
+    assert host_events
+    assert all(event[4]["host"] == "fake:fake" and "bytes_read" in event[4] for event in host_events)
+
+
+def test_traced_decorator(tracer):
+    @engine.traced("filter.pass")
+    def work(value):
+        return value * 2
+
+    assert work(21) == 42
+    assert tracer.summary()["filter.pass"]["count"] == 1
+
+
+def test_ssh_connect_span(tracer, monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setattr(engine.subprocess, "run",
+                        lambda argv, **kwargs: subprocess.CompletedProcess(argv, 0, "", ""))
+    SSHHost("web1").connect()
+    (name, _, _, _, args), = tracer.events
+    assert name == "ssh.connect" and args == {"host": "web1", "reused": True}
+
+
+def test_helper_start_span(tracer):
+    helper = PrivilegedHelper(lambda cmd: [sys.executable] + cmd[1:], use_pkexec=False, idle_timeout=30)
+    try:
+        helper._start()
+    finally:
+        helper.close()
+    assert tracer.summary()["helper.start"]["count"] == 1
+
+
+def test_verify_span(tracer, tmp_path, monkeypatch):
+    # A systemd-analyze that finds nothing to report
+    (tmp_path / "systemd-analyze").write_text("#!/bin/sh\nexit 0\n")
+    (tmp_path / "systemd-analyze").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin:/bin")
+    verifier = UnitVerifier(engine.LocalHost(), "demo.service")
+    assert verifier.verify([("demo.service", "[Service]\nExecStart=/bin/true\n")]) == []
+    (name, _, _, _, args), = [event for event in tracer.events if event[0] == "verify.run"]
+    assert args == {"host": "localhost", "files": 1}
@@ -0,0 +1,83 @@
+"""Reading, saving and verifying unit files for the editor"""
+import pytest
+
+from engine import FakeHost, SystemctlBackend, SystemdError, UnitVerifier
+
+VERIFY_OUTPUT = """/tmp/tmp.abc
+/tmp/tmp.abc/demo.service:4: Unknown key name 'ExecStrat' in section 'Service', ignoring.
+/tmp/tmp.abc/demo.service.d/override.conf:2: Unknown key name 'Foo' in section 'Service', ignoring.
+
+demo.service: Command /nonexistent is not executable: No such file or directory
+Unit /tmp/tmp.abc/demo.service has a bad unit file setting.
+/etc/systemd/system/other.service:7: Unknown section 'Srvice'. Ignoring.
+"""
+
+
+def test_parse_maps_messages_to_the_editor_files():
+    verifier = UnitVerifier(FakeHost(), "demo.service")
+    diagnostics = verifier.parse(VERIFY_OUTPUT, ["demo.service", "demo.service.d/override.conf"])
+    assert diagnostics == [
+        {"file": "demo.service", "line": 4, "severity": "warning",
+         "message": "Unknown key name 'ExecStrat' in section 'Service', ignoring."},
+        {"file": "demo.service.d/override.conf", "line": 2, "severity": "warning",
+         "message": "Unknown key name 'Foo' in section 'Service', ignoring."},
+        {"file": None, "line": None, "severity": "error",
+         "message": "demo.service: Command /nonexistent is not executable: No such file or directory"},
+        {"file": None, "line": None, "severity": "error",
+         "message": "Unit demo.service has a bad unit file setting."},
+        # Other units' files aren't the editor's, so they keep their path
+        {"file": None, "line": None, "severity": "warning",
+         "message": "/etc/systemd/system/other.service:7: Unknown section 'Srvice'. Ignoring."},
+    ]
+
+
+def test_parse_clean_and_empty_output():
+    verifier = UnitVerifier(FakeHost(), "demo.service")
+    assert verifier.parse("/tmp/tmp.abc\n", ["demo.service"]) == []
+    assert verifier.parse("", ["demo.service"]) == []
+
+
+def test_command_passes_files_as_arguments():
+    cmd = UnitVerifier(FakeHost(), "demo.service", user=True).command(
+        [("demo.service", "[Service]\nExecStart=/bin/true\n"), ("demo.service.d/a b.conf", "")])
+    assert cmd[:2] == ["sh", "-c"] and "--user verify" in cmd[2]
+    assert cmd[3:] == ["sh", "demo.service", "demo.service", "[Service]\nExecStart=/bin/true\n",
+                       "demo.service.d/a b.conf", ""]
+
+
+@pytest.mark.parametrize("path, user, expected", [
+    ("/etc/systemd/system/a.service", False, "/etc/systemd/system/a.service"),
+    ("/usr/lib/systemd/system/a.service", False, "/etc/systemd/system/a.service"),
+    ("/usr/lib/systemd/system/a.service.d/10-vendor.conf", False, "/etc/systemd/system/a.service.d/10-vendor.conf"),
+    ("/etc/systemd/system/a.service.d/override.conf", False, "/etc/systemd/system/a.service.d/override.conf"),
+    ("/usr/lib/systemd/user/b.service", True, "~/.config/systemd/user/b.service"),
+    ("/home/me/.config/systemd/user/b.service", True, "/home/me/.config/systemd/user/b.service"),
+])
+def test_editable_path(path, user, expected):
+    assert SystemctlBackend.editable_path(path, user) == expected
+
+
+def test_read_fragment_and_drop_ins():
+    host = FakeHost(units=10)
+    backend = SystemctlBackend(host, is_root=True)
+    name = next(name for name, unit in host.units.items() if unit.get('DropInPaths'))
+    (fragment, content), (drop_in, override) = backend.read_unit_files(name)
+    assert fragment == host.units[name]['FragmentPath']
+    assert content.startswith("[Unit]\nDescription=")
+    assert drop_in.endswith(f"{name}.d/override.conf")
+    assert override == "[Service]\nEnvironment=FAKE_OVERRIDE=1\n"
+
+
+def test_saved_file_is_read_back():
+    host = FakeHost(units=10)
+    backend = SystemctlBackend(host, is_root=True)
+    name = next(name for name, unit in host.units.items() if unit.get('FragmentPath'))
+    path = host.units[name]['FragmentPath']
+    backend.write_unit_file(path, "[Service]\nExecStart=/bin/true\n")
+    assert host.files[path] == "[Service]\nExecStart=/bin/true\n"
+    assert backend.read_unit_files(name, fragment_path=path)[0] == (path, "[Service]\nExecStart=/bin/true\n")
+
+
+def test_unit_without_files():
+    with pytest.raises(SystemdError, match="has no unit file"):
+        SystemctlBackend(FakeHost(units=10), is_root=True).read_unit_files("missing.service")